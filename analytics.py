@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar analytics for large simulation runs. `run` plays every pairing of
+a roster across a process pool, seeded chunk by chunk as tournament.py
+does, and streams one row per round into chunked column files: Parquet
+when pyarrow is installed, NumPy .npz chunks (one .npy per column)
+otherwise. Rows are packed into a buffer as they are played, and each full
+chunk goes to a background thread through a short queue, so memory stays
+bounded and writing overlaps the simulation in every worker.
+
+`query` reads the chunks back one at a time, only the columns it needs, and
+reports win rates and duel lengths per match-up, hit rates per (action,
+starting guard, target guard), wound frequencies and how long each loadout
+spends stamina-starved.
+
+    python analytics.py run rosters/example.json runs/example --duels 100000
+    python analytics.py query runs/example
+"""
+
+import argparse
+import dataclasses
+import glob
+import json
+import os
+import queue
+import random
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from content import ContentError
+from rules import STARVED_STAMINA, ActionType, DuelState, EventType, Guard, Wound, simulate_duel, step_round
+from tournament import CHUNK_DUELS, derive_seed, load_roster
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Per side of a round: the action as performed, whether it was forced to rest, its initiative, whether
+# it attacked, landed, for how much damage and which wound it dealt, then the knight's state afterwards
+SIDE_COLUMNS = [("type", "i1"), ("start", "i1"), ("target", "i1"), ("forced", "?"), ("init", "i2"),
+                ("attacked", "?"), ("hit", "?"), ("damage", "i2"), ("wound", "i1"),
+                ("health", "i2"), ("stamina", "i2"), ("fatigue", "i2")]
+ROUND_COLUMNS = ([("duel", "i8"), ("round", "i2"), ("terrain", "?")]
+                 + [("p_" + name, t) for name, t in SIDE_COLUMNS] + [("o_" + name, t) for name, t in SIDE_COLUMNS])
+# Player-slot and opponent-slot loadouts (roster indices), rounds played, and 1, -1 or 0 for a
+# player win, an opponent win or a draw
+DUEL_COLUMNS = [("duel", "i8"), ("player", "i2"), ("opponent", "i2"), ("rounds", "i2"), ("winner", "i1")]
+
+STRUCT_CODES = {"i1": "b", "i2": "h", "i8": "q", "?": "?"}
+
+
+def row_format(columns: list):
+    return (np.dtype([(name, "<" + t if t != "?" else t) for name, t in columns]),
+            struct.Struct("<" + "".join(STRUCT_CODES[t] for _, t in columns)))
+
+
+ROUND_DTYPE, ROUND = row_format(ROUND_COLUMNS)
+DUEL_DTYPE, DUEL = row_format(DUEL_COLUMNS)
+
+# Rounds per chunk file
+CHUNK_ROWS = 1 << 18
+# Chunks a worker may have waiting for its writer thread before the simulation waits instead
+WRITE_QUEUE = 2
+
+ACTION_TYPES, GUARDS = len(ActionType), len(Guard)
+
+
+def chunk_format() -> str:
+    return "parquet" if pq is not None else "npz"
+
+
+# Write one chunk of packed rows as a column file, under a temporary name until complete
+def write_chunk(path: str, data: bytes, dtype: np.dtype, fmt: str):
+    rows = np.frombuffer(data, dtype=dtype)
+    tmp = path + ".tmp"
+    if fmt == "parquet":
+        pq.write_table(pa.table({name: np.ascontiguousarray(rows[name]) for name in dtype.names}), tmp)
+    else:
+        with open(tmp, "wb") as f:
+            np.savez(f, **{name: rows[name] for name in dtype.names})
+    os.replace(tmp, path)
+
+
+# One thread per worker process that writes chunks in the background. The queue is short, so a
+# simulation that outruns the disk waits rather than piling chunks up in memory.
+class BackgroundWriter:
+    def __init__(self, depth: int = WRITE_QUEUE):
+        self.queue = queue.Queue(maxsize=depth)
+        self.error = None
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            try:
+                write_chunk(*job)
+            except Exception as e:
+                self.error = e
+
+    def put(self, path: str, data: bytes, dtype: np.dtype, fmt: str):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((path, data, dtype, fmt))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+# Packs rows and hands every chunk_rows of them to the writer as <prefix>-<part>.<format>
+class ChunkSink:
+    def __init__(self, writer: BackgroundWriter, prefix: str, dtype: np.dtype, fmt: str, chunk_rows: int):
+        self.writer = writer
+        self.prefix = prefix
+        self.dtype = dtype
+        self.fmt = fmt
+        self.chunk_rows = chunk_rows
+        self.buffer = bytearray()
+        self.rows = 0
+        self.parts = 0
+
+    def add(self, row: bytes):
+        self.buffer += row
+        self.rows += 1
+        if self.rows == self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.put(f"{self.prefix}-{self.parts:03d}.{self.fmt}", bytes(self.buffer), self.dtype, self.fmt)
+            self.buffer.clear()
+            self.rows = 0
+            self.parts += 1
+
+
+def side_fields(action, forced: bool, init: int, attack, damage: int, wound: Wound, knight) -> tuple:
+    return (action.type.value, action.starting_guard.value, action.target_guard.value, forced, init,
+            attack is not None, attack is EventType.IMPACT, damage, wound.value,
+            knight.health, knight.stamina, knight.fatigue)
+
+
+# Has step_round()'s signature, so simulate_duel() can play through it; adds a row per round to sink
+class RoundCollector:
+    def __init__(self, sink: ChunkSink):
+        self.sink = sink
+        self.duel = 0
+
+    def __call__(self, state: DuelState, player_action, opponent_action, rng: random.Random):
+        result = step_round(state, player_action, opponent_action, rng)
+        player = state.player
+        p_attack = o_attack = None
+        p_damage = o_damage = 0
+        p_wound = o_wound = Wound.NONE
+        p_forced = o_forced = terrain = False
+        for e in result.events:
+            t = e.type
+            mine = e.actor is player
+            if t == EventType.IMPACT or t == EventType.DEFENDED:
+                if mine:
+                    p_attack, p_damage = t, e.damage or 0
+                else:
+                    o_attack, o_damage = t, e.damage or 0
+            elif t == EventType.WOUND:
+                if mine:
+                    p_wound = e.wound
+                else:
+                    o_wound = e.wound
+            elif t == EventType.FORCED_REST:
+                if mine:
+                    p_forced = True
+                else:
+                    o_forced = True
+            elif t == EventType.TERRAIN:
+                terrain = True
+        self.sink.add(ROUND.pack(
+            self.duel, result.round_num, terrain,
+            *side_fields(result.player_action, p_forced, result.player_init, p_attack, p_damage, p_wound, player),
+            *side_fields(result.opponent_action, o_forced, result.opp_init, o_attack, o_damage, o_wound,
+                         state.opponent)))
+        return result
+
+
+# Worker entry point: play one chunk of a match and write its rounds and duels under out
+def play_unit(task) -> tuple:
+    unit, a, b, knight_a, knight_b, env, duels, seed, max_rounds, out, chunk_rows, fmt = task
+    rng = random.Random(seed)
+    writer = BackgroundWriter()
+    rounds = ChunkSink(writer, os.path.join(out, f"rounds-{unit:05d}"), ROUND_DTYPE, fmt, chunk_rows)
+    results = ChunkSink(writer, os.path.join(out, f"duels-{unit:05d}"), DUEL_DTYPE, fmt, chunk_rows)
+    collector = RoundCollector(rounds)
+    played = 0
+    try:
+        for i in range(duels):
+            # Alternate sides as tournament.play_chunk() does
+            (first, k1), (second, k2) = ((a, knight_a), (b, knight_b)) if i % 2 == 0 else ((b, knight_b), (a, knight_a))
+            state = DuelState(dataclasses.replace(k1, wounds=0), dataclasses.replace(k2, wounds=0), env)
+            collector.duel = unit * CHUNK_DUELS + i
+            n = simulate_duel(state, rng, max_rounds, step=collector)
+            played += n
+            p_dead, o_dead = state.player.health <= 0, state.opponent.health <= 0
+            winner = 0 if p_dead == o_dead else (1 if o_dead else -1)
+            results.add(DUEL.pack(collector.duel, first, second, n, winner))
+        rounds.flush()
+        results.flush()
+    finally:
+        writer.close()
+    return duels, played
+
+
+def run(roster_path: str, out: str, duels: int, seed: int, workers: int, max_rounds: int, chunk_rows: int) -> dict:
+    roster, env = load_roster(roster_path)
+    os.makedirs(out, exist_ok=True)
+    if glob.glob(os.path.join(out, "rounds-*")) or glob.glob(os.path.join(out, "duels-*")):
+        raise FileExistsError(f"{out} already holds a run")
+    fmt = chunk_format()
+    with open(os.path.join(out, "meta.json"), "w") as f:
+        json.dump({"loadouts": [k.name for k in roster], "terrain": env.type.name, "duels_per_match": duels,
+                   "seed": seed, "format": fmt}, f, indent=2)
+
+    tasks = []
+    pairs = [(a, b) for a in range(len(roster)) for b in range(a + 1, len(roster))]
+    for match_id, (a, b) in enumerate(pairs):
+        for chunk, start in enumerate(range(0, duels, CHUNK_DUELS)):
+            n = min(CHUNK_DUELS, duels - start)
+            tasks.append((len(tasks), a, b, roster[a], roster[b], env, n, derive_seed(seed, a, b, match_id, chunk),
+                          max_rounds, out, chunk_rows, fmt))
+
+    start = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            done = list(executor.map(play_unit, tasks))
+    else:
+        done = [play_unit(task) for task in tasks]
+    return {"duels": sum(d for d, _ in done), "rounds": sum(r for _, r in done),
+            "elapsed": time.perf_counter() - start, "format": fmt}
+
+
+# The chunks of one table ("rounds" or "duels"), one at a time, as {column: array} for the columns asked for
+def scan(directory: str, table: str, columns: list):
+    for path in sorted(glob.glob(os.path.join(directory, f"{table}-*.npz"))
+                       + glob.glob(os.path.join(directory, f"{table}-*.parquet"))):
+        if path.endswith(".parquet"):
+            if pq is None:
+                raise RuntimeError(f"{path} needs pyarrow to read")
+            t = pq.read_table(path, columns=columns)
+            yield {name: t.column(name).to_numpy() for name in columns}
+        else:
+            with np.load(path) as z:
+                yield {name: z[name] for name in columns}
+
+
+def query(directory: str) -> dict:
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    names = meta["loadouts"]
+    n = len(names)
+
+    # Duels: small enough to keep whole, and needed to tell which loadout played each round
+    played = np.zeros((n, n), dtype=np.int64)  # [player slot, opponent slot]
+    player_wins = np.zeros((n, n), dtype=np.int64)
+    opponent_wins = np.zeros((n, n), dtype=np.int64)
+    rounds = np.zeros((n, n), dtype=np.int64)
+    ids, slots = [], []
+    for c in scan(directory, "duels", ["duel", "player", "opponent", "rounds", "winner"]):
+        pair = c["player"].astype(np.int64) * n + c["opponent"]
+        played += np.bincount(pair, minlength=n * n).reshape(n, n)
+        player_wins += np.bincount(pair[c["winner"] == 1], minlength=n * n).reshape(n, n)
+        opponent_wins += np.bincount(pair[c["winner"] == -1], minlength=n * n).reshape(n, n)
+        rounds += np.bincount(pair, weights=c["rounds"], minlength=n * n).astype(np.int64).reshape(n, n)
+        ids.append(c["duel"])
+        slots.append(np.stack([c["player"], c["opponent"]], axis=1))
+    ids = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+    slots = np.concatenate(slots) if slots else np.zeros((0, 2), dtype=np.int16)
+    # Loadout in each slot by duel id
+    lookup_player = np.zeros(ids.max() + 1 if len(ids) else 0, dtype=np.int16)
+    lookup_opponent = lookup_player.copy()
+    lookup_player[ids], lookup_opponent[ids] = slots[:, 0], slots[:, 1]
+
+    # Rounds, chunk by chunk
+    keys = ACTION_TYPES * GUARDS * GUARDS
+    attacks, hits = np.zeros(keys, dtype=np.int64), np.zeros(keys, dtype=np.int64)
+    wounds = np.zeros(len(Wound), dtype=np.int64)
+    hits_taken, wounds_taken = np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    knight_rounds, forced, starved = (np.zeros(n, dtype=np.int64) for _ in range(3))
+    total_rounds = 0
+    side_columns = ["type", "start", "target", "forced", "attacked", "hit", "wound", "stamina"]
+    columns = ["duel"] + [p + c for p in ("p_", "o_") for c in side_columns]
+    for c in scan(directory, "rounds", columns):
+        total_rounds += len(c["duel"])
+        owner = {"p_": lookup_player[c["duel"]], "o_": lookup_opponent[c["duel"]]}
+        for side, other in (("p_", "o_"), ("o_", "p_")):
+            key = (c[side + "type"].astype(np.int64) * GUARDS + c[side + "start"]) * GUARDS + c[side + "target"]
+            attacked, hit = c[side + "attacked"], c[side + "hit"]
+            attacks += np.bincount(key[attacked], minlength=keys)
+            hits += np.bincount(key[hit], minlength=keys)
+            wounds += np.bincount(c[side + "wound"][hit], minlength=len(Wound))
+            # Wounds this side dealt were taken by the other side's loadout
+            hits_taken += np.bincount(owner[other][hit], minlength=n)
+            wounds_taken += np.bincount(owner[other][hit & (c[side + "wound"] > 0)], minlength=n)
+            knight_rounds += np.bincount(owner[side], minlength=n)
+            forced += np.bincount(owner[side][c[side + "forced"]], minlength=n)
+            starved += np.bincount(owner[side][c[side + "stamina"] < STARVED_STAMINA], minlength=n)
+
+    return {"loadouts": names, "played": played, "player_wins": player_wins, "opponent_wins": opponent_wins,
+            "rounds": rounds, "total_rounds": total_rounds, "attacks": attacks, "hits": hits, "wounds": wounds,
+            "hits_taken": hits_taken, "wounds_taken": wounds_taken, "knight_rounds": knight_rounds,
+            "forced": forced, "starved": starved}
+
+
+def ratio(a, b) -> float:
+    return a / b if b else float("nan")
+
+
+def report(q: dict) -> str:
+    names, n = q["loadouts"], len(q["loadouts"])
+    out = []
+    duels = int(q["played"].sum())
+    out.append(f"{duels:,} duels, {q['total_rounds']:,} rounds, mean length {ratio(q['total_rounds'], duels):.1f}\n")
+
+    out.append(f"\n{'Match-up':<48} {'Duels':>9} {'Win % (a)':>9} {'Draw %':>7} {'Length':>7}")
+    for a in range(n):
+        for b in range(a + 1, n):
+            played = q["played"][a, b] + q["played"][b, a]
+            if not played:
+                continue
+            a_wins = q["player_wins"][a, b] + q["opponent_wins"][b, a]
+            b_wins = q["player_wins"][b, a] + q["opponent_wins"][a, b]
+            length = q["rounds"][a, b] + q["rounds"][b, a]
+            out.append(f"{names[a] + ' vs ' + names[b]:<48} {played:>9,} {100 * a_wins / played:>8.2f}% "
+                       f"{100 * (played - a_wins - b_wins) / played:>6.2f}% {length / played:>7.1f}")
+
+    out.append(f"\n{'Loadout':<24} {'Win %':>7} {'Wounds/hit taken':>17} {'Forced rest %':>14} {'Starved %':>10}")
+    for i, name in enumerate(names):
+        played = q["played"][i, :].sum() + q["played"][:, i].sum()
+        wins = q["player_wins"][i, :].sum() + q["opponent_wins"][:, i].sum()
+        out.append(f"{name:<24} {100 * ratio(wins, played):>6.2f}% "
+                   f"{ratio(q['wounds_taken'][i], q['hits_taken'][i]):>17.3f} "
+                   f"{100 * ratio(q['forced'][i], q['knight_rounds'][i]):>13.2f}% "
+                   f"{100 * ratio(q['starved'][i], q['knight_rounds'][i]):>9.2f}%")
+
+    out.append(f"\n{'Action':<8} {'From':<8} {'To':<8} {'Attacks':>12} {'Hit %':>7}")
+    for key in np.flatnonzero(q["attacks"]):
+        t, rest = divmod(int(key), GUARDS * GUARDS)
+        start, target = divmod(rest, GUARDS)
+        out.append(f"{ActionType(t).name.lower():<8} {Guard(start).name.lower():<8} {Guard(target).name.lower():<8} "
+                   f"{q['attacks'][key]:>12,} {100 * q['hits'][key] / q['attacks'][key]:>6.2f}%")
+
+    landed = int(q["hits"].sum())
+    out.append(f"\nWounds per landed blow: {ratio(q['wounds'][1:].sum(), landed):.4f} ("
+               + ", ".join(f"{Wound(w).name.lower()} {q['wounds'][w]:,}" for w in range(1, len(Wound))) + ")")
+    return "\n".join(out) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate to columnar files, and query them")
+    commands = parser.add_subparsers(dest="command", required=True)
+    p = commands.add_parser("run", help="play every pairing of a roster, writing one row per round")
+    p.add_argument("roster", help="JSON roster (see rosters/example.json)")
+    p.add_argument("out", help="directory for the run")
+    p.add_argument("--duels", type=int, default=10_000, help="duels per match")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--workers", type=int, default=os.cpu_count(), help="1 runs in-process")
+    p.add_argument("--max-rounds", type=int, default=500)
+    p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    q = commands.add_parser("query", help="aggregate a run, one chunk at a time")
+    q.add_argument("run", help="directory of the run")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        try:
+            r = run(args.roster, args.out, args.duels, args.seed, args.workers, args.max_rounds, args.chunk_rows)
+        except (FileExistsError, ContentError) as e:
+            sys.exit(str(e))
+        print(f"{r['duels']:,} duels, {r['rounds']:,} rounds in {r['elapsed']:.1f}s "
+              f"({r['rounds'] / r['elapsed']:,.0f} rounds/s) to {args.out} as {r['format']}")
+    else:
+        start = time.perf_counter()
+        text = report(query(args.run))
+        print(text + f"\nQueried in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
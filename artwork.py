@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The game's ASCII art: guard portraits, terrain and action banners, and the
+title and end screens, as plain text. fechtmeister.py imports this module
+the first time it draws something and adds the colors, so the rules and
+the simulations built on them never load it.
+"""
+
+from rules import ActionType, Guard, Terrain
+
+# Guard portraits with borders
+GUARD_ART = {
+    Guard.HIGH: r"""
+   .-=========-.
+   | VOM TACH  |
+   |           |
+   '-=========-'
+  / \
+  | |
+  |.|
+  |.|
+  |:|      __
+,_|:|_,   /  )
+  (Oo    / _I_
+   +\ \  || __|
+      \ \||___|
+        \ /.:.\-\
+         |.:. /-----\
+         |___|::oOo::|
+         /   |:<_T_>:|
+        |_____\ ::: /
+         | |  \ \:/
+         | |   | |
+         \ /   | \___
+         / |   \_____\
+         `-'
+""",
+    Guard.MIDDLE: r"""
+   .-=========-.
+   |           |
+   |   PFLUG   |
+   '-=========-'
+ |\             //
+ \\           _!_
+  \\         /___\
+   \\        [   ]
+    \\    _ _\   /_ _
+     \\/ (    '-'  ( )
+     /( \/ | {&}   /\ \
+       \  / \     / _> )
+        "`   >:::;-'`""'-.
+            /:::/         \
+           /  /||   {&}   |
+          (  / (\         /
+          / /   \'-.___.-'
+        _/ /     \ \
+       /___|    /___|
+""",
+    Guard.LOW: r"""
+   .-=========-.
+   |           |
+   |  ALBER    |
+   '-=========-'
+           __
+          /  )
+         / _I_
+         || __|
+         ||___|
+         //.:.\-\
+       // |.:. /-----\
+      // |___|::oOo::|
+     //  /   |:<_T_>:|
+   ---+-|_____\ ::: /
+     ||  | |  \ \:/
+     ||  | |   | |
+     ||  \ /   | \___
+     V   / |   \_____\
+         `-'
+""",
+    Guard.NO: r"""
+   .-=========-.
+   |   REST    |
+   |           |
+   '-=========-'
+              {}
+             {{}}
+             {{}}
+              {}
+            .-''-.
+           /  __  \
+          /.-'  '-.\
+          \::.  .::/
+           \'    '/
+      __ ___)    (___ __
+    .'   \\        //   `.
+   /     | '-.__.-' |     \
+   |     |  '::::'  |     |
+   |    /    '::'    \    |
+   |_.-;\     __     /;-._|
+   \.'^`\\    \/    //`^'./
+   /   _.-._ _||_ _.-._   \
+  `\___\    '-..-'    /___/`
+       /'---.  `\.---'\
+      ||    |`\\\|    ||
+      ||    | || |    ||
+      |;.__.' || '.__.;|
+      |       ||       |
+      {{{{{{{{||}}}}}}}}
+       |      ||      |
+       |.-==-.||.-==-.|
+       <.    .||.    .>
+        \'=='/||\'=='/
+        |   / || \   |
+        |   | || |   |
+        |   | || |   |
+        /^^\| || |/^^\
+       /   .' || '.   \
+      /   /   ||   \   \
+     (__.'    \/    '.__)
+""",
+}
+
+TERRAIN_ART = {
+    Terrain.OPEN: r"""
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+             OPEN FIELD
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+""",
+    Terrain.NARROW: r"""
+||===================================||
+||         NARROW PASSAGE            ||
+||===================================||
+""",
+    Terrain.ROUGH: r"""
+/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\
+       ROUGH, TREACHEROUS LAND
+/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\
+""",
+}
+
+# Banners for combat actions
+ACTION_ART = {
+    ActionType.STRIKE: r"""
+   ▄████████  ▄█  ███▄▄▄▄                ▄█    █▄       ▄████████ ███    █▄  
+  ███    ███ ███  ███▀▀▀██▄             ███    ███     ███    ███ ███    ███ 
+  ███    █▀  ███▌ ███   ███             ███    ███     ███    ███ ███    ███ 
+ ▄███▄▄▄     ███▌ ███   ███            ▄███▄▄▄▄███▄▄   ███    ███ ███    ███ 
+▀▀███▀▀▀     ███▌ ███   ███           ▀▀███▀▀▀▀███▀  ▀███████████ ███    ███ 
+  ███    █▄  ███  ███   ███             ███    ███     ███    ███ ███    ███ 
+  ███    ███ ███  ███   ███             ███    ███     ███    ███ ███    ███ 
+  ██████████ █▀    ▀█   █▀              ███    █▀      ███    █▀  ████████▀  
+                                                                             
+  
+      _,.
+    ,` -.)
+   ( _/-\\-._
+  /,|`--._,-^|      ------,
+  \_| |`-._/||      ----,'|
+    |  `-, / |      ---/  /
+    |     || |     ---/  /
+     `r-._||/   __   /  /
+ __,-<_     )`-/  `./  /
+'  \   `---'   \   /  /
+    |           |./  /
+    /           //  /
+\_/' \         |/  /
+ |    |   _,^-'/  /
+ |    , ``  (\/  /_
+  \,.->._    \X-=/^
+  (  /   `-._//^`
+   `Y-.____(__}
+    |     {__)
+          ()
+     
+""",
+    ActionType.THRUST: r"""
+   ▄████████     ███        ▄████████  ▄████████    ▄█    █▄       ▄████████ ███▄▄▄▄   
+  ███    ███ ▀█████████▄   ███    ███ ███    ███   ███    ███     ███    ███ ███▀▀▀██▄ 
+  ███    █▀     ▀███▀▀██   ███    █▀  ███    █▀    ███    ███     ███    █▀  ███   ███ 
+  ███            ███   ▀  ▄███▄▄▄     ███         ▄███▄▄▄▄███▄▄  ▄███▄▄▄     ███   ███ 
+▀███████████     ███     ▀▀███▀▀▀     ███        ▀▀███▀▀▀▀███▀  ▀▀███▀▀▀     ███   ███ 
+         ███     ███       ███    █▄  ███    █▄    ███    ███     ███    █▄  ███   ███ 
+   ▄█    ███     ███       ███    ███ ███    ███   ███    ███     ███    ███ ███   ███ 
+ ▄████████▀     ▄████▀     ██████████ ████████▀    ███    █▀      ██████████  ▀█   █▀  
+                                                                                       
+                            _  
+                            \\                
+                            ,--.                       
+                          _',|| )                    
+            ,.,,.,-----""' "--v-.___      |  ________   
+            |,"---.--''/       /,.__"")`-:|._________>
+                      /     ,."'          | 
+                   _ )______;                          
+                _,' |  .''''""---.              
+            _,-'  ." \/,,..---/_ /                   
+          ,-\,.'''            \ (                    
+      _ .".--"                ( :                    
+    ,- ,."                    ; !                    
+___(_(."           -------....L_">
+
+
+""",
+    ActionType.DEFEND: r"""
+ ▄█    █▄     ▄████████    ▄████████    ▄████████    ▄████████     ███      ▄███████▄     ▄████████ ███▄▄▄▄   
+███    ███   ███    ███   ███    ███   ███    ███   ███    ███ ▀█████████▄ ██▀     ▄██   ███    ███ ███▀▀▀██▄ 
+███    ███   ███    █▀    ███    ███   ███    █▀    ███    █▀     ▀███▀▀██       ▄███▀   ███    █▀  ███   ███ 
+███    ███  ▄███▄▄▄      ▄███▄▄▄▄██▀   ███         ▄███▄▄▄         ███   ▀  ▀█▀▄███▀▄▄  ▄███▄▄▄     ███   ███ 
+███    ███ ▀▀███▀▀▀     ▀▀███▀▀▀▀▀   ▀███████████ ▀▀███▀▀▀         ███       ▄███▀   ▀ ▀▀███▀▀▀     ███   ███ 
+███    ███   ███    █▄  ▀███████████          ███   ███    █▄      ███     ▄███▀         ███    █▄  ███   ███ 
+███    ███   ███    ███   ███    ███    ▄█    ███   ███    ███     ███     ███▄     ▄█   ███    ███ ███   ███ 
+ ▀██████▀    ██████████   ███    ███  ▄████████▀    ██████████    ▄████▀    ▀████████▀   ██████████  ▀█   █▀  
+                          ███    ███                                                                          
+""",
+    ActionType.FEINT: r"""
+███▄▄▄▄      ▄████████  ▄████████    ▄█    █▄       ▄████████    ▄████████  ▄█     ▄████████    ▄████████ ███▄▄▄▄   
+███▀▀▀██▄   ███    ███ ███    ███   ███    ███     ███    ███   ███    ███ ███    ███    ███   ███    ███ ███▀▀▀██▄ 
+███   ███   ███    ███ ███    █▀    ███    ███     ███    ███   ███    █▀  ███▌   ███    █▀    ███    █▀  ███   ███ 
+███   ███   ███    ███ ███         ▄███▄▄▄▄███▄▄  ▄███▄▄▄▄██▀  ▄███▄▄▄     ███▌   ███         ▄███▄▄▄     ███   ███ 
+███   ███ ▀███████████ ███        ▀▀███▀▀▀▀███▀  ▀▀███▀▀▀▀▀   ▀▀███▀▀▀     ███▌ ▀███████████ ▀▀███▀▀▀     ███   ███ 
+███   ███   ███    ███ ███    █▄    ███    ███   ▀███████████   ███    █▄  ███           ███   ███    █▄  ███   ███ 
+███   ███   ███    ███ ███    ███   ███    ███     ███    ███   ███    ███ ███     ▄█    ███   ███    ███ ███   ███ 
+ ▀█   █▀    ███    █▀  ████████▀    ███    █▀      ███    ███   ██████████ █▀    ▄████████▀    ██████████  ▀█   █▀  
+                                                   ███    ███                                                       
+""",
+    ActionType.REST: r"""
+   ▄█    █▄    ███    █▄      ███        ▄████████ ███▄▄▄▄   
+  ███    ███   ███    ███ ▀█████████▄   ███    ███ ███▀▀▀██▄ 
+  ███    ███   ███    ███    ▀███▀▀██   ███    █▀  ███   ███ 
+ ▄███▄▄▄▄███▄▄ ███    ███     ███   ▀  ▄███▄▄▄     ███   ███ 
+▀▀███▀▀▀▀███▀  ███    ███     ███     ▀▀███▀▀▀     ███   ███ 
+  ███    ███   ███    ███     ███       ███    █▄  ███   ███ 
+  ███    ███   ███    ███     ███       ███    ███ ███   ███ 
+  ███    █▀    ████████▀     ▄████▀     ██████████  ▀█   █▀  
+                                                             
+            {}
+           {{}}
+           {{}}
+            {}
+          .-''-.
+         /  __  \
+        /.-'  '-.\
+        \::.  .::/
+         \'    '/
+    __ ___)    (___ __
+  .'   \\        //   `.
+ /     | '-.__.-' |     \
+ |     |  '::::'  |     |
+ |    /    '::'    \    |
+ |_.-;\     __     /;-._|
+ \.'^`\\    \/    //`^'./
+ /   _.-._ _||_ _.-._   \
+`\___\    '-..-'    /___/`
+     /'---.  `\.---'\
+    ||    |`\\\|    ||
+    ||    | || |    ||
+    |;.__.' || '.__.;|
+    |       ||       |
+    {{{{{{{{||}}}}}}}}
+     |      ||      |
+     |.-==-.||.-==-.|
+     <.    .||.    .>
+      \'=='/||\'=='/
+      |   / || \   |
+      |   | || |   |
+      |   | || |   |
+      /^^\| || |/^^\
+     /   .' || '.   \
+    /   /   ||   \   \
+   (__.'    \/    '.__)
+""",
+}
+
+TITLE_ART = r"""
+  █████▒▓█████  ▄████▄   ██░ ██ ▄▄▄█████▓ ███▄ ▄███▓▓█████  ██▓  ██████ ▄▄▄█████▓▓█████  ██▀███  
+▓██   ▒ ▓█   ▀ ▒██▀ ▀█  ▓██░ ██▒▓  ██▒ ▓▒▓██▒▀█▀ ██▒▓█   ▀ ▓██▒▒██    ▒ ▓  ██▒ ▓▒▓█   ▀ ▓██ ▒ ██▒
+▒████ ░ ▒███   ▒▓█    ▄ ▒██▀▀██░▒ ▓██░ ▒░▓██    ▓██░▒███   ▒██▒░ ▓██▄   ▒ ▓██░ ▒░▒███   ▓██ ░▄█ ▒
+░▓█▒  ░ ▒▓█  ▄ ▒▓▓▄ ▄██▒░▓█ ░██ ░ ▓██▓ ░ ▒██    ▒██ ▒▓█  ▄ ░██░  ▒   ██▒░ ▓██▓ ░ ▒▓█  ▄ ▒██▀▀█▄  
+░▒█░    ░▒████▒▒ ▓███▀ ░░▓█▒░██▓  ▒██▒ ░ ▒██▒   ░██▒░▒████▒░██░▒██████▒▒  ▒██▒ ░ ░▒████▒░██▓ ▒██▒
+ ▒ ░    ░░ ▒░ ░░ ░▒ ▒  ░ ▒ ░░▒░▒  ▒ ░░   ░ ▒░   ░  ░░░ ▒░ ░░▓  ▒ ▒▓▒ ▒ ░  ▒ ░░   ░░ ▒░ ░░ ▒▓ ░▒▓░
+ ░       ░ ░  ░  ░  ▒    ▒ ░▒░ ░    ░    ░  ░      ░ ░ ░  ░ ▒ ░░ ░▒  ░ ░    ░     ░ ░  ░  ░▒ ░ ▒░
+ ░ ░       ░   ░         ░  ░░ ░  ░      ░      ░      ░    ▒ ░░  ░  ░    ░         ░     ░░   ░ 
+           ░  ░░ ░       ░  ░  ░                ░      ░  ░ ░        ░              ░  ░   ░     
+               ░                                                                                 
+                                                                     
+"""
+
+DEFEAT_ART = r"""
+         _________ _______ _________          _______          _______  _______ 
+|\     /|\__   __/(  ____ \\__   __/|\     /|(  ____ \        (  ____ \(  ____ \
+| )   ( |   ) (   | (    \/   ) (   | )   ( || (    \/        | (    \/| (    \/
+| |   | |   | |   | |         | |   | |   | || (_____         | (__    | (_____ 
+( (   ) )   | |   | |         | |   | |   | |(_____  )        |  __)   (_____  )
+ \ \_/ /    | |   | |         | |   | |   | |      ) |        | (            ) |
+  \   /  ___) (___| (____/\   | |   | (___) |/\____) |        | (____/\/\____) |
+   \_/   \_______/(_______/   )_(   (_______)\_______)        (_______/\_______)
+                                                                                   
+"""
+
+VICTORY_ART = r"""
+         _________ _______ _________ _______  _______          _______  _______ 
+|\     /|\__   __/(  ____ \\__   __/(  ___  )(  ____ )        (  ____ \(  ____ \
+| )   ( |   ) (   | (    \/   ) (   | (   ) || (    )|        | (    \/| (    \/
+| |   | |   | |   | |         | |   | |   | || (____)|        | (__    | (_____ 
+( (   ) )   | |   | |         | |   | |   | ||     __)        |  __)   (_____  )
+ \ \_/ /    | |   | |         | |   | |   | || (\ (           | (            ) |
+  \   /  ___) (___| (____/\   | |   | (___) || ) \ \__        | (____/\/\____) |
+   \_/   \_______/(_______/   )_(   (_______)|/   \__/        (_______/\_______)
+                                                                                
+                                                                        
+"""
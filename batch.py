@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vectorised batch simulator: N AI-vs-AI duels held as struct-of-arrays and
+advanced one round per step with NumPy masked operations. The rules mirror
+step_round()/ai_choose_action() in rules.py, so win rates and duel
+lengths match the scalar engine statistically under a seeded Generator.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from rules import (ACTION_RULES, INFLICTED_WOUNDS, STARVED_STAMINA, WOUND_RULES, ActionType, DamageType, Guard,
+                   Knight, Terrain, make_default_duel, simulate_duel)
+
+STRIKE, THRUST, DEFEND, FEINT, REST = (t.value for t in ActionType)
+NO_GUARD = Guard.NO.value
+
+# Indexed by ActionType value, as in calculate_stamina_cost()
+BASE_COST = np.array([r.base_cost for r in ACTION_RULES], dtype=np.int16)
+
+# Columns of KnightArrays.wounds, in INFLICTED_WOUNDS order
+INFLICTED_RULES = [WOUND_RULES[w.value] for w in INFLICTED_WOUNDS]
+
+
+# Every dice roll a knight makes in a round comes from one uniform integer per row:
+# AI choice (fifths of d100) x target x coin, then feint x wound x wound location, then terrain
+AI_ROLLS, ATTACK_ROLLS, TERRAIN_ROLLS = 5 * 3 * 2, 2 * 5 * 4, 10
+ROLLS = AI_ROLLS * ATTACK_ROLLS * TERRAIN_ROLLS
+
+
+# (roll % k, roll // k); NumPy's integer % is several times slower than //
+def split_roll(roll, k: int):
+    rest = roll // k
+    return roll - rest * k, rest
+
+
+# Branch-free np.where(mask, a, b) for integer arrays; np.where is an order of magnitude
+# slower when the mask is random, which every mask in a round is
+def pick(mask, a, b):
+    return b + (a - b) * mask
+
+
+# One side of every duel in the batch
+class KnightArrays:
+    FIELDS = ("health", "stamina", "max_stamina", "fatigue", "initiative", "guard", "wounds",
+              "damage", "speed", "load", "coverage", "defense",
+              "weight_factor", "regen_base", "strike_damage", "thrust_damage")
+
+    def __init__(self, knights, n: int):
+        def col(attr, dtype=np.int16):
+            if isinstance(knights, Knight):
+                return np.full(n, attr(knights), dtype=dtype)
+            return np.array([attr(k) for k in knights], dtype=dtype)
+
+        self.health = col(lambda k: k.health)
+        self.stamina = col(lambda k: k.stamina)
+        self.max_stamina = col(lambda k: k.max_stamina)
+        self.fatigue = col(lambda k: k.fatigue)
+        self.initiative = col(lambda k: k.initiative)
+        self.guard = col(lambda k: k.current_guard.value, np.int8)
+        self.wounds = np.zeros((n, len(INFLICTED_WOUNDS)), dtype=np.int16)
+
+        # Loadout, fixed for the whole duel
+        self.damage = col(lambda k: k.weapon.damage)
+        self.speed = col(lambda k: k.weapon.speed)
+        self.load = col(lambda k: k.weapon.weight + k.armor.weight)
+        self.coverage = col(lambda k: k.armor.coverage, np.float64) / 100
+        self.defense = np.stack([col(lambda k: k.armor.defense[t.value], np.float64) for t in DamageType], axis=1)
+        self.weight_factor = self.load // 5
+        self.regen_base = 10 - self.load // 2
+
+    # Damage this side deals per landed strike/thrust against the other side's armour
+    def face(self, other: "KnightArrays"):
+        def reduced(dmg_type):
+            return np.maximum(1, np.trunc(self.damage - other.defense[:, dmg_type] * other.coverage))
+        self.strike_damage = reduced(0).astype(np.int16)
+        self.thrust_damage = reduced(1).astype(np.int16)
+
+    def alive(self):
+        return self.health > 0
+
+    def take(self, rows):
+        for name in self.FIELDS:
+            setattr(self, name, getattr(self, name)[rows])
+
+
+class BatchDuel:
+    def __init__(self, player, opponent, env, n: int, seed=None, max_rounds: int = 500):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        self.max_rounds = max_rounds
+        self.player = KnightArrays(player, n)
+        self.opponent = KnightArrays(opponent, n)
+        self.player.face(self.opponent)
+        self.opponent.face(self.player)
+        self.rough = env.type == Terrain.ROUGH
+        self.obstacle_density = env.obstacle_density
+        self.rounds = np.zeros(n, dtype=np.int32)
+        self.active = self.player.alive() & self.opponent.alive()
+
+        # Finished duels are copied out here so the live arrays can shrink to the unfinished ones
+        self.size = n
+        self._index = np.arange(n)
+        self.final_rounds = np.zeros(n, dtype=np.int32)
+        self.final_player_health = self.player.health.copy()
+        self.final_opponent_health = self.opponent.health.copy()
+
+    # Vectorised ai_choose_action() from a roll in range(AI_ROLLS)
+    def _choose_actions(self, me: KnightArrays, other: KnightArrays, roll):
+        coin, roll = split_roll(roll, 2)        # STRIKE or THRUST when pressing a tired foe
+        target, choice = split_roll(roll, 3)
+        a_type = np.maximum(choice - 1, STRIKE)  # 40/20/20/20 split of the d100 roll, in fifths
+        target = pick(a_type == DEFEND, NO_GUARD, target)
+        a_type = pick(other.fatigue > 50, coin, a_type)
+        target = pick(other.guard != NO_GUARD, other.guard, target)
+        resting = (me.stamina < STARVED_STAMINA) | (me.fatigue > 80)
+        return pick(resting, REST, a_type), pick(resting, NO_GUARD, target)
+
+    # Vectorised resolve_attack() outcome from a roll in range(ATTACK_ROLLS):
+    # hit mask, damage and wound (-1 for none)
+    def _attack(self, att: KnightArrays, dfn: KnightArrays, a_type, a_target, d_type, roll):
+        feint_roll, roll = split_roll(roll, 2)  # 50% feint roll
+        wound_roll, wound = split_roll(roll, 5)  # 20% wound roll, then location
+        d_guard = dfn.guard
+        feint = a_type == FEINT
+        defend = d_type == DEFEND
+        blocked = defend & (d_guard == a_target)
+        open_hit = ~blocked & ((a_target != d_guard) | (d_type == REST))
+        offensive = (a_type != DEFEND) & (a_type != REST)
+        hit = offensive & ((feint & defend & (feint_roll == 0)) | (~feint & open_hit))
+
+        damage = pick(a_type == THRUST, att.thrust_damage, att.strike_damage)
+        damage = pick(feint, att.damage, damage)   # feints are never reduced by armour
+        wound = pick(hit & (wound_roll == 0), wound, -1)
+        return hit, damage, wound
+
+    # Apply an attack outcome (and apply_wound()) to the defender on the rows in mask
+    def _apply_hit(self, k: KnightArrays, outcome, mask):
+        hit, damage, wound = outcome
+        k.health -= damage * (hit & mask)
+        np.maximum(k.health, 0, out=k.health)
+
+        # Wounds are rare, so work on their row indices rather than full-width masks
+        rows = np.flatnonzero(mask & (wound >= 0))
+        if not len(rows):
+            return
+        kind = wound[rows]
+        for column, w in enumerate(INFLICTED_RULES):
+            hurt = rows[kind == column]
+            if w.health:
+                k.health[hurt] = np.maximum(0, k.health[hurt] - w.health)
+            if w.stamina:
+                k.stamina[hurt] = np.maximum(0, k.stamina[hurt] - w.stamina)
+            if w.max_stamina:
+                k.max_stamina[hurt] = np.maximum(50, k.max_stamina[hurt] - w.max_stamina)
+            if w.fatigue:
+                k.fatigue[hurt] = np.minimum(100, k.fatigue[hurt] + w.fatigue)
+            if w.initiative:
+                k.initiative[hurt] = np.maximum(0, k.initiative[hurt] - w.initiative)
+        k.wounds[rows, kind] += 1
+
+    # Stamina/fatigue bookkeeping and regen from step_round()
+    def _recover(self, k: KnightArrays, a_type, cost, mask):
+        resting = a_type == REST
+        k.stamina -= cost * (mask & ~resting)
+        np.maximum(k.stamina, 0, out=k.stamina)
+        k.fatigue += (5 - 15 * resting) * mask
+        np.clip(k.fatigue, 0, 100, out=k.fatigue)
+
+        # Capping once after rest + regen is the same as capping after each, as both only add
+        regen = np.maximum(1, k.regen_base - k.fatigue // 20)
+        k.stamina += (20 * resting + regen) * mask
+        k.stamina = pick(mask, np.minimum(k.stamina, k.max_stamina), k.stamina)
+        k.max_stamina = pick(mask, np.maximum(50, 100 - k.fatigue // 2), k.max_stamina)
+
+    # Every dice roll of a round, one uniform integer per knight split up:
+    # (player AI, opponent AI, player attack, opponent attack, terrain)
+    def _roll(self) -> tuple:
+        p_roll = (self.rng.random(self.n) * ROLLS).astype(np.int16)
+        o_roll = (self.rng.random(self.n) * ROLLS).astype(np.int16)
+        p_ai_roll, p_roll = split_roll(p_roll, AI_ROLLS)
+        o_ai_roll, o_roll = split_roll(o_roll, AI_ROLLS)
+        p_attack_roll, terrain_roll = split_roll(p_roll, ATTACK_ROLLS)
+        o_attack_roll, _ = split_roll(o_roll, ATTACK_ROLLS)
+        return p_ai_roll, o_ai_roll, p_attack_roll, o_attack_roll, terrain_roll
+
+    # The rest of step_round() once both sides have chosen, on the rows in active. Starting guards
+    # are the knights' guards as they stand.
+    def _play(self, p_type, p_target, o_type, o_target, p_attack_roll, o_attack_roll, terrain_roll, active):
+        p, o = self.player, self.opponent
+
+        # Forced rest when the action can't be paid for
+        p_cost = np.take(BASE_COST, p_type) + p.weight_factor
+        o_cost = np.take(BASE_COST, o_type) + o.weight_factor
+        p_forced = p.stamina < p_cost
+        o_forced = o.stamina < o_cost
+        p_type, p_target = pick(p_forced, REST, p_type), pick(p_forced, NO_GUARD, p_target)
+        o_type, o_target = pick(o_forced, REST, o_type), pick(o_forced, NO_GUARD, o_target)
+
+        # Both attacks depend only on actions and loadouts, so roll them up front and
+        # apply them in initiative order; the second mover only strikes if still standing
+        p_attack = self._attack(p, o, p_type, p_target, o_type, p_attack_roll)
+        o_attack = self._attack(o, p, o_type, o_target, p_type, o_attack_roll)
+        p_first = p.initiative + p.speed - p.fatigue // 10 >= o.initiative + o.speed - o.fatigue // 10
+        self._apply_hit(p, o_attack, active & ~p_first)
+        self._apply_hit(o, p_attack, active & (p_first | p.alive()))
+        self._apply_hit(p, o_attack, active & p_first & o.alive())
+
+        if self.rough:
+            hindered = active & (terrain_roll < self.obstacle_density)
+            p.fatigue += 5 * hindered
+            o.fatigue += 5 * hindered
+            np.minimum(p.fatigue, 100, out=p.fatigue)
+            np.minimum(o.fatigue, 100, out=o.fatigue)
+
+        self._recover(p, p_type, p_cost, active)
+        self._recover(o, o_type, o_cost, active)
+
+    # Advance every unfinished duel by one round; returns False once all are over
+    def step(self) -> bool:
+        active = self.active
+        if not active.any():
+            return False
+        p, o = self.player, self.opponent
+        p_ai_roll, o_ai_roll, *attack_rolls = self._roll()
+        p_type, p_target = self._choose_actions(p, o, p_ai_roll)
+        o_type, o_target = self._choose_actions(o, p, o_ai_roll)
+        self._play(p_type, p_target, o_type, o_target, *attack_rolls, active)
+
+        self.rounds += active
+        self.active = active & p.alive() & o.alive() & (self.rounds < self.max_rounds)
+        if self.n > 1024 and np.count_nonzero(self.active) < self.n * 0.9:
+            self._compact()
+        return True
+
+    # Copy out finished duels and shrink the live arrays to the unfinished ones
+    def _compact(self):
+        self._record()
+        keep = np.flatnonzero(self.active)
+        self.player.take(keep)
+        self.opponent.take(keep)
+        self.rounds = self.rounds[keep]
+        self.active = self.active[keep]
+        self._index = self._index[keep]
+        self.n = len(keep)
+
+    def _record(self):
+        self.final_rounds[self._index] = self.rounds
+        self.final_player_health[self._index] = self.player.health
+        self.final_opponent_health[self._index] = self.opponent.health
+
+    def run(self):
+        while self.step():
+            pass
+        self._record()
+        return self
+
+    # Outcome counts over the finished duels
+    def results(self) -> dict:
+        p_dead = self.final_player_health <= 0
+        o_dead = self.final_opponent_health <= 0
+        return {
+            "duels": self.size,
+            "player_wins": int(np.count_nonzero(o_dead & ~p_dead)),
+            "opponent_wins": int(np.count_nonzero(p_dead & ~o_dead)),
+            "draws": int(np.count_nonzero(p_dead == o_dead)),
+            "mean_rounds": float(self.final_rounds.mean()),
+            "total_rounds": int(self.final_rounds.sum()),
+        }
+
+
+def _report(label: str, res: dict, elapsed: float):
+    n = res["duels"]
+    win = res["player_wins"] / n
+    stderr = (win * (1 - win) / n) ** 0.5
+    print(f"{label:>7}: {n} duels, player win rate {win:.4f} ± {1.96 * stderr:.4f}, "
+          f"mean length {res['mean_rounds']:.2f} rounds, {res['total_rounds'] / elapsed:,.0f} rounds/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo duels with the vectorised batch simulator")
+    parser.add_argument("--duels", type=int, default=100_000)
+    parser.add_argument("--scalar", type=int, default=5_000, help="scalar duels to compare against (0 to skip)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-rounds", type=int, default=500)
+    parser.add_argument("--player", metavar="ID", help="player loadout from the content packs (see content.py)")
+    parser.add_argument("--opponent", metavar="ID", help="opponent loadout")
+    parser.add_argument("--arena", metavar="ID", help="terrain")
+    args = parser.parse_args()
+
+    if args.player or args.opponent or args.arena:
+        import content
+        try:
+            registry = content.load()
+            ids = (args.player or content.DEFAULT_PLAYER, args.opponent or content.DEFAULT_OPPONENT,
+                   args.arena or content.DEFAULT_ARENA)
+            registry.duel(*ids)
+        except content.ContentError as e:
+            sys.exit(str(e))
+        make_duel = lambda: registry.duel(*ids)
+    else:
+        make_duel = make_default_duel
+
+    template = make_duel()
+    start = time.perf_counter()
+    batch = BatchDuel(template.player, template.opponent, template.env, args.duels,
+                      seed=args.seed, max_rounds=args.max_rounds).run()
+    batch_time = time.perf_counter() - start
+    batch_res = batch.results()
+    _report("batch", batch_res, batch_time)
+
+    if args.scalar:
+        rng = random.Random(args.seed)
+        res = {"duels": args.scalar, "player_wins": 0, "opponent_wins": 0, "draws": 0}
+        lengths = []
+        start = time.perf_counter()
+        for _ in range(args.scalar):
+            state = make_duel()
+            lengths.append(simulate_duel(state, rng, args.max_rounds))
+            p_dead, o_dead = state.player.health <= 0, state.opponent.health <= 0
+            key = "draws" if p_dead == o_dead else "player_wins" if o_dead else "opponent_wins"
+            res[key] += 1
+        scalar_time = time.perf_counter() - start
+        res["mean_rounds"] = sum(lengths) / len(lengths)
+        res["total_rounds"] = sum(lengths)
+        _report("scalar", res, scalar_time)
+        speedup = (batch_res["total_rounds"] / batch_time) / (res["total_rounds"] / scalar_time)
+        print(f"Speed-up: {speedup:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Team battles: two sides of any size fight under the duel rules. Each round
+every knight still standing picks an action against a target on the other
+side, and all the attacks of the round are resolved in initiative order,
+by the same initiative + weapon speed - fatigue // 10 as resolve_combat(),
+popped from a heap. Attacks go through resolve_attack(), so damage, blocks,
+feints and wounds work exactly as in a duel; a knight defends with the
+action it chose for the round, whoever comes at it. A knight whose target
+has fallen turns on another enemy.
+
+The living of each side are kept in an array with O(1) removal, so the
+fallen are never looked at again and a round costs O(n log n) in the
+number of knights still standing. A battle of one knight a side plays out
+as simulate_duel() does with the same seed, blow for blow; only the fallen
+knight's stamina differs, as a battle stops counting it.
+
+Battle.deploy() puts the armies on a battlefield (grid.py, requires numpy):
+targets are then the nearest enemies, a blow needs its target within the
+weapon's reach, and knights out of reach close in instead of attacking.
+
+    python battle.py --side longsword_plate:50 --side dagger_chainmail:80 --arena open --battles 20
+    python battle.py --scale 100,1000,10000
+    python battle.py --side zweihander_plate:30 --side rapier_doublet:40 --arena narrow --grid --map
+"""
+
+import argparse
+import heapq
+import random
+import sys
+import time
+from dataclasses import dataclass
+
+from rules import (ActionType, Environment, Event, EventType, Terrain, ai_choose_action,
+                   calculate_stamina_cost, check_forced_rest, regenerate, resolve_attack, update_stamina)
+
+
+@dataclass(slots=True)
+class BattleRound:
+    round_num: int
+    events: list
+    fallen: list  # Indices into Battle.knights, in the order they fell
+
+
+class Battle:
+    def __init__(self, sides: list, env: Environment):
+        if len(sides) != 2:
+            raise ValueError("a battle has two sides")
+        self.env = env
+        self.knights = [k for side in sides for k in side]
+        self.side = [s for s, side in enumerate(sides) for _ in side]
+        # The living of each side, and where each knight is in its side's list
+        self.alive = [[], []]
+        self.slot = [0] * len(self.knights)
+        for i, knight in enumerate(self.knights):
+            if knight.health > 0:
+                self.slot[i] = len(self.alive[self.side[i]])
+                self.alive[self.side[i]].append(i)
+        self.targets = [-1] * len(self.knights)
+        self.actions = [None] * len(self.knights)
+        self.costs = [0] * len(self.knights)
+        self.field = None
+        self.round_num = 1
+
+    # Draw the armies up on a battlefield generated from the environment (see grid.py)
+    def deploy(self, seed: int, width: int = None, height: int = None):
+        from grid import Battlefield
+        self.field = Battlefield.for_battle(self, seed, width, height)
+
+    def over(self) -> bool:
+        return not self.alive[0] or not self.alive[1]
+
+    # 0 or 1, or None while both sides stand
+    def winner(self):
+        if not self.alive[1] and self.alive[0]:
+            return 0
+        if not self.alive[0] and self.alive[1]:
+            return 1
+        return None
+
+    def standing(self, side: int) -> int:
+        return len(self.alive[side])
+
+    # Move the last of the side into the fallen knight's place
+    def fall(self, i: int):
+        alive = self.alive[self.side[i]]
+        last = alive.pop()
+        if last != i:
+            alive[self.slot[i]] = last
+            self.slot[last] = self.slot[i]
+        if self.field is not None:
+            self.field.remove(i)
+
+    # The knight's target, or a new one if it has fallen (or, on a field, is out of reach); None if
+    # the other side is gone
+    def target(self, i: int, rng: random.Random):
+        t = self.targets[i]
+        if self.field is not None:
+            if t < 0 or self.knights[t].health <= 0 or not self.field.in_reach(i, t):
+                t = self.field.choose_target(i, t)
+                if t is None:
+                    return None
+                self.targets[i] = t
+            return t
+        if t < 0 or self.knights[t].health <= 0:
+            enemies = self.alive[1 - self.side[i]]
+            if not enemies:
+                return None
+            # A last enemy costs no roll, so one-on-one uses the dice as a duel does
+            t = enemies[0] if len(enemies) == 1 else enemies[rng.randrange(len(enemies))]
+            self.targets[i] = t
+        return t
+
+
+# Play one round of a battle. ai has the signature of ai_choose_action(), with the target as the opponent.
+def step_battle(battle: Battle, rng: random.Random, ai=ai_choose_action) -> BattleRound:
+    knights, actions, costs, env, field = battle.knights, battle.actions, battle.costs, battle.env, battle.field
+    events, fallen = [], []
+    living = battle.alive[0] + battle.alive[1]
+
+    # Everyone chooses before anyone takes up a new guard, as in step_round()
+    for i in living:
+        actions[i] = ai(knights[i], knights[battle.target(i, rng)], env, rng)
+    order = []
+    for i in living:
+        knight = knights[i]
+        costs[i] = calculate_stamina_cost(actions[i], knight)
+        actions[i] = check_forced_rest(knight, actions[i], costs[i], events)
+        knight.current_guard = actions[i].starting_guard
+        # Highest initiative first; on a tie the lower index, so side 0 as the player in a duel
+        order.append((knight.fatigue // 10 - knight.initiative - knight.weapon.speed, i))
+    heapq.heapify(order)
+
+    while order:
+        i = heapq.heappop(order)[1]
+        attacker = knights[i]
+        if attacker.health <= 0:  # Fell earlier this round
+            continue
+        j = battle.target(i, rng)
+        if j is None:
+            break
+        if field is not None and not field.in_reach(i, j):
+            # Close in instead of striking; a resting knight holds its ground
+            if actions[i].type != ActionType.REST:
+                costs[i] = field.advance(i, j)
+            continue
+        defender = knights[j]
+        resolve_attack(attacker, defender, actions[i], actions[j], events, rng)
+        if defender.health <= 0:
+            battle.fall(j)
+            fallen.append(j)
+
+    survivors = battle.alive[0] + battle.alive[1]
+    if env.type == Terrain.ROUGH and rng.randint(0, 99) < env.obstacle_density * 10:
+        for i in survivors:
+            knights[i].fatigue = min(100, knights[i].fatigue + 5)
+        events.append(Event(EventType.TERRAIN))
+    for i in survivors:
+        update_stamina(knights[i], actions[i], costs[i])
+        regenerate(knights[i])
+
+    result = BattleRound(battle.round_num, events, fallen)
+    battle.round_num += 1
+    return result
+
+
+# Run a battle headlessly; returns the number of rounds played
+def simulate_battle(battle: Battle, rng: random.Random, max_rounds: int = 500, ai=ai_choose_action) -> int:
+    rounds = 0
+    while not battle.over() and rounds < max_rounds:
+        step_battle(battle, rng, ai)
+        rounds += 1
+    return rounds
+
+
+# "loadout:count,loadout:count" -> knights, named after their loadouts
+def make_side(registry, spec: str, label: str) -> list:
+    knights = []
+    for part in spec.split(","):
+        loadout_id, _, count = part.partition(":")
+        loadout = registry.loadout(loadout_id.strip())
+        count = int(count or 1)
+        if count < 1:
+            raise ValueError(f"{part.strip()}: a count must be at least 1")
+        for n in range(count):
+            knights.append(registry.knight(loadout.id, f"{label} {loadout.name} #{n + 1}"))
+    return knights
+
+
+def report(name: str, battles: list, elapsed: float):
+    wins = [sum(1 for b, _ in battles if b.winner() == s) for s in (0, 1)]
+    rounds = sum(r for _, r in battles)
+    print(f"{name}: {len(battles)} battles, side A won {wins[0]}, side B won {wins[1]}, "
+          f"undecided {len(battles) - sum(wins)}; mean {rounds / len(battles):.1f} rounds, "
+          f"{sum(b.standing(0) + b.standing(1) for b, _ in battles) / len(battles):.1f} left standing "
+          f"in {elapsed:.2f}s ({rounds / elapsed:,.1f} rounds/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless battles between two sides of knights")
+    parser.add_argument("--side", action="append", metavar="LOADOUT:COUNT,...",
+                        help="a side, as loadout ids from the content packs with counts; give two")
+    parser.add_argument("--arena", metavar="ID", help="terrain (see content.py)")
+    parser.add_argument("--battles", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-rounds", type=int, default=500)
+    parser.add_argument("--scale", metavar="N,N,...",
+                        help="time one battle of each total size between the default loadouts instead")
+    parser.add_argument("--grid", action="store_true",
+                        help="fight on a battlefield with positions, reach and movement (grid.py, requires numpy)")
+    parser.add_argument("--map", action="store_true", help="with --grid, print the last battlefield at the end")
+    args = parser.parse_args()
+
+    if args.battles < 1:
+        sys.exit("--battles must be at least 1")
+    import content
+    try:
+        registry = content.load()
+        env = registry.environment(args.arena or content.DEFAULT_ARENA)
+        if args.scale:
+            if any(int(n) < 2 for n in args.scale.split(",")):
+                sys.exit("--scale sizes must be at least 2, a knight a side")
+            specs = [(f"{content.DEFAULT_PLAYER}:{int(n) // 2}", f"{content.DEFAULT_OPPONENT}:{int(n) - int(n) // 2}")
+                     for n in args.scale.split(",")]
+        else:
+            sides = args.side or [content.DEFAULT_PLAYER + ":10", content.DEFAULT_OPPONENT + ":10"]
+            if len(sides) != 2:
+                sys.exit("give --side twice")
+            specs = [tuple(sides)] * args.battles
+        battles = [Battle([make_side(registry, a, "A"), make_side(registry, b, "B")], env) for a, b in specs]
+    except (content.ContentError, ValueError) as e:
+        sys.exit(str(e))
+
+    rng = random.Random(args.seed)
+    if args.grid:
+        try:
+            for battle in battles:
+                battle.deploy(rng.getrandbits(32))
+        except ValueError as e:
+            sys.exit(str(e))
+    if args.scale:
+        print(f"{'Knights':>8} {'Rounds':>7} {'Time':>9} {'µs per knight-round':>20}")
+        for battle in battles:
+            knight_rounds = 0
+            rounds = 0
+            start = time.perf_counter()
+            while not battle.over() and rounds < args.max_rounds:
+                knight_rounds += battle.standing(0) + battle.standing(1)
+                step_battle(battle, rng)
+                rounds += 1
+            elapsed = time.perf_counter() - start
+            print(f"{len(battle.knights):>8,} {rounds:>7} {elapsed:>8.2f}s {1e6 * elapsed / knight_rounds:>20.2f}")
+        return
+
+    start = time.perf_counter()
+    played = [(battle, simulate_battle(battle, rng, args.max_rounds)) for battle in battles]
+    report(" vs ".join(specs[0]), played, time.perf_counter() - start)
+    if args.map and battles[-1].field is not None:
+        print(battles[-1].field.format_map(), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory and speed of the game objects against the layout they replaced:
+plain dataclasses with a __dict__ per instance, a dict of armor defense
+by damage-type name, a list of wounds, and a new Action per decision.
+
+    python -m benchmarks.objects --knights 100000
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+from rules import (ActionType, Armor, DamageType, Guard, Knight, Wound, add_wound, ai_choose_action,
+                   make_action, make_default_duel, simulate_duel)
+
+
+# The previous definitions, kept only for comparison
+@dataclass
+class LegacyArmor:
+    name: str
+    defense: dict
+    weight: int
+    coverage: int
+
+
+@dataclass
+class LegacyKnight:
+    name: str
+    health: int = 100
+    stamina: int = 100
+    max_stamina: int = 100
+    fatigue: int = 0
+    weapon: object = None
+    armor: LegacyArmor = None
+    current_guard: Guard = Guard.MIDDLE
+    wounds: list = field(default_factory=list)
+    initiative: int = 10
+
+
+@dataclass
+class LegacyAction:
+    type: ActionType
+    target_guard: Guard
+    starting_guard: Guard
+
+
+WOUNDS = (Wound.ARM, Wound.LEG, Wound.HEAD)
+
+
+def allocated(make, n: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [make(i) for i in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / n
+
+
+def legacy_knight(i: int) -> LegacyKnight:
+    k = LegacyKnight(f"Knight {i}")
+    k.wounds.extend(WOUNDS)
+    return k
+
+
+def compact_knight(i: int) -> Knight:
+    k = Knight(f"Knight {i}")
+    for w in WOUNDS:
+        k.wounds = add_wound(k.wounds, w)
+    return k
+
+
+def legacy_action(i: int) -> LegacyAction:
+    a = LegacyAction(ActionType.REST, Guard.NO, Guard.MIDDLE)
+    a.type = ActionType.STRIKE
+    a.target_guard = Guard(i % 3)
+    return a
+
+
+def compact_action(i: int) -> object:
+    return make_action(ActionType.STRIKE, Guard(i % 3), Guard.MIDDLE)
+
+
+# The attribute traffic of a landed thrust: armor lookup, damage, a wound
+def legacy_hits(knights: list):
+    for k in knights:
+        damage = 12
+        if "piercing" in k.armor.defense:
+            damage -= k.armor.defense["piercing"] * (k.armor.coverage / 100)
+        k.health = max(0, k.health - max(1, int(damage)))
+        k.wounds.append(Wound.ARM)
+
+
+def compact_hits(knights: list):
+    for k in knights:
+        damage = 12
+        damage -= k.armor.defense[DamageType.PIERCING.value] * (k.armor.coverage / 100)
+        k.health = max(0, k.health - max(1, int(damage)))
+        k.wounds = add_wound(k.wounds, Wound.ARM)
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the compact game objects with the previous layout")
+    parser.add_argument("--knights", type=int, default=100_000)
+    parser.add_argument("--duels", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    n = args.knights
+
+    print(f"{'':<28} {'Previous':>10} {'Compact':>10}")
+    print(f"{'Bytes per knight':<28} {allocated(legacy_knight, n):>10.0f} {allocated(compact_knight, n):>10.0f}")
+    print(f"{'Bytes per armor':<28} "
+          f"{allocated(lambda i: LegacyArmor('Plate', {'slashing': 8, 'piercing': 6}, 5, 80), n):>10.0f} "
+          f"{allocated(lambda i: Armor('Plate', (8, 6), 5, 80), n):>10.0f}")
+    print(f"{'Bytes per action':<28} {allocated(legacy_action, n):>10.0f} {allocated(compact_action, n):>10.0f}")
+
+    legacy_armor = LegacyArmor("Plate", {"slashing": 8, "piercing": 6}, 5, 80)
+    armor = Armor("Plate", (8, 6), 5, 80)
+    legacy = [LegacyKnight(f"Knight {i}", armor=legacy_armor) for i in range(n)]
+    compact = [Knight(f"Knight {i}", armor=armor) for i in range(n)]
+    legacy_time, compact_time = timed(legacy_hits, legacy), timed(compact_hits, compact)
+    print(f"{'Hits/s':<28} {n / legacy_time:>10,.0f} {n / compact_time:>10,.0f}")
+    legacy_time = timed(lambda: [legacy_action(i) for i in range(n)])
+    compact_time = timed(lambda: [compact_action(i) for i in range(n)])
+    print(f"{'Actions/s':<28} {n / legacy_time:>10,.0f} {n / compact_time:>10,.0f}")
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    rounds = sum(simulate_duel(make_default_duel(), rng, opponent_ai=ai_choose_action) for _ in range(args.duels))
+    print(f"Stock duels: {rounds / (time.perf_counter() - start):,.0f} rounds/s")
+
+
+if __name__ == "__main__":
+    main()
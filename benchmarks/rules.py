@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks of the rules hot path: each rules and labelling function
+on its own, then whole rounds and duels between stock AIs. Only public
+functions are timed, so the same file can be run against older trees.
+
+    python -m benchmarks.rules --calls 200000
+"""
+
+import argparse
+import copy
+import random
+import time
+
+from rules import (ActionType, Guard, Wound, action_to_string, ai_choose_action, apply_wound,
+                   calculate_stamina_cost, guard_to_string, is_offensive, make_default_duel, regenerate,
+                   resolve_attack, simulate_duel, step_round, wound_to_string)
+
+
+def ns_per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    fn(calls)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def cases(rng: random.Random) -> dict:
+    state = make_default_duel()
+    player, opponent, env = state.player, state.opponent, state.env
+    actions = [ai_choose_action(opponent, player, env, rng) for _ in range(64)]
+    guards, types, wounds = list(Guard), list(ActionType), [Wound.ARM, Wound.LEG, Wound.HEAD, Wound.BODY]
+
+    def guard_labels(n):
+        for i in range(n):
+            guard_to_string(guards[i & 3])
+
+    def action_labels(n):
+        for i in range(n):
+            action_to_string(actions[i & 63])
+
+    def offensive(n):
+        for i in range(n):
+            is_offensive(types[i % 5])
+
+    def stamina_cost(n):
+        for i in range(n):
+            calculate_stamina_cost(actions[i & 63], player)
+
+    def wound(n):
+        knight = copy.deepcopy(player)
+        for i in range(n):
+            if i & 255 == 0:
+                knight.wounds, knight.health, knight.stamina, knight.initiative = 0, 100, 100, 10
+            apply_wound(knight, wounds[i & 3])
+            wound_to_string(wounds[i & 3])
+
+    def attack(n):
+        attacker, defender = copy.deepcopy(player), copy.deepcopy(opponent)
+        events = []
+        for i in range(n):
+            defender.health = 100
+            resolve_attack(attacker, defender, actions[i & 63], actions[(i + 7) & 63], events, rng)
+            if i & 255 == 0:
+                events.clear()
+
+    def regen(n):
+        knight = copy.deepcopy(player)
+        for _ in range(n):
+            knight.stamina = 50
+            regenerate(knight)
+
+    def rounds(n):
+        s = make_default_duel()
+        for i in range(n):
+            if i & 63 == 0:
+                s = make_default_duel()
+            step_round(s, ai_choose_action(s.player, s.opponent, env, rng),
+                       ai_choose_action(s.opponent, s.player, env, rng), rng)
+
+    return {
+        "guard_to_string": guard_labels,
+        "action_to_string": action_labels,
+        "is_offensive": offensive,
+        "calculate_stamina_cost": stamina_cost,
+        "apply_wound + wound_to_string": wound,
+        "resolve_attack": attack,
+        "regenerate": regen,
+        "ai_choose_action x2 + step_round": rounds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the rules functions and whole rounds")
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--duels", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs per case")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for name, fn in cases(rng).items():
+        best = min(ns_per_call(fn, args.calls) for _ in range(args.repeat))
+        print(f"{name:<34} {best:>9,.0f} ns/call")
+
+    best = 0.0
+    for _ in range(args.repeat):
+        duel_rng = random.Random(args.seed)
+        start = time.perf_counter()
+        rounds = sum(simulate_duel(make_default_duel(), duel_rng) for _ in range(args.duels))
+        best = max(best, rounds / (time.perf_counter() - start))
+    print(f"{'Stock duels':<34} {best:>9,.0f} rounds/s")
+
+
+if __name__ == "__main__":
+    main()
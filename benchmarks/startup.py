@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Import-time budget. Each module below is imported in a fresh interpreter
+under `python -X importtime`, a few times over, and its best cumulative
+time is checked against a budget. Budgets are multiples of the time to
+import `dataclasses`, timed in turn with the module, so they hold on a
+slow or busy machine as well as a fast one. Modules that simulation
+workers and servers import must also stay clear of the presentation code:
+importing them may not load fechtmeister.py or the art in artwork.py.
+Exits with status 1 if any budget is exceeded or a forbidden module is
+loaded.
+
+Times are for a warm bytecode cache, as a deployed checkout or a forked
+worker sees them; a first run after an edit compiles the sources first.
+benchmarks.suite records the same checks with every run, and its
+`compare` fails on a budget breach as it does on a slowdown.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 20 --slack 1.5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The stdlib import budgets are measured in; the rules are built on it
+REFERENCE = "dataclasses"
+
+# module -> (budget in multiples of the reference, modules it must not load)
+BUDGETS = {
+    "rules": (2.0, ("fechtmeister", "artwork")),
+    "stats": (2.2, ("fechtmeister", "artwork")),
+    "content": (2.6, ("fechtmeister", "artwork")),
+    "tournament": (5.0, ("fechtmeister", "artwork")),
+    "fechtmeister": (2.6, ("artwork",)),
+}
+
+
+# {module: cumulative µs} for one import of `module` in a fresh interpreter
+def import_times(module: str, write_bytecode: bool = False) -> dict:
+    env = dict(os.environ)
+    if write_bytecode:
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+# Times in µs of the module and of the reference, imported in turn, and the modules it loaded
+def measure(module: str, repeat: int) -> tuple:
+    import_times(module, write_bytecode=True)  # Compile anything stale, so every timed run loads bytecode
+    pairs = []
+    for _ in range(repeat):
+        times = import_times(module)
+        pairs.append((times[module], import_times(REFERENCE)[REFERENCE]))
+    return pairs, set(times)
+
+
+# A module against its budget: its import time over the reference's for each pair, and the forbidden
+# modules it loaded
+def check(module: str, repeat: int) -> tuple:
+    pairs, loaded = measure(module, repeat)
+    return pairs, [m / r for m, r in pairs], [name for name in BUDGETS[module][1] if name in loaded], len(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import times against their budgets")
+    parser.add_argument("--repeat", type=int, default=10, help="imports per module; the best is kept")
+    parser.add_argument("--slack", type=float, default=1.0, help="multiply every budget by this")
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS), help="modules to check (default: all)")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'Module':<14} {'Import':>9} {REFERENCE:>12} {'Ratio':>6} {'Budget':>6}  Loads")
+    for module in args.modules:
+        budget = BUDGETS[module][0] * args.slack
+        pairs, ratios, loads, loaded = check(module, args.repeat)
+        best, reference, ratio = min(m for m, _ in pairs), min(r for _, r in pairs), min(ratios)
+        flags = []
+        if ratio > budget:
+            flags.append("OVER BUDGET")
+        flags += [f"loads {name}" for name in loads]
+        failures += [f"{module}: {flag}" for flag in flags]
+        print(f"{module:<14} {best / 1000:>6.1f} ms {reference / 1000:>9.1f} ms {ratio:>6.2f} {budget:>6.1f}"
+              f"  {loaded} modules" + "".join(f"  {flag}" for flag in flags))
+    if failures:
+        print(f"\n{len(failures)} failure(s): {'; '.join(failures)}")
+        sys.exit(1)
+    print("\nAll imports within budget")
+
+
+if __name__ == "__main__":
+    main()
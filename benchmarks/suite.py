@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The benchmark suite: fixed seeds and fixed loadouts (the two knights of
+make_default_duel() and a synthetic heavy/light pair), covering round
+resolution, whole AI-vs-AI duels, AI decisions, frame rendering, the
+memory of a Knight and the import times of benchmarks.startup. `run`
+appends a result set to a JSON history; `compare` sets the latest result
+against an earlier one and exits with status 1 if any case got slower
+(or bigger) by more than the threshold, or by more than twice the spread
+its repeats showed, whichever is larger, or if an import is over its
+budget or loads presentation code it must not.
+Cases are timed in process CPU time, which on a shared or virtual machine
+varies much less than wall time. Needs nothing beyond the standard library.
+
+    python -m benchmarks.suite run --label before
+    python -m benchmarks.suite run --label after
+    python -m benchmarks.suite compare --threshold 0.05
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import replace
+
+from benchmarks import startup
+from fechtmeister import (Armor, DamageType, DuelState, Environment, Guard, Knight, Terrain, Weapon, ai_choose_action,
+                          format_knight_status, format_round, make_default_duel, simulate_duel, step_round)
+
+HISTORY = os.path.join(os.path.dirname(__file__), "history.json")
+
+
+# Gear at the extremes of the stamina rules: the heavy knight regenerates nothing, the light one the most
+def heavy_vs_light() -> DuelState:
+    heavy = Knight(name="Heavy", weapon=Weapon("Poleaxe", 18, 0, 9, True, DamageType.SLASHING, ""),
+                   armor=Armor("Full Harness", (10, 8), 12, 95), current_guard=Guard.HIGH, initiative=8)
+    light = Knight(name="Light", weapon=Weapon("Rapier", 7, 6, 1, False, DamageType.PIERCING, ""),
+                   armor=Armor("Arming Doublet", (1, 1), 1, 40), current_guard=Guard.LOW, initiative=14)
+    return DuelState(heavy, light, Environment(Terrain.OPEN, 0))
+
+
+LOADOUTS = {"default": make_default_duel, "heavy_vs_light": heavy_vs_light}
+
+
+# A benchmark result. better is "higher" or "lower"; noise is the spread of the repeats relative to the best.
+def result(samples: list, unit: str, better: str, **extra) -> dict:
+    best = max(samples) if better == "higher" else min(samples)
+    noise = abs(statistics.median(samples) - best) / best if best else 0.0
+    return {"value": best, "unit": unit, "better": better, "noise": noise, **extra}
+
+
+def rate(fn, count: int, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        samples.append(count / (time.process_time() - start))
+    return samples
+
+
+# The actions both stock AIs pick over a few duels, replayed against fresh states so only the rules are timed
+def recorded_rounds(make_state, seed: int, duels: int = 20) -> list:
+    rng = random.Random(seed)
+    rounds = []
+    for _ in range(duels):
+        state = make_state()
+        moves = []
+        while state.player.health > 0 and state.opponent.health > 0 and len(moves) < 500:
+            pa = ai_choose_action(state.player, state.opponent, state.env, rng)
+            oa = ai_choose_action(state.opponent, state.player, state.env, rng)
+            step_round(state, pa, oa, rng)
+            moves.append((pa, oa))
+        rounds.append(moves)
+    return rounds
+
+
+def bench_rounds(make_state, seed: int, repeat: int) -> dict:
+    duels = recorded_rounds(make_state, seed)
+    count = sum(len(d) for d in duels)
+
+    def run():
+        rng = random.Random(seed)
+        for moves in duels:
+            state = make_state()
+            for pa, oa in moves:
+                step_round(state, pa, oa, rng)
+
+    return result([1e9 / r for r in rate(run, count, repeat)], "ns/round", "lower")
+
+
+def bench_duels(make_state, seed: int, duels: int, repeat: int) -> dict:
+    samples, rounds = [], 0
+    for _ in range(repeat):
+        rng = random.Random(seed)
+        start = time.process_time()
+        rounds = sum(simulate_duel(make_state(), rng) for _ in range(duels))
+        samples.append(rounds / (time.process_time() - start))
+    # Rounds played is fixed by the seed: if it moves, the rules changed, not just their speed
+    return result(samples, "rounds/s", "higher", rounds=rounds)
+
+
+def bench_decisions(make_state, seed: int, decisions: int, repeat: int) -> dict:
+    env = make_state().env
+    # A spread of stamina, fatigue and guards, so every branch of the policy is taken
+    pairs = []
+    for i in range(64):
+        state = make_state()
+        ai, other = state.opponent, state.player
+        ai.stamina, ai.fatigue = (i * 7) % 101, (i * 13) % 101
+        other.fatigue, other.current_guard = (i * 29) % 101, Guard(i % 4)
+        pairs.append((ai, other))
+
+    def run():
+        rng = random.Random(seed)
+        for i in range(decisions):
+            ai, other = pairs[i & 63]
+            ai_choose_action(ai, other, env, rng)
+
+    return result(rate(run, decisions, repeat), "decisions/s", "higher")
+
+
+def bench_render(make_state, seed: int, repeat: int) -> dict:
+    frames = []
+    rng = random.Random(seed)
+    state = make_state()
+    while state.player.health > 0 and state.opponent.health > 0 and len(frames) < 200:
+        pa = ai_choose_action(state.player, state.opponent, state.env, rng)
+        oa = ai_choose_action(state.opponent, state.player, state.env, rng)
+        frames.append((step_round(state, pa, oa, rng), replace(state.player), replace(state.opponent)))
+
+    # One frame of the plain UI: both knights' status, then the round
+    def run():
+        for r, player, opponent in frames:
+            format_knight_status(player) + format_knight_status(opponent) + format_round(r, player, opponent)
+
+    return result([1e6 / r for r in rate(run, len(frames), repeat)], "µs/frame", "lower")
+
+
+def bench_knight_memory(make_state, count: int) -> dict:
+    template = make_state().player
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    knights = [Knight(name=template.name, weapon=template.weapon, armor=template.armor) for _ in range(count)]
+    size = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+    del knights
+    return result([size], "bytes/knight", "lower")
+
+
+# An import time as a multiple of the reference's, with the budget and the forbidden modules it loaded
+def bench_import(module: str, repeat: int) -> dict:
+    _, ratios, loads, _ = startup.check(module, repeat)
+    return result(ratios, f"x {startup.REFERENCE}", "lower", budget=startup.BUDGETS[module][0], loads=loads)
+
+
+def run_suite(args) -> dict:
+    results = {}
+    for name, make_state in LOADOUTS.items():
+        results[f"rounds[{name}]"] = bench_rounds(make_state, args.seed, args.repeat)
+        results[f"duels[{name}]"] = bench_duels(make_state, args.seed, args.duels, args.repeat)
+        results[f"ai_decisions[{name}]"] = bench_decisions(make_state, args.seed, args.decisions, args.repeat)
+        results[f"render_frame[{name}]"] = bench_render(make_state, args.seed, args.repeat)
+        print(f"  {name}: done", file=sys.stderr)
+    results["knight_memory"] = bench_knight_memory(make_default_duel, args.knights)
+    for module in startup.BUDGETS:
+        results[f"import[{module}]"] = bench_import(module, args.import_repeat)
+    print("  imports: done", file=sys.stderr)
+    return results
+
+
+# What is wrong with a result on its own, whatever it is compared with: an import over budget
+def breaches(r: dict) -> str:
+    flags = ""
+    if "budget" in r and r["value"] > r["budget"]:
+        flags += f"  OVER BUDGET ({r['budget']})"
+    flags += "".join(f"  loads {name}" for name in r.get("loads", ()))
+    return flags
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path: str) -> list:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def print_results(results: dict):
+    for name, r in results.items():
+        print(f"{name:<32} {r['value']:>14,.1f} {r['unit']:<12} ±{100 * r['noise']:.1f}%{breaches(r)}")
+
+
+# An entry of the history by label, or by index (negative counts from the latest)
+def find_entry(history: list, key: str) -> dict:
+    for entry in reversed(history):
+        if entry.get("label") == key:
+            return entry
+    try:
+        return history[int(key)]
+    except (ValueError, IndexError):
+        sys.exit(f"no run labelled or numbered {key!r} in the history ({len(history)} runs)")
+
+
+def compare(base: dict, head: dict, threshold: float) -> list:
+    regressions = []
+    print(f"{'Case':<32} {'Base':>14} {'Head':>14} {'Change':>8}  Unit")
+    for name, h in head["results"].items():
+        b = base["results"].get(name)
+        breach = breaches(h)
+        if breach:
+            regressions.append(name)
+        if b is None:
+            print(f"{name:<32} {'-':>14} {h['value']:>14,.1f} {'new':>8}  {h['unit']}{breach}")
+            continue
+        change = (h["value"] - b["value"]) / b["value"]
+        worse = -change if h["better"] == "higher" else change
+        limit = max(threshold, 2 * max(b["noise"], h["noise"]))
+        flag = breach
+        if worse > limit:
+            flag = "  REGRESSION" + flag
+            if not breach:
+                regressions.append(name)
+        elif -worse > limit:
+            flag = "  improved"
+        if "rounds" in b and b["rounds"] != h.get("rounds"):
+            flag += f"  (rounds played {b['rounds']} -> {h.get('rounds')}: the rules changed)"
+        print(f"{name:<32} {b['value']:>14,.1f} {h['value']:>14,.1f} {100 * change:>+7.1f}%  {h['unit']}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite or compare runs from its history")
+    parser.add_argument("--history", default=HISTORY, help="JSON history file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="run the suite and append the results to the history")
+    p.add_argument("--label", help="name for this run, e.g. a branch or change")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=5, help="repeats per case; the best is kept")
+    p.add_argument("--duels", type=int, default=200)
+    p.add_argument("--decisions", type=int, default=200_000)
+    p.add_argument("--knights", type=int, default=100_000)
+    p.add_argument("--import-repeat", type=int, default=10, help="imports per module; the best is kept")
+    p.add_argument("--no-save", action="store_true", help="print the results without recording them")
+
+    p = sub.add_parser("compare", help="compare two runs; exit status 1 on a regression")
+    p.add_argument("--base", default="-2", help="label or index of the run to compare against")
+    p.add_argument("--head", default="-1", help="label or index of the run to check")
+    p.add_argument("--threshold", type=float, default=0.10, help="relative slowdown tolerated as noise")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_suite(args)
+        print_results(results)
+        if not args.no_save:
+            history = load_history(args.history)
+            history.append({"label": args.label, "commit": git_commit(),
+                            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+                            "python": platform.python_version(), "machine": platform.machine(),
+                            "seed": args.seed, "results": results})
+            with open(args.history, "w") as f:
+                json.dump(history, f, indent=2)
+            print(f"\nRun {len(history) - 1} saved to {args.history}")
+    else:
+        history = load_history(args.history)
+        if len(history) < 2 and (args.base, args.head) == ("-2", "-1"):
+            sys.exit(f"need two runs in {args.history} to compare")
+        base, head = find_entry(history, args.base), find_entry(history, args.head)
+        print(f"Base: {base.get('label') or '-'} ({base.get('commit')}, {base['time']})  "
+              f"Head: {head.get('label') or '-'} ({head.get('commit')}, {head['time']})\n")
+        regressions = compare(base, head, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
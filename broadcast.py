@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Spectator broadcast: a pub/sub hub that streams duels to any number of
+watchers over TCP (`nc host 4001`, then a duel id and optionally a
+terminal class: ansi, plain or ascii).
+
+A duel holds a Channel and calls publish() after every round. That is all
+the duel pays for its audience: with nobody watching it returns at once,
+and otherwise it copies the two knights and queues the round. A fan-out
+task per channel then renders the round once per terminal class that has
+watchers (ANSI colour, plain text without escape codes, or plain ASCII),
+encodes it once, and writes the same bytes to every watcher of that class.
+Writes never wait: each watcher's transport buffer is its queue, and a
+watcher that lets WATCHER_BUFFER bytes pile up is dropped instead of
+holding up the duel or the other watchers. If the duel runs ahead of the
+fan-out, only the latest BACKLOG_ROUNDS rounds are kept.
+
+server.py --watch-port publishes every session through a hub. Run on its
+own, this module hosts AI-vs-AI exhibition duels at a round per
+--round-time seconds, or with --bench measures the cost per round with
+hundreds of real socket watchers, some of which never read:
+
+    python broadcast.py --port 4001 --duels 4
+    python broadcast.py --bench --watchers 0,100,1000 --stalled 10
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import deque
+
+from fechtmeister import (BLUE, BOLD, CYAN, GREEN, MAGENTA, RED, RESET, YELLOW, EventType, Knight, action_to_string,
+                          ai_choose_action, duel_over, format_vitals, step_round, wound_to_string)
+from screen import SGR
+from server import raise_fd_limit
+
+CLASSES = ("ansi", "plain", "ascii")
+ASCII = str.maketrans({"■": "#", "–": "-"})
+WATCHER_BUFFER = 256 * 1024  # Bytes waiting for a watcher before it is dropped
+BACKLOG_ROUNDS = 64
+
+
+# What a frame shows of a knight, in Knight's field order; a tuple costs the duel far less than a copy
+def snapshot(k: Knight) -> tuple:
+    return k.name, k.health, k.stamina, k.max_stamina, k.fatigue, k.weapon, k.armor, k.current_guard, k.wounds
+
+
+# One round for spectators, in ANSI colour: both actions, initiative, what happened, and both knights' bars
+def format_frame(title: str, result, player, opponent) -> str:
+    out = [BOLD + MAGENTA + f"\n=== {title}: round {result.round_num} ===" + RESET + "\n",
+           CYAN + f"{player.name}: {action_to_string(result.player_action)}" + RESET + "\n",
+           YELLOW + f"{opponent.name}: {action_to_string(result.opponent_action)}" + RESET + "\n"]
+    first, inits = (player, (result.player_init, result.opp_init)) if result.player_first \
+        else (opponent, (result.opp_init, result.player_init))
+    out.append(BOLD + f"{first.name} moves first (Initiative: {inits[0]} vs {inits[1]})" + RESET + "\n")
+    for e in result.events:
+        if e.type == EventType.IMPACT:
+            out.append(BOLD + RED + f"IMPACT! {e.actor.name} lands a {action_to_string(e.action)} "
+                       f"for {e.damage} damage" + RESET + "\n")
+        elif e.type == EventType.WOUND:
+            out.append(BOLD + RED + f"{e.target.name} suffers a wound to the {wound_to_string(e.wound)}!"
+                       + RESET + "\n")
+        elif e.type == EventType.DEFENDED:
+            out.append(BLUE + f"{e.target.name} blocks or avoids the {action_to_string(e.action)}" + RESET + "\n")
+        elif e.type == EventType.FORCED_REST:
+            out.append(RED + f"{e.actor.name} has not enough stamina, forced to Rest!" + RESET + "\n")
+        elif e.type == EventType.TERRAIN:
+            out.append(YELLOW + "The rough terrain hinders movement!" + RESET + "\n")
+    for knight in (player, opponent):
+        out.append(BOLD + CYAN + f"--- {knight.name} ---" + RESET + "\n" + format_vitals(knight))
+    return "".join(out)
+
+
+def format_outcome(title: str, player, opponent) -> str:
+    if (player.health <= 0) == (opponent.health <= 0):
+        text = "Both knights have fallen! It's a draw!" if player.health <= 0 else "The duel was abandoned."
+    else:
+        text = f"{(opponent if player.health <= 0 else player).name} wins!"
+    return BOLD + GREEN + f"\n=== {title}: {text} ===" + RESET + "\n"
+
+
+# Text in ANSI colour as bytes for each terminal class asked for
+def encode(text: str, classes) -> dict:
+    frames = {}
+    if "ansi" in classes:
+        frames["ansi"] = text.encode()
+    if "plain" in classes or "ascii" in classes:
+        plain = SGR.sub("", text)
+        frames["plain"] = plain.encode()
+        frames["ascii"] = plain.translate(ASCII).encode("ascii", "replace")
+    return frames
+
+
+class Watcher:
+    def __init__(self, writer: asyncio.StreamWriter, terminal: str):
+        self.transport = writer.transport
+        self.terminal = terminal
+
+    # Queue bytes without waiting; False once the watcher has been dropped
+    def send(self, data: bytes) -> bool:
+        if self.transport.is_closing():
+            return False
+        if self.transport.get_write_buffer_size() > WATCHER_BUFFER:
+            self.transport.abort()
+            return False
+        self.transport.write(data)
+        return True
+
+
+# One duel's broadcast
+class Channel:
+    def __init__(self, hub: "Hub", channel_id: int, title: str, state):
+        self.hub = hub
+        self.id = channel_id
+        self.title = title
+        self.state = state
+        self.watchers = {terminal: set() for terminal in CLASSES}
+        self.watching = 0
+        self.rounds = deque(maxlen=BACKLOG_ROUNDS)  # (result, player snapshot, opponent snapshot) not sent yet
+        self.ready = asyncio.Event()
+        self.ended = False
+        self.task = asyncio.get_running_loop().create_task(self.fan_out())
+        self.task.add_done_callback(self.fan_out_done)
+
+    # Called by the duel after each round
+    def publish(self, result):
+        if not self.watching:
+            return
+        self.rounds.append((result, snapshot(self.state.player), snapshot(self.state.opponent)))
+        self.ready.set()
+
+    def add(self, watcher: Watcher):
+        self.watchers[watcher.terminal].add(watcher)
+        self.watching += 1
+
+    def remove(self, watcher: Watcher):
+        if watcher in self.watchers[watcher.terminal]:
+            self.watchers[watcher.terminal].discard(watcher)
+            self.watching -= 1
+
+    def send(self, text: str):
+        classes = [terminal for terminal, watchers in self.watchers.items() if watchers]
+        for terminal, data in encode(text, classes).items():
+            for watcher in list(self.watchers[terminal]):
+                if watcher.send(data):
+                    self.hub.sent += len(data)
+                else:
+                    self.remove(watcher)
+                    self.hub.dropped += 1
+
+    async def fan_out(self):
+        while not self.ended or self.rounds:
+            await self.ready.wait()
+            self.ready.clear()
+            while self.rounds:
+                result, player, opponent = self.rounds.popleft()
+                if self.watching:
+                    self.send(format_frame(self.title, result, Knight(*player), Knight(*opponent)))
+                    self.hub.frames += 1
+        if self.watching:
+            self.send(format_outcome(self.title, self.state.player, self.state.opponent))
+        self.hang_up()
+
+    def hang_up(self):
+        for watchers in self.watchers.values():
+            for watcher in watchers:
+                watcher.transport.close()
+            watchers.clear()
+        self.watching = 0
+
+    # A fan-out that failed is reported when it fails rather than at shutdown, and the duel goes off the air
+    def fan_out_done(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() is None:
+            return
+        self.ended = True
+        self.hub.channels.pop(self.id, None)
+        self.hang_up()
+        task.get_loop().call_exception_handler({"message": f"Broadcast of {self.title} failed",
+                                                "exception": task.exception(), "task": task})
+
+    # The duel is over: send what is queued and the outcome, then hang up on the watchers
+    def end(self):
+        self.ended = True
+        self.ready.set()
+        self.hub.channels.pop(self.id, None)
+
+
+class Hub:
+    def __init__(self):
+        self.channels = {}
+        self.next_id = 1
+        self.sent = 0
+        self.frames = 0
+        self.dropped = 0
+
+    def open(self, title: str, state) -> Channel:
+        channel = Channel(self, self.next_id, title, state)
+        self.channels[channel.id] = channel
+        self.next_id += 1
+        return channel
+
+    def listing(self) -> str:
+        lines = [BOLD + "Live duels:" + RESET]
+        for c in self.channels.values():
+            lines.append(f"  {c.id:>4}  {c.title} (round {c.state.round_num}, {c.watching} watching)")
+        if not self.channels:
+            lines.append("  none right now")
+        return "\n".join(lines) + "\n"
+
+    # A spectator connection: pick a duel, then receive its rounds until it ends or the spectator leaves
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        watcher = channel = None
+        try:
+            writer.write((self.listing() + f"Watch which duel (id [{'|'.join(CLASSES)}]): ").encode())
+            words = (await reader.readline()).decode(errors="replace").split()
+            terminal = words[1].lower() if len(words) > 1 else "ansi"
+            channel = self.channels.get(int(words[0])) if words and words[0].isdigit() else None
+            if channel is None or terminal not in CLASSES:
+                writer.write(b"No such duel or terminal class.\n")
+                return
+            watcher = Watcher(writer, terminal)
+            channel.add(watcher)
+            writer.write(f"Watching {channel.title}\n".encode())
+            while await reader.read(1024):  # Anything a watcher types is ignored, until it hangs up
+                pass
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if watcher is not None:
+                channel.remove(watcher)
+            writer.close()
+
+    # Bind the spectators' port; errors such as a port in use are raised here
+    async def listen(self, host: str, port: int) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port, backlog=4096)
+
+    async def serve(self, host: str, port: int, ready=None):
+        server = await self.listen(host, port)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+
+# AI-vs-AI duels one after another on a channel each, a round every round_time seconds
+async def exhibition(hub: Hub, make_duel, title: str, round_time: float, rng: random.Random, max_rounds: int = 500):
+    while True:
+        state = make_duel()
+        channel = hub.open(title, state)
+        player, opponent, env = state.player, state.opponent, state.env
+        rounds = 0
+        while not duel_over(state) and rounds < max_rounds:
+            result = step_round(state, ai_choose_action(player, opponent, env, rng),
+                                ai_choose_action(opponent, player, env, rng), rng)
+            channel.publish(result)
+            rounds += 1
+            await asyncio.sleep(round_time)
+        channel.end()
+        await asyncio.sleep(10 * round_time)
+
+
+async def bench(make_duel, watchers: int, stalled: int, rounds: int, seed: int) -> dict:
+    hub = Hub()
+    server = await asyncio.start_server(hub.handle, "127.0.0.1", 0, backlog=4096)
+    port = server.sockets[0].getsockname()[1]
+    state = make_duel()
+    channel = hub.open("bench", state)
+    received = [0]
+
+    async def watch(reads: bool, terminal: str):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await reader.readuntil(b"]): ")
+        writer.write(f"{channel.id} {terminal}\n".encode())
+        await reader.readline()
+        if not reads:
+            await asyncio.sleep(3600)  # Never reads again; the hub drops it once its buffer is full
+        while chunk := await reader.read(65536):
+            received[0] += len(chunk)
+
+    tasks = [asyncio.create_task(watch(i >= stalled, CLASSES[i % len(CLASSES)])) for i in range(watchers + stalled)]
+    while channel.watching < watchers + stalled:
+        await asyncio.sleep(0.01)
+
+    rng = random.Random(seed)
+    player, opponent, env = state.player, state.opponent, state.env
+    publish = step = 0.0
+    played = 0
+    start = time.perf_counter()
+    while played < rounds:
+        if duel_over(state):
+            # Start another duel in the same state, so the watchers stay on the channel
+            fresh = make_duel()
+            state.player, state.opponent, state.round_num = fresh.player, fresh.opponent, 1
+            player, opponent = state.player, state.opponent
+        t0 = time.perf_counter()
+        result = step_round(state, ai_choose_action(player, opponent, env, rng),
+                            ai_choose_action(opponent, player, env, rng), rng)
+        t1 = time.perf_counter()
+        channel.publish(result)
+        t2 = time.perf_counter()
+        step += t1 - t0
+        publish += t2 - t1
+        played += 1
+        await asyncio.sleep(0)  # Let the fan-out and the sockets run, as a duel awaiting its player would
+    elapsed = time.perf_counter() - start
+    channel.end()
+    await asyncio.sleep(0.2)
+    for task in tasks:
+        task.cancel()
+    server.close()
+    return {"rounds": played, "step_us": 1e6 * step / played, "publish_us": 1e6 * publish / played,
+            "round_us": 1e6 * elapsed / played, "frames": hub.frames, "sent": hub.sent, "received": received[0],
+            "dropped": hub.dropped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broadcast duels to spectators over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4001)
+    parser.add_argument("--duels", type=int, default=2, help="exhibition duels running at once")
+    parser.add_argument("--round-time", type=float, default=1.0, help="seconds per exhibition round")
+    parser.add_argument("--player", metavar="ID", help="player loadout from the content packs (see content.py)")
+    parser.add_argument("--opponent", metavar="ID", help="opponent loadout")
+    parser.add_argument("--arena", metavar="ID", help="terrain")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--bench", action="store_true", help="time rounds with socket watchers instead")
+    parser.add_argument("--watchers", default="0,100,500", metavar="N,N,...", help="with --bench, watchers per run")
+    parser.add_argument("--stalled", type=int, default=10, help="with --bench, extra watchers that never read")
+    parser.add_argument("--rounds", type=int, default=3000, help="with --bench, rounds per run")
+    args = parser.parse_args()
+
+    import content
+    try:
+        registry = content.load()
+        ids = (args.player or content.DEFAULT_PLAYER, args.opponent or content.DEFAULT_OPPONENT,
+               args.arena or content.DEFAULT_ARENA)
+        registry.duel(*ids)
+    except content.ContentError as e:
+        raise SystemExit(str(e))
+
+    def make_duel():
+        return registry.duel(*ids)
+
+    raise_fd_limit()
+    if args.bench:
+        print(f"{'Watchers':>8} {'Stalled':>7} {'Step µs':>8} {'Publish µs':>10} {'Round µs':>9} {'Frames':>7} "
+              f"{'MB sent':>8} {'Dropped':>7}")
+        for n in (int(n) for n in args.watchers.split(",")):
+            r = asyncio.run(bench(make_duel, n, args.stalled if n else 0, args.rounds, args.seed or 0))
+            print(f"{n:>8} {args.stalled if n else 0:>7} {r['step_us']:>8.1f} {r['publish_us']:>10.2f} "
+                  f"{r['round_us']:>9.0f} {r['frames']:>7} {r['sent'] / 1e6:>8.1f} {r['dropped']:>7}")
+        return
+
+    async def run():
+        hub = Hub()
+        rng = random.Random(args.seed)
+        duels = [exhibition(hub, make_duel, f"{ids[0]} vs {ids[1]} #{n + 1}", args.round_time,
+                            random.Random(rng.getrandbits(64))) for n in range(args.duels)]
+        ready = lambda s: print(f"Spectators on {args.host}:{args.port}", flush=True)
+        await asyncio.gather(hub.serve(args.host, args.port, ready), *duels)  # A duel that fails stops the show
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
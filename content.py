@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content packs. Weapons, armor, terrains and loadouts are declared in TOML
+or JSON files in content/ (see content/base.toml), checked, and built into
+a Registry of the game's own objects, so simulations and the game can pick
+knights and arenas by id. Values that only depend on the gear are worked
+out at load: each armor's damage reduction per damage type, and each
+loadout's stamina weight factor and regeneration.
+
+The built registry is pickled to content/__pycache__, keyed by the name,
+size and modification time of every pack, so only the first start after
+a pack changes pays for parsing and checking.
+
+    python content.py                  # list what the packs define
+    python content.py --check          # validate the packs, ignoring the snapshot
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+from dataclasses import dataclass
+
+from rules import Armor, DamageType, DuelState, Environment, Guard, Knight, Terrain, Weapon
+
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content")
+SECTIONS = ("weapons", "armor", "terrains", "loadouts")
+SNAPSHOT_VERSION = 4  # Bump when the pickled classes change shape or validation tightens
+
+# Highest starting initiative and weapon speed: replay.py stores a knight's initiative in a byte,
+# and exact.py packs it into 6 bits
+MAX_INITIATIVE = 63
+
+# The knights and arena of make_default_duel()
+DEFAULT_PLAYER, DEFAULT_OPPONENT, DEFAULT_ARENA = "longsword_plate", "dagger_chainmail", "rough"
+
+REQUIRED = object()
+
+
+class ContentError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Loadout:
+    id: str
+    name: str
+    weapon: Weapon
+    armor: Armor
+    guard: Guard
+    initiative: int
+
+
+@dataclass(frozen=True, slots=True)
+class Arena:
+    id: str
+    name: str
+    env: Environment
+
+
+def value_of(d: dict, key: str, kind: type, where: str, default=REQUIRED, lo=None, hi=None):
+    if key not in d:
+        if default is REQUIRED:
+            raise ContentError(f"{where}: missing '{key}'")
+        return default
+    value = d[key]
+    # bool is an int to Python, but `damage = true` is a mistake
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise ContentError(f"{where}: '{key}' must be {'an integer' if kind is int else 'a ' + kind.__name__}, "
+                           f"not {value!r}")
+    if (lo is not None and value < lo) or (hi is not None and value > hi):
+        raise ContentError(f"{where}: '{key}' must be between {lo} and {hi}, not {value}")
+    return value
+
+
+def enum_of(d: dict, key: str, enum, where: str, default=REQUIRED):
+    name = value_of(d, key, str, where, default)
+    try:
+        return enum[name.upper()]
+    except KeyError:
+        raise ContentError(f"{where}: '{key}' must be one of "
+                           f"{', '.join(m.name.lower() for m in enum)}, not {name!r}") from None
+
+
+def weapon_from_dict(d: dict, where: str = "weapon") -> Weapon:
+    return Weapon(name=value_of(d, "name", str, where), damage=value_of(d, "damage", int, where, lo=0),
+                  speed=value_of(d, "speed", int, where, lo=0, hi=MAX_INITIATIVE),
+                  weight=value_of(d, "weight", int, where, lo=0),
+                  two_handed=value_of(d, "two_handed", bool, where, False),
+                  type=enum_of(d, "type", DamageType, where, "slashing"),
+                  ascii_art=value_of(d, "ascii_art", str, where, ""))
+
+
+def armor_from_dict(d: dict, where: str = "armor") -> Armor:
+    defense = value_of(d, "defense", dict, where)
+    unknown = set(defense) - {t.name.lower() for t in DamageType}
+    if unknown:
+        raise ContentError(f"{where}: unknown damage type(s) in 'defense': {', '.join(sorted(unknown))}")
+    return Armor(name=value_of(d, "name", str, where),
+                 defense=tuple(value_of(defense, t.name.lower(), int, f"{where}.defense", 0, lo=0)
+                               for t in DamageType),
+                 weight=value_of(d, "weight", int, where, lo=0),
+                 coverage=value_of(d, "coverage", int, where, lo=0, hi=100))
+
+
+def arena_from_dict(arena_id: str, d: dict, where: str) -> Arena:
+    rules = enum_of(d, "rules", Terrain, where)
+    env = Environment(type=rules, obstacle_density=value_of(d, "obstacle_density", int, where, 0, lo=0, hi=10),
+                      ascii_art=value_of(d, "ascii_art", str, where, ""))
+    return Arena(arena_id, value_of(d, "name", str, where), env)
+
+
+class Registry:
+    def __init__(self):
+        self.weapons = {}
+        self.armor = {}
+        self.arenas = {}
+        self.loadouts = {}
+
+    # A declared loadout, or "weapon+armor" for any pair of declared gear
+    def loadout(self, loadout_id: str) -> Loadout:
+        loadout = self.loadouts.get(loadout_id)
+        if loadout is not None:
+            return loadout
+        weapon_id, plus, armor_id = loadout_id.partition("+")
+        if plus and weapon_id in self.weapons and armor_id in self.armor:
+            weapon, armor = self.weapons[weapon_id], self.armor[armor_id]
+            return Loadout(loadout_id, f"{weapon.name} & {armor.name}", weapon, armor, Guard.MIDDLE, 10)
+        raise ContentError(f"unknown loadout {loadout_id!r}")
+
+    # Ids of every weapon+armor pair, for sweeps over all the gear
+    def pairs(self) -> list:
+        return [f"{w}+{a}" for w in self.weapons for a in self.armor]
+
+    def knight(self, loadout_id: str, name: str = None) -> Knight:
+        loadout = self.loadout(loadout_id)
+        return Knight(name=name or loadout.name, weapon=loadout.weapon, armor=loadout.armor,
+                      current_guard=loadout.guard, initiative=loadout.initiative)
+
+    def environment(self, arena_id: str) -> Environment:
+        try:
+            return self.arenas[arena_id].env
+        except KeyError:
+            raise ContentError(f"unknown terrain {arena_id!r}") from None
+
+    def duel(self, player: str = DEFAULT_PLAYER, opponent: str = DEFAULT_OPPONENT, arena: str = DEFAULT_ARENA,
+             names: tuple = (None, None)) -> DuelState:
+        return DuelState(self.knight(player, names[0]), self.knight(opponent, names[1]), self.environment(arena))
+
+
+def pack_files(directory: str) -> list:
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.endswith((".toml", ".json")))
+    except FileNotFoundError:
+        raise ContentError(f"no content directory at {directory}") from None
+    return [os.path.join(directory, n) for n in names]
+
+
+def read_pack(path: str) -> dict:
+    try:
+        if path.endswith(".toml"):
+            import tomllib  # Only needed when the snapshot is stale
+
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        else:
+            with open(path) as f:
+                data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ContentError(f"{path}: {e}") from None
+    unknown = set(data) - set(SECTIONS)
+    if unknown:
+        raise ContentError(f"{path}: unknown section(s) {', '.join(sorted(unknown))}; expected {', '.join(SECTIONS)}")
+    return data
+
+
+def build(files: list) -> Registry:
+    registry = Registry()
+    seen = {}  # (section, id) -> file that declared it
+    entries = {section: [] for section in SECTIONS}
+    for path in files:
+        data = read_pack(path)
+        name = os.path.basename(path)
+        for section in SECTIONS:
+            for item_id, d in value_of(data, section, dict, name, {}).items():
+                where = f"{name}: {section}.{item_id}"
+                if (section, item_id) in seen:
+                    raise ContentError(f"{where}: already declared in {seen[section, item_id]}")
+                if not isinstance(d, dict):
+                    raise ContentError(f"{where}: must be a table")
+                seen[section, item_id] = name
+                entries[section].append((item_id, d, where))
+
+    for item_id, d, where in entries["weapons"]:
+        registry.weapons[item_id] = weapon_from_dict(d, where)
+    for item_id, d, where in entries["armor"]:
+        registry.armor[item_id] = armor_from_dict(d, where)
+    for item_id, d, where in entries["terrains"]:
+        registry.arenas[item_id] = arena_from_dict(item_id, d, where)
+    for item_id, d, where in entries["loadouts"]:
+        weapon_id, armor_id = value_of(d, "weapon", str, where), value_of(d, "armor", str, where)
+        if weapon_id not in registry.weapons:
+            raise ContentError(f"{where}: unknown weapon {weapon_id!r}")
+        if armor_id not in registry.armor:
+            raise ContentError(f"{where}: unknown armor {armor_id!r}")
+        registry.loadouts[item_id] = Loadout(
+            item_id, value_of(d, "name", str, where), registry.weapons[weapon_id], registry.armor[armor_id],
+            enum_of(d, "guard", Guard, where, "middle"),
+            value_of(d, "initiative", int, where, 10, lo=0, hi=MAX_INITIATIVE))
+    return registry
+
+
+def snapshot_key(files: list) -> tuple:
+    stats = []
+    for path in files:
+        st = os.stat(path)
+        stats.append((os.path.basename(path), st.st_size, st.st_mtime_ns))
+    return SNAPSHOT_VERSION, tuple(stats)
+
+
+def load(directory: str = CONTENT_DIR, cache: bool = True) -> Registry:
+    files = pack_files(directory)
+    key = snapshot_key(files)
+    snapshot = os.path.join(directory, "__pycache__", "registry.pickle")
+    if cache:
+        try:
+            with open(snapshot, "rb") as f:
+                cached_key, registry = pickle.load(f)
+            if cached_key == key:
+                return registry
+        except Exception:  # Missing, unreadable or from older code: rebuild it
+            pass
+
+    registry = build(files)
+    if cache:
+        try:
+            os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+            with open(snapshot + ".tmp", "wb") as f:
+                pickle.dump((key, registry), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(snapshot + ".tmp", snapshot)
+        except OSError:
+            pass  # A read-only checkout just parses every time
+    return registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or validate the content packs")
+    parser.add_argument("--dir", default=CONTENT_DIR, help="content directory")
+    parser.add_argument("--check", action="store_true", help="parse and validate the packs, ignoring the snapshot")
+    args = parser.parse_args()
+
+    try:
+        registry = load(args.dir, cache=not args.check)
+    except ContentError as e:
+        sys.exit(str(e))
+    if args.check:
+        print(f"OK: {len(registry.weapons)} weapons, {len(registry.armor)} armor, {len(registry.arenas)} terrains, "
+              f"{len(registry.loadouts)} loadouts ({len(registry.weapons) * len(registry.armor)} weapon+armor pairs)")
+        return
+
+    print(f"{'Loadout':<20} {'Name':<28} {'Dmg':>4} {'Spd':>4} {'Cost+':>6} {'Regen':>6}  Reduction")
+    for lo in registry.loadouts.values():
+        knight = registry.knight(lo.id)  # Works out the stamina terms of the gear
+        reduction = ", ".join(f"{t.name.lower()} {lo.armor.reduction[t.value]:.1f}" for t in DamageType)
+        print(f"{lo.id:<20} {lo.name:<28} {lo.weapon.damage:>4} {lo.weapon.speed:>4} {knight.weight_factor:>6} "
+              f"{knight.regen_base:>6}  {reduction}")
+    print(f"\nTerrains: {', '.join(f'{a.id} ({a.env.type.name.lower()}, {a.env.obstacle_density})' for a in registry.arenas.values())}")
+    print(f"Weapons: {', '.join(registry.weapons)}")
+    print(f"Armor: {', '.join(registry.armor)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exact match-up outcomes. Instead of sampling duels between two stock AIs,
+the probability distribution over (player, opponent) states is carried
+forward round by round: every state is split by the stock AI's choices,
+the feint and wound rolls, the uniform wound choice and the terrain roll,
+exactly as outcomes.round_outcomes() splits a round, and states that come
+out identical are merged. What leaves the distribution is the chance of a
+win, a loss or a double knock-out in that round, which gives the
+win/draw/loss probabilities and the duel-length distribution together.
+
+Every state of the round is worked on at once as NumPy arrays (requires
+numpy). A knight's state is its health, stamina, fatigue and initiative;
+maximum stamina always follows from fatigue once a round is over, and the
+stock AI never leaves the guard it starts in, so neither needs a place in
+the key. Identical states are merged by sorting their packed keys.
+
+The number of distinct states still grows quickly: the stock AIs wander
+over so many stamina and fatigue values that by round 6 the standard duel
+is spread over millions of states, each of them unlikely. Past
+--max-states, the least likely states are dropped each round. The total
+dropped is reported, and no probability is off by more than that; with
+--max-states 0 nothing is dropped and the results are exact to rounding,
+which is practical for the first few rounds (--max-rounds, 5 by default).
+Over more rounds the dropped mass soon outweighs the results; past
+DROPPED_LIMIT each probability is printed as the range it is known to lie
+in, and no duel lengths are given. Duels still going after --max-rounds
+are reported as undecided, as batch.py counts them.
+
+    python exact.py --max-rounds 5 --max-states 0
+    python exact.py --player zweihander_plate --opponent rapier_doublet --arena open --check 1000000
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from outcomes import (DEFEND, FEINT, INFLICTED_RULES, NO_GUARD, REST, STRIKE, THRUST, WOUND_CHANCE, WOUND_KINDS,
+                      blow_damage, cost, hit_chance, matchup)
+from rules import Environment, Guard, Knight, make_default_duel
+
+GUARDS = (Guard.HIGH.value, Guard.MIDDLE.value, Guard.LOW.value)
+
+# Columns of the state array: the player's, then the opponent's, then the round's actions
+HEALTH, STAMINA, MAX_STAMINA, FATIGUE, INITIATIVE = range(5)
+SIDE = 5  # Offset of the opponent's columns
+P_TYPE, P_TARGET, O_TYPE, O_TARGET = range(2 * SIDE, 2 * SIDE + 4)
+COLUMNS = 2 * SIDE + 4
+
+# Bits of each field in a packed state key; maximum stamina is left out (see above)
+KEY_FIELDS = ((HEALTH, 7), (STAMINA, 7), (FATIGUE, 7), (INITIATIVE, 6))
+
+# Outcomes of one attack: a miss, a clean hit, or a hit with each inflicted wound
+ATTACK_OUTCOMES = 2 + WOUND_KINDS
+
+DEFAULT_MAX_STATES = 100_000
+DEFAULT_MAX_ROUNDS = 5  # Where the default state limit drops next to nothing
+
+# Dropped mass past which results are only printed as bounds
+DROPPED_LIMIT = 0.01
+
+
+@dataclass
+class ExactResult:
+    win: float  # The player's, as in batch.py
+    loss: float
+    draw: float  # Both knights fell in the same round
+    undecided: float  # Still fighting after max_rounds
+    dropped: float  # Given up to the state limit; every probability above is within this of the exact value
+    lengths: np.ndarray  # lengths[r]: chance that the duel ends in round r
+    max_rounds: int
+    peak_states: int
+
+    # Over the duels accounted for, with undecided ones max_rounds long as in batch.py
+    def mean_rounds(self) -> float:
+        total = float(self.lengths.sum()) + self.undecided
+        return float(np.arange(len(self.lengths)) @ self.lengths + self.max_rounds * self.undecided) / total
+
+
+# ai_choose_action() as a distribution: [(probability, type, target)] for a knight that isn't resting
+def stock_choices(other_tired: bool, other_guard: int) -> list:
+    choices = {}
+    for share, a_type, targets in ((0.4, STRIKE, GUARDS), (0.2, THRUST, GUARDS), (0.2, DEFEND, (NO_GUARD,)),
+                                   (0.2, FEINT, GUARDS)):
+        for target in targets:
+            for p, t in (((0.5, STRIKE), (0.5, THRUST)) if other_tired else ((1.0, a_type),)):
+                key = (t, other_guard if other_guard != NO_GUARD else target)
+                choices[key] = choices.get(key, 0.0) + share / len(targets) * p
+    return [(p, t, g) for (t, g), p in choices.items()]
+
+
+# One side's fixed tables: its choices in each of the stock AI's three moods, and its blows
+class SideTables:
+    def __init__(self, me, other, guard: int, other_guard: int):
+        moods = [[(1.0, REST, NO_GUARD)], stock_choices(False, other_guard), stock_choices(True, other_guard)]
+        width = max(len(m) for m in moods)
+        self.choice_p = np.zeros((3, width))
+        self.choice_type = np.full((3, width), REST, dtype=np.int16)
+        self.choice_target = np.full((3, width), NO_GUARD, dtype=np.int16)
+        for mood, choices in enumerate(moods):
+            for k, (p, t, g) in enumerate(choices):
+                self.choice_p[mood, k], self.choice_type[mood, k], self.choice_target[mood, k] = p, t, g
+        self.cost = np.array([cost(me, t) for t in range(5)], dtype=np.int16)
+        self.damage = np.array([blow_damage(me, other, t) for t in range(5)], dtype=np.int16)
+        # Chance that this side's blow lands, by its type and target and the defender's type
+        self.hit = np.array([[[hit_chance((t, g, guard), (d, NO_GUARD, other_guard)) for d in range(5)]
+                              for g in range(4)] for t in range(5)])
+        self.regen_base = 10 - me.weight // 2
+
+
+# Indices (row, k) and probabilities of every nonzero probs[row] * weights[row, k]
+def split(probs: np.ndarray, weights: np.ndarray) -> tuple:
+    w = probs[:, None] * weights
+    rows, ks = np.nonzero(w)
+    return rows, ks, w[rows, ks]
+
+
+class Propagator:
+    def __init__(self, player: Knight, opponent: Knight, env: Environment, max_states: int = DEFAULT_MAX_STATES):
+        m = matchup(player, opponent, env)
+        guards = (player.current_guard.value, opponent.current_guard.value)
+        self.sides = (SideTables(m.player, m.opponent, guards[0], guards[1]),
+                      SideTables(m.opponent, m.player, guards[1], guards[0]))
+        self.speed = (m.player.speed, m.opponent.speed)
+        self.terrain_chance = m.terrain_chance
+        self.max_states = max_states
+        for knight in (player, opponent):
+            if knight.initiative >= 1 << KEY_FIELDS[-1][1]:
+                raise ValueError(f"{knight.name}'s initiative is too high to pack")
+        start = np.zeros((1, COLUMNS), dtype=np.int16)
+        for offset, k in ((0, player), (SIDE, opponent)):
+            start[0, offset:offset + SIDE] = (k.health, k.stamina, k.max_stamina, k.fatigue, k.initiative)
+        self.states, self.probs = start, np.ones(1)
+        self.dropped = 0.0  # Dropped by the last round
+
+    # Every pair of actions the two stock AIs can choose, with forced rest applied
+    def _choose(self, states, probs) -> tuple:
+        mood = []
+        for side, offset, other in ((0, 0, SIDE), (1, SIDE, 0)):
+            tired = (states[:, offset + STAMINA] < 20) | (states[:, offset + FATIGUE] > 80)
+            mood.append(np.where(tired, 0, 1 + (states[:, other + FATIGUE] > 50)))
+        p, o = self.sides
+        width = o.choice_p.shape[1]
+        weights = (p.choice_p[mood[0]][:, :, None] * o.choice_p[mood[1]][:, None, :]).reshape(len(states), -1)
+        rows, ks, probs = split(probs, weights)
+        kp, ko = ks // width, ks % width
+        states = states[rows]
+        for column, target_column, table, mood_rows, k, offset in (
+                (P_TYPE, P_TARGET, p, mood[0][rows], kp, 0), (O_TYPE, O_TARGET, o, mood[1][rows], ko, SIDE)):
+            a_type = table.choice_type[mood_rows, k]
+            forced = states[:, offset + STAMINA] < table.cost[a_type]
+            states[:, column] = np.where(forced, REST, a_type)
+            states[:, target_column] = np.where(forced, NO_GUARD, table.choice_target[mood_rows, k])
+        return states, probs
+
+    # One side's attack on the other, on rows where the attacker still stands
+    def _attack(self, states, probs, side: int) -> tuple:
+        table = self.sides[side]
+        att, dfn = (0, SIDE) if side == 0 else (SIDE, 0)
+        a_type, a_target, d_type = ((states[:, P_TYPE], states[:, P_TARGET], states[:, O_TYPE]) if side == 0 else
+                                    (states[:, O_TYPE], states[:, O_TARGET], states[:, P_TYPE]))
+        hit = table.hit[a_type, a_target, d_type] * (states[:, att + HEALTH] > 0)
+        weights = np.empty((len(states), ATTACK_OUTCOMES))
+        weights[:, 0] = 1 - hit
+        weights[:, 1] = hit * (1 - WOUND_CHANCE)
+        weights[:, 2:] = (hit * WOUND_CHANCE / WOUND_KINDS)[:, None]
+        rows, k, probs = split(probs, weights)
+        states = states[rows]
+        a_type = a_type[rows]
+
+        landed = k >= 1
+        if landed.any():
+            health = states[:, dfn + HEALTH]
+            health -= table.damage[a_type] * landed
+            np.maximum(health, 0, out=health)
+        wounded = np.flatnonzero(k >= 2)
+        for w, rule in enumerate(INFLICTED_RULES):
+            hurt = wounded[k[wounded] == w + 2]
+            if not len(hurt):
+                continue
+            s = states[hurt]
+            s[:, dfn + HEALTH] = np.maximum(0, s[:, dfn + HEALTH] - rule.health)
+            s[:, dfn + STAMINA] = np.maximum(0, s[:, dfn + STAMINA] - rule.stamina)
+            s[:, dfn + MAX_STAMINA] = np.maximum(50, s[:, dfn + MAX_STAMINA] - rule.max_stamina)
+            s[:, dfn + FATIGUE] = np.minimum(100, s[:, dfn + FATIGUE] + rule.fatigue)
+            s[:, dfn + INITIATIVE] = np.maximum(0, s[:, dfn + INITIATIVE] - rule.initiative)
+            states[hurt] = s
+        return states, probs
+
+    # update_stamina() and regenerate() for one side
+    def _recover(self, states, side: int):
+        table = self.sides[side]
+        offset, type_column = (0, P_TYPE) if side == 0 else (SIDE, O_TYPE)
+        stamina, fatigue, max_stamina = (states[:, offset + c] for c in (STAMINA, FATIGUE, MAX_STAMINA))
+        resting = states[:, type_column] == REST
+        spent = np.maximum(0, stamina - table.cost[states[:, type_column]])
+        stamina = np.where(resting, np.minimum(max_stamina, stamina + 20), spent)
+        fatigue = np.where(resting, np.maximum(0, fatigue - 10), np.minimum(100, fatigue + 5))
+        regen = np.maximum(1, table.regen_base - fatigue // 20)
+        states[:, offset + STAMINA] = np.minimum(max_stamina, stamina + regen)
+        states[:, offset + FATIGUE] = fatigue
+        states[:, offset + MAX_STAMINA] = np.maximum(50, 100 - fatigue // 2)
+
+    # Play one round of every state; returns the chances of (win, loss, draw) that it decides
+    def step(self) -> tuple:
+        states, probs = self._choose(self.states, self.probs)
+
+        # Initiative order, as resolve_combat() works it out before the blows
+        init = [states[:, offset + INITIATIVE] + self.speed[side] - states[:, offset + FATIGUE] // 10
+                for side, offset in ((0, 0), (1, SIDE))]
+        player_first = init[0] >= init[1]
+        parts = []
+        for first, order in ((player_first, (0, 1)), (~player_first, (1, 0))):
+            s, p = states[first], probs[first]
+            for side in order:
+                s, p = self._attack(s, p, side)
+            parts.append((s, p))
+        states = np.concatenate([s for s, _ in parts])
+        probs = np.concatenate([p for _, p in parts])
+
+        if self.terrain_chance:
+            tired = states.copy()
+            for offset in (0, SIDE):
+                np.minimum(tired[:, offset + FATIGUE] + 5, 100, out=tired[:, offset + FATIGUE])
+            states = np.concatenate([states, tired])
+            probs = np.concatenate([probs * (1 - self.terrain_chance), probs * self.terrain_chance])
+        self._recover(states, 0)
+        self._recover(states, 1)
+
+        p_down = states[:, HEALTH] <= 0
+        o_down = states[:, SIDE + HEALTH] <= 0
+        decided = (float(probs[o_down & ~p_down].sum()), float(probs[p_down & ~o_down].sum()),
+                   float(probs[p_down & o_down].sum()))
+        going = ~(p_down | o_down)
+        self._merge(states[going], probs[going])
+        return decided
+
+    # Sum the chances of identical states and keep the max_states likeliest
+    def _merge(self, states, probs):
+        key = np.zeros(len(states), dtype=np.int64)
+        for offset in (0, SIDE):
+            for column, bits in KEY_FIELDS:
+                key = (key << bits) | states[:, offset + column]
+        key, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        probs = np.bincount(inverse, probs)
+        self.dropped = 0.0
+        if self.max_states and len(probs) > self.max_states:
+            keep = np.argpartition(probs, -self.max_states)[-self.max_states:]
+            self.dropped = float(probs.sum() - probs[keep].sum())
+            first, probs = first[keep], probs[keep]
+        self.states, self.probs = states[first], probs
+
+
+def evaluate(player: Knight, opponent: Knight, env: Environment, max_rounds: int = DEFAULT_MAX_ROUNDS,
+             max_states: int = DEFAULT_MAX_STATES, progress=None) -> ExactResult:
+    propagator = Propagator(player, opponent, env, max_states)
+    lengths = np.zeros(max_rounds + 1)
+    win = loss = draw = dropped = 0.0
+    peak = 1
+    for r in range(1, max_rounds + 1):
+        w, l, d = propagator.step()
+        win, loss, draw = win + w, loss + l, draw + d
+        lengths[r] = w + l + d
+        dropped += propagator.dropped
+        peak = max(peak, len(propagator.probs))
+        if progress:
+            progress(r, len(propagator.probs))
+        if not len(propagator.probs):
+            break
+    return ExactResult(win, loss, draw, float(propagator.probs.sum()), dropped, lengths, max_rounds, peak)
+
+
+# Mean duel length and the quartiles of the decided duels
+def print_lengths(res: ExactResult):
+    ended = np.cumsum(res.lengths)
+    print(f"  mean length {res.mean_rounds():.2f} rounds" + (" of the rest" if res.dropped else ""), end="")
+    if ended[-1] > 1e-12:  # Not just rounding
+        quartiles = [int(np.searchsorted(ended, q * ended[-1])) for q in (0.25, 0.5, 0.75)]
+        print(f"; decided duels end by rounds {', '.join(map(str, quartiles))} (quartiles)", end="")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact win/draw/loss chances of a match-up between stock AIs")
+    parser.add_argument("--player", metavar="ID", help="player loadout from the content packs (see content.py)")
+    parser.add_argument("--opponent", metavar="ID", help="opponent loadout")
+    parser.add_argument("--arena", metavar="ID", help="terrain")
+    parser.add_argument("--max-rounds", type=int, default=DEFAULT_MAX_ROUNDS,
+                        help="rounds to follow; past the first few, most states have to be dropped")
+    parser.add_argument("--max-states", type=int, default=DEFAULT_MAX_STATES,
+                        help="states kept from round to round, the likeliest first (0 keeps them all)")
+    parser.add_argument("--check", type=int, default=0, metavar="DUELS",
+                        help="also sample this many duels with batch.py and compare")
+    args = parser.parse_args()
+
+    if args.player or args.opponent or args.arena:
+        import content
+        try:
+            state = content.load().duel(args.player or content.DEFAULT_PLAYER,
+                                        args.opponent or content.DEFAULT_OPPONENT,
+                                        args.arena or content.DEFAULT_ARENA)
+        except content.ContentError as e:
+            sys.exit(str(e))
+    else:
+        state = make_default_duel()
+    player, opponent, env = state.player, state.opponent, state.env
+
+    start = time.perf_counter()
+    progress = lambda r, n: print(f"\rround {r}, {n:,} states", end="", flush=True)
+    res = evaluate(player, opponent, env, args.max_rounds, args.max_states, progress)
+    elapsed = time.perf_counter() - start
+    print(f"\r{player.name} vs {opponent.name}: {elapsed:.2f}s, at most {res.peak_states:,} states in a round")
+    if res.dropped > DROPPED_LIMIT:
+        # The dropped states would have ended somewhere, so each figure is only known to a range
+        print(f"  {res.dropped:.1%} of the probability was dropped (--max-states); bounds only:")
+        for name, p in (("win", res.win), ("loss", res.loss), ("draw", res.draw), ("undecided", res.undecided)):
+            print(f"  {name:<9} between {p:.6f} and {min(1.0, p + res.dropped):.6f}")
+    else:
+        print(f"  win {res.win:.6f}  loss {res.loss:.6f}  draw {res.draw:.6f}  undecided {res.undecided:.6f}"
+              f"  (each within {res.dropped:.1e})")
+        print_lengths(res)
+
+    if args.check:
+        from batch import BatchDuel
+        start = time.perf_counter()
+        sample = BatchDuel(player, opponent, env, args.check, seed=1, max_rounds=args.max_rounds).run().results()
+        elapsed = time.perf_counter() - start
+        n = sample["duels"]
+        rate = sample["player_wins"] / n
+        margin = 1.96 * (rate * (1 - rate) / n) ** 0.5
+        print(f"Sampled {n:,} duels in {elapsed:.2f}s: win {rate:.6f} ± {margin:.6f}, "
+              f"mean length {sample['mean_rounds']:.2f} rounds")
+
+
+if __name__ == "__main__":
+    main()
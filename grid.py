@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Battlefields: a tile grid for battle.py, generated from an Environment's
+terrain and obstacle density. Open fields are scattered with a few walls
+(rocks, trees), rough land with tiles that cost double to cross, and a
+narrow passage is walled in above and below. Tiles are a uint8 NumPy array
+(FLOOR, ROUGH, WALL), so a map can be saved with np.save and fed to array
+code such as batch.py as it is.
+
+Every knight stands on a tile. A weapon reaches one tile, two if it is
+two-handed, and one more if it weighs 7 or more, and only along a line
+that no wall crosses. A knight whose target is out of reach steps one
+tile toward it instead of attacking, paying MOVE_COST stamina (double on
+rough ground) through the usual stamina rules.
+
+Knights are also filed in per-side buckets of BUCKET x BUCKET tiles, so
+finding an enemy within reach looks at a few buckets around the knight
+rather than at the whole army, and the nearest enemy is found from the
+occupied buckets, nearest first, rather than from every knight.
+"""
+
+import numpy as np
+
+from rules import Terrain, Weapon
+
+FLOOR, ROUGH, WALL = 0, 1, 2
+TILE_CHARS = ".,#"
+BUCKET = 8
+MOVE_COST = 4  # Stamina per tile; double on rough ground
+STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def weapon_reach(weapon: Weapon) -> int:
+    return 1 + weapon.two_handed + (weapon.weight >= 7)
+
+
+# A height x width map for the terrain; the same seed gives the same map
+def generate_tiles(terrain: Terrain, density: int, width: int, height: int, seed: int) -> np.ndarray:
+    roll = np.random.default_rng(seed).random((height, width))
+    tiles = np.zeros((height, width), dtype=np.uint8)
+    if terrain == Terrain.ROUGH:
+        tiles[roll < density * 0.08] = ROUGH
+        tiles[roll < density * 0.015] = WALL
+    else:
+        tiles[roll < density * 0.01] = WALL
+    if terrain == Terrain.NARROW:
+        band = max(3, height * (10 - density) // 30)
+        top = (height - band) // 2
+        tiles[:top] = WALL
+        tiles[top + band:] = WALL
+    return tiles
+
+
+def chebyshev(x0: int, y0: int, x1: int, y1: int) -> int:
+    return max(abs(x1 - x0), abs(y1 - y0))
+
+
+class Battlefield:
+    def __init__(self, tiles: np.ndarray, knights: list, side: list):
+        self.tiles = tiles
+        self.height, self.width = tiles.shape
+        self.knights = knights
+        self.side = side
+        self.reach = [weapon_reach(k.weapon) for k in knights]
+        self.xs = [-1] * len(knights)
+        self.ys = [-1] * len(knights)
+        self.occupant = np.full(tiles.shape, -1, dtype=np.int32)
+        self.buckets_wide = -(-self.width // BUCKET)
+        self.buckets_high = -(-self.height // BUCKET)
+        self.buckets = ({}, {})  # Per side: bucket key -> set of knight indices
+
+    # A field for the battle with side 0 drawn up on the left and side 1 on the right. Unless a width is
+    # given, the field is made long enough for each army to fit in its own third of it.
+    @classmethod
+    def for_battle(cls, battle, seed: int, width: int = None, height: int = None):
+        n = max(battle.standing(0), battle.standing(1))
+        height = height or max(9, int((3 * n) ** 0.5))
+        fixed, width = width is not None, width or max(24, 2 * height)
+        while True:
+            tiles = generate_tiles(battle.env.type, battle.env.obstacle_density, width, height, seed)
+            third = width // 3
+            if fixed or min(np.count_nonzero(tiles[:, :third] != WALL),
+                            np.count_nonzero(tiles[:, width - third:] != WALL)) >= n:
+                break
+            width *= 2
+        field = cls(tiles, battle.knights, battle.side)
+        for side, columns in ((0, range(width)), (1, range(width - 1, -1, -1))):
+            free = ((x, y) for x in columns for y in range(height)
+                    if tiles[y, x] != WALL and field.occupant[y, x] < 0)
+            for i in battle.alive[side]:
+                try:
+                    field.place(i, *next(free))
+                except StopIteration:
+                    raise ValueError(f"a {width}x{height} field has no room for {len(battle.knights)} knights") from None
+        return field
+
+    def bucket_key(self, x: int, y: int) -> int:
+        return (y // BUCKET) * self.buckets_wide + x // BUCKET
+
+    def place(self, i: int, x: int, y: int):
+        self.xs[i], self.ys[i] = x, y
+        self.occupant[y, x] = i
+        self.buckets[self.side[i]].setdefault(self.bucket_key(x, y), set()).add(i)
+
+    def remove(self, i: int):
+        x, y = self.xs[i], self.ys[i]
+        self.occupant[y, x] = -1
+        bucket = self.buckets[self.side[i]][self.bucket_key(x, y)]
+        bucket.discard(i)
+        if not bucket:
+            del self.buckets[self.side[i]][self.bucket_key(x, y)]
+
+    def move(self, i: int, x: int, y: int):
+        self.remove(i)
+        self.place(i, x, y)
+
+    # Whether a line between two tiles (Bresenham) passes no wall
+    def clear_line(self, x0: int, y0: int, x1: int, y1: int) -> bool:
+        tiles = self.tiles
+        dx, dy = abs(x1 - x0), -abs(y1 - y0)
+        sx, sy = (1 if x1 > x0 else -1), (1 if y1 > y0 else -1)
+        err = dx + dy
+        while True:
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+            if x0 == x1 and y0 == y1:
+                return True
+            if tiles[y0, x0] == WALL:
+                return False
+
+    def in_reach(self, i: int, j: int) -> bool:
+        x0, y0, x1, y1 = self.xs[i], self.ys[i], self.xs[j], self.ys[j]
+        d = chebyshev(x0, y0, x1, y1)
+        return d <= self.reach[i] and (d <= 1 or self.clear_line(x0, y0, x1, y1))
+
+    # The nearest enemy within reach of knight i (lowest index on a tie), or None
+    def enemy_in_reach(self, i: int):
+        x, y, reach = self.xs[i], self.ys[i], self.reach[i]
+        buckets = self.buckets[1 - self.side[i]]
+        best, best_d = None, reach
+        for by in range(max(0, y - reach) // BUCKET, min(self.height - 1, y + reach) // BUCKET + 1):
+            for bx in range(max(0, x - reach) // BUCKET, min(self.width - 1, x + reach) // BUCKET + 1):
+                for j in buckets.get(by * self.buckets_wide + bx, ()):
+                    d = chebyshev(x, y, self.xs[j], self.ys[j])
+                    if d <= best_d and (best is None or d < best_d or j < best) and self.in_reach(i, j):
+                        best, best_d = j, d
+        return best
+
+    # The nearest enemy of knight i anywhere on the field, or None. The buckets around the knight's own are
+    # tried first; failing that, every occupied bucket, nearest first, until nothing further could be nearer.
+    def nearest_enemy(self, i: int):
+        x, y = self.xs[i], self.ys[i]
+        buckets = self.buckets[1 - self.side[i]]
+        if not buckets:
+            return None
+        bx0, by0 = x // BUCKET, y // BUCKET
+        keys = [by * self.buckets_wide + bx
+                for by in range(max(0, by0 - 1), min(self.buckets_high, by0 + 2))
+                for bx in range(max(0, bx0 - 1), min(self.buckets_wide, bx0 + 2))]
+        best, best_d = self.nearest_in(x, y, [b for b in map(buckets.get, keys) if b], None, self.width + self.height)
+        # Anything outside those buckets is more than BUCKET tiles away
+        if best is not None and best_d <= BUCKET:
+            return best
+        ranked = []
+        for key, bucket in buckets.items():
+            # The least distance from the knight to any tile of the bucket
+            left, top = (key % self.buckets_wide) * BUCKET, (key // self.buckets_wide) * BUCKET
+            ranked.append((max(left - x, x - left - BUCKET + 1, top - y, y - top - BUCKET + 1, 0), key))
+        ranked.sort()
+        for bound, key in ranked:
+            if bound > best_d:
+                break
+            best, best_d = self.nearest_in(x, y, (buckets[key],), best, best_d)
+        return best
+
+    # The nearest knight to (x, y) in the buckets, if nearer than best_d (or as near with a lower index)
+    def nearest_in(self, x: int, y: int, buckets, best, best_d: int) -> tuple:
+        xs, ys = self.xs, self.ys
+        for bucket in buckets:
+            for j in bucket:
+                d = abs(xs[j] - x)
+                dy = abs(ys[j] - y)
+                if dy > d:
+                    d = dy
+                if d < best_d or (d == best_d and j < best):
+                    best, best_d = j, d
+        return best, best_d
+
+    # Whom knight i should fight: an enemy within reach, else its current target while it stands, else the nearest
+    def choose_target(self, i: int, current: int):
+        j = self.enemy_in_reach(i)
+        if j is not None:
+            return j
+        if current >= 0 and self.knights[current].health > 0:
+            return current
+        return self.nearest_enemy(i)
+
+    # Step knight i one tile toward knight j if it can pay for it; returns the stamina spent
+    def advance(self, i: int, j: int) -> int:
+        x, y, tx, ty = self.xs[i], self.ys[i], self.xs[j], self.ys[j]
+        best, best_key = None, (chebyshev(x, y, tx, ty), (tx - x) ** 2 + (ty - y) ** 2)
+        for dx, dy in STEPS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height and self.tiles[ny, nx] != WALL \
+                    and self.occupant[ny, nx] < 0:
+                key = (chebyshev(nx, ny, tx, ty), (tx - nx) ** 2 + (ty - ny) ** 2)
+                if key < best_key:
+                    best, best_key = (nx, ny), key
+        if best is None:
+            return 0
+        cost = MOVE_COST * (2 if self.tiles[best[1], best[0]] == ROUGH else 1)
+        if self.knights[i].stamina < cost:
+            return 0
+        self.move(i, *best)
+        return cost
+
+    # The map as text: walls, rough ground, and the knights of each side as A and B
+    def format_map(self) -> str:
+        rows = [[TILE_CHARS[t] for t in row] for row in self.tiles.tolist()]
+        for i, knight in enumerate(self.knights):
+            if knight.health > 0 and self.xs[i] >= 0:
+                rows[self.ys[i]][self.xs[i]] = "AB"[self.side[i]]
+        return "\n".join("".join(row) for row in rows) + "\n"
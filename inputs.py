@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Player input for the terminal game. A reader hands out one answer per
+prompt from a queue: every line read is split on whitespace, so a whole
+round can be typed ahead as "2 1 3", and an empty line is one empty
+answer (take the default, or go on). Only when the queue is empty does
+the reader wait for more input, with selectors on the raw file
+descriptor, so a wait can end at a deadline, and everything a pipe holds
+is taken in one read: a scripted or bot session runs at full speed.
+
+When a deadline passes, the other prompts sharing it get no answer
+either, and whatever was typed meanwhile is thrown away before the next
+prompt, so a late answer is never taken for the next round's.
+
+With keys=True a terminal is put in cbreak mode and every key press is an
+answer, so single-digit menus need no Enter. skip_pause makes the game
+skip its "Press Enter" pauses.
+
+Where stdin cannot be selected on (no file descriptor, or not POSIX),
+PromptReader reads lines with input(), without deadlines.
+"""
+
+import atexit
+import os
+import selectors
+import sys
+import time
+from collections import deque
+
+
+class PromptReader:
+    keys = False
+
+    def __init__(self, skip_pause: bool = False):
+        self.skip_pause = skip_pause
+        self.queue = deque()  # (answer, whether the screen already shows it)
+        self.shown = True
+        self.tty = sys.stdin.isatty()
+        self.expired = None  # The deadline that last passed, until the next prompt with another one
+
+    # The next answer, or None if the deadline (a time.monotonic() value) passes first
+    def answer(self, deadline: float = None):
+        if self.expired is not None:
+            if deadline == self.expired:
+                return None
+            self.drain()
+            self.expired = None
+        while not self.queue:
+            if not self.fill(deadline):
+                self.expired = deadline
+                return None
+        answer, self.shown = self.queue.popleft()
+        return answer
+
+    # Whatever needs writing after the prompt so that the screen shows the answer and moves on
+    def echo(self, answer) -> str:
+        if answer is None:
+            return "\n"
+        return "" if self.shown else answer + "\n"
+
+    # Queue the answers on a line. A terminal echoes what is typed, which shows the line's first answer;
+    # anything else is never shown, so that a transcript of a scripted session reads as it always did.
+    def add_line(self, line: str, echoed: bool):
+        words = line.split() or [""]
+        self.queue.extend((word, not self.tty or (echoed and i == 0)) for i, word in enumerate(words))
+
+    def fill(self, deadline: float = None) -> bool:
+        self.add_line(input(), True)
+        return True
+
+    # Throw away the answers typed for prompts that ran out of time
+    def drain(self):
+        self.queue.clear()
+
+    def close(self):
+        pass
+
+
+class LineReader(PromptReader):
+    def __init__(self, stream=None, skip_pause: bool = False, keys: bool = False, out=None):
+        super().__init__(skip_pause)
+        self.stream = stream or sys.stdin
+        self.out = out or sys.stdout
+        self.fd = self.stream.fileno()
+        self.tty = os.isatty(self.fd)
+        self.buffer = b""
+        self.eof = False
+        self.selector = selectors.DefaultSelector()
+        try:
+            self.selector.register(self.fd, selectors.EVENT_READ)
+        except PermissionError:  # A regular file, which epoll refuses; it is always ready anyway
+            self.selector = None
+        self.saved = None
+        if keys and self.tty:
+            import termios
+            import tty
+
+            self.saved = termios.tcgetattr(self.fd)
+            tty.setcbreak(self.fd)
+            atexit.register(self.close)
+        self.keys = self.saved is not None
+
+    # Block until there is input or the timeout (seconds, None for no limit) passes
+    def wait(self, timeout) -> bool:
+        return self.selector is None or bool(self.selector.select(timeout))
+
+    def fill(self, deadline: float = None) -> bool:
+        if self.eof:
+            raise EOFError
+        self.out.flush()
+        if not self.wait(None if deadline is None else max(0.0, deadline - time.monotonic())):
+            return False
+        data = os.read(self.fd, 4096)
+        if not data:
+            self.eof = True
+            if self.buffer:
+                self.add_line(self.buffer.decode(errors="replace"), False)
+                self.buffer = b""
+            return True
+        if self.keys:
+            for key in data.decode(errors="replace"):
+                if key.isdigit() or key in "\r\n":
+                    self.queue.append((key.strip(), False))
+            return True
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b"\n")
+        for line in lines:
+            self.add_line(line.decode(errors="replace"), True)
+        return True
+
+    def drain(self):
+        super().drain()
+        self.buffer = b""
+        while not self.eof and self.selector is not None and self.wait(0):
+            if not os.read(self.fd, 4096):
+                self.eof = True
+
+    def close(self):
+        if self.saved is not None:
+            import termios
+
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.saved)
+            self.saved = None
+
+
+# A LineReader on stdin where possible, else a PromptReader
+def make_reader(skip_pause: bool = False, keys: bool = False) -> PromptReader:
+    if os.name == "posix":
+        try:
+            return LineReader(sys.stdin, skip_pause, keys)
+        except (AttributeError, OSError, ValueError):  # No usable file descriptor, e.g. a StringIO
+            pass
+    return PromptReader(skip_pause)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Career ladder: persistent knights in an SQLite database, rated by Glicko
+over any number of duels. A knight keeps its record and its latest
+CARRIED_WOUNDS wounds from duel to duel; it starts each duel at full
+health, but with the lasting effects of the wounds it carries: less
+maximum stamina (arm wounds) and initiative (leg wounds).
+
+Knights are matched by rating: the nearest rated knights above and below
+are two seeks on the (rating, seat) index, where seat is a random number
+drawn at enrolment so that knights of equal rating are drawn at random
+rather than by id. Leaderboards walk the same index backwards, so both
+cost the same for a thousand knights or a million.
+
+Profiles are read through an LRU cache of the knights last played. The
+outcome of a duel, both knights' new profiles and a row of history, is
+written in one transaction after each duel, or after every --batch duels
+for bulk runs; until then matchmaking sees the ratings as they were.
+
+    python ladder.py create ladder.db --knights 1000000
+    python ladder.py play ladder.db --duels 100000 --batch 100
+    python ladder.py top ladder.db
+    python ladder.py knight ladder.db 42
+    python ladder.py bench ladder.db
+"""
+
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import content
+from content import ContentError
+from rules import WOUND_BITS, WOUND_RULES, DuelState, Knight, simulate_duel, wound_list
+
+CARRIED_WOUNDS = 4  # Older wounds have healed by the next duel
+CACHE_SIZE = 10_000
+
+# Glicko (Glickman 1999), one duel at a time. Deviation stays above MIN_RD so ratings keep following
+# knights whose strength changes with their wounds.
+START_RATING, START_RD, MIN_RD = 1500.0, 350.0, 30.0
+Q = math.log(10) / 400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS knights (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    loadout TEXT NOT NULL,
+    seat INTEGER NOT NULL,
+    rating REAL NOT NULL,
+    rd REAL NOT NULL,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    wounds INTEGER NOT NULL DEFAULT 0,
+    max_stamina INTEGER NOT NULL DEFAULT 100
+);
+CREATE INDEX IF NOT EXISTS knights_rating ON knights (rating, seat);
+CREATE TABLE IF NOT EXISTS duels (
+    id INTEGER PRIMARY KEY,
+    player INTEGER NOT NULL,
+    opponent INTEGER NOT NULL,
+    result INTEGER NOT NULL,
+    rounds INTEGER NOT NULL,
+    player_rating REAL NOT NULL,
+    opponent_rating REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS duels_player ON duels (player);
+CREATE INDEX IF NOT EXISTS duels_opponent ON duels (opponent);
+"""
+
+# Columns of knights, in Profile order
+COLUMNS = "id, name, loadout, seat, rating, rd, wins, losses, draws, wounds, max_stamina"
+RESULTS = {1: "won", 0: "drew", -1: "lost"}  # duels.result, from the player's side
+
+
+@dataclass(slots=True)
+class Profile:
+    id: int
+    name: str
+    loadout: str
+    seat: int
+    rating: float
+    rd: float
+    wins: int
+    losses: int
+    draws: int
+    wounds: int       # Carried wounds, packed as Knight.wounds
+    max_stamina: int  # Maximum stamina left by the carried wounds
+
+    def record(self) -> str:
+        return f"{self.wins}-{self.losses}-{self.draws}"
+
+
+# New (rating, rd) of a knight after a duel against another scoring 1, 0.5 or 0
+def glicko(rating: float, rd: float, other_rating: float, other_rd: float, score: float) -> tuple:
+    g = 1 / math.sqrt(1 + 3 * (Q * other_rd) ** 2 / math.pi ** 2)
+    expected = 1 / (1 + 10 ** (-g * (rating - other_rating) / 400))
+    d2 = 1 / (Q * Q * g * g * expected * (1 - expected))
+    precision = 1 / (rd * rd) + 1 / d2
+    return rating + Q / precision * g * (score - expected), max(MIN_RD, math.sqrt(1 / precision))
+
+
+class Ladder:
+    def __init__(self, path: str, registry, cache_size: int = CACHE_SIZE, batch: int = 1):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.registry = registry
+        self.cache = OrderedDict()  # id -> Profile, least recently used first
+        self.cache_size = cache_size
+        self.hits = self.misses = 0
+        self.dirty = {}  # id -> Profile changed since the last flush
+        self.pending = []  # Rows of duel history not written yet
+        self.batch = batch
+        self.size = self.db.execute("SELECT COALESCE(MAX(id), 0) FROM knights").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    # Enrol n knights, taking the loadouts in turn; returns the first new id
+    def enrol(self, loadout_ids: list, n: int, rng: random.Random) -> int:
+        loadouts = [self.registry.loadout(i) for i in loadout_ids]
+        first = self.size + 1
+        rows = ((first + i, f"{loadouts[i % len(loadouts)].name} #{first + i}", loadouts[i % len(loadouts)].id,
+                 rng.getrandbits(31), START_RATING, START_RD) for i in range(n))
+        with self.db:
+            self.db.executemany("INSERT INTO knights (id, name, loadout, seat, rating, rd) VALUES (?, ?, ?, ?, ?, ?)",
+                                rows)
+        self.size += n
+        return first
+
+    # The profile of a knight, through the cache
+    def get(self, knight_id: int) -> Profile:
+        profile = self.cache.get(knight_id)
+        if profile is not None:
+            self.cache.move_to_end(knight_id)
+            self.hits += 1
+            return profile
+        self.misses += 1
+        profile = self.dirty.get(knight_id)
+        if profile is None:
+            row = self.db.execute(f"SELECT {COLUMNS} FROM knights WHERE id = ?", (knight_id,)).fetchone()
+            if row is None:
+                raise KeyError(knight_id)
+            profile = Profile(*row)
+        self.cache[knight_id] = profile
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)  # A dirty profile stays in self.dirty until it is written
+        return profile
+
+    # The opponent for a knight: the nearest rated knight above or below it, either side of a random seat
+    def match(self, profile: Profile, rng: random.Random) -> int:
+        key = (profile.rating, rng.getrandbits(31))
+        above = self.db.execute("SELECT id, rating FROM knights WHERE (rating, seat) >= (?, ?) "
+                                "ORDER BY rating, seat LIMIT 2", key).fetchall()
+        below = self.db.execute("SELECT id, rating FROM knights WHERE (rating, seat) < (?, ?) "
+                                "ORDER BY rating DESC, seat DESC LIMIT 2", key).fetchall()
+        candidates = [(abs(r - profile.rating), i) for i, r in above + below if i != profile.id]
+        if not candidates:
+            raise ValueError("the ladder needs at least two knights")
+        return min(candidates)[1]
+
+    # A knight ready for a duel: full health, with the lasting effects of the wounds it carries
+    def knight(self, profile: Profile) -> Knight:
+        loadout = self.registry.loadout(profile.loadout)
+        slowed = sum(WOUND_RULES[w.value].initiative for w in wound_list(profile.wounds))
+        return Knight(name=profile.name, weapon=loadout.weapon, armor=loadout.armor, current_guard=loadout.guard,
+                      initiative=max(0, loadout.initiative - slowed), wounds=profile.wounds,
+                      stamina=profile.max_stamina, max_stamina=profile.max_stamina)
+
+    # Carry the outcome of a duel between two profiles into both
+    def record(self, player: Profile, opponent: Profile, state: DuelState, rounds: int):
+        p_dead, o_dead = state.player.health <= 0, state.opponent.health <= 0
+        result = 0 if p_dead == o_dead else 1 if o_dead else -1
+        self.pending.append((player.id, opponent.id, result, rounds, player.rating, opponent.rating))
+        p_rating, p_rd = player.rating, player.rd
+        player.rating, player.rd = glicko(p_rating, p_rd, opponent.rating, opponent.rd, (result + 1) / 2)
+        opponent.rating, opponent.rd = glicko(opponent.rating, opponent.rd, p_rating, p_rd, (1 - result) / 2)
+        for profile, knight, score in ((player, state.player, result), (opponent, state.opponent, -result)):
+            if score > 0:
+                profile.wins += 1
+            elif score < 0:
+                profile.losses += 1
+            else:
+                profile.draws += 1
+            profile.wounds = knight.wounds & ((1 << WOUND_BITS * CARRIED_WOUNDS) - 1)
+            profile.max_stamina = max(50, 100 - sum(WOUND_RULES[w.value].max_stamina
+                                                    for w in wound_list(profile.wounds)))
+            self.dirty[profile.id] = profile
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    # Write the changed profiles and the duel history in one transaction
+    def flush(self):
+        if not self.pending and not self.dirty:
+            return
+        with self.db:
+            self.db.executemany("UPDATE knights SET rating = ?, rd = ?, wins = ?, losses = ?, draws = ?, wounds = ?, "
+                                "max_stamina = ? WHERE id = ?",
+                                [(p.rating, p.rd, p.wins, p.losses, p.draws, p.wounds, p.max_stamina, p.id)
+                                 for p in self.dirty.values()])
+            self.db.executemany("INSERT INTO duels (player, opponent, result, rounds, player_rating, opponent_rating) "
+                                "VALUES (?, ?, ?, ?, ?, ?)", self.pending)
+        self.dirty.clear()
+        self.pending.clear()
+
+    def leaderboard(self, limit: int = 20) -> list:
+        rows = self.db.execute(f"SELECT {COLUMNS} FROM knights ORDER BY rating DESC, seat DESC LIMIT ?", (limit,))
+        return [Profile(*row) for row in rows]
+
+    # Place on the leaderboard, 1 for the best; counts the knights above, so it costs more for knights lower down
+    def rank(self, profile: Profile) -> int:
+        return 1 + self.db.execute("SELECT COUNT(*) FROM knights WHERE (rating, seat) > (?, ?)",
+                                   (profile.rating, profile.seat)).fetchone()[0]
+
+    # The knight's latest duels, newest first: (duel id, other knight's id, result from its side, rounds)
+    def history(self, knight_id: int, limit: int = 10) -> list:
+        rows = self.db.execute("SELECT * FROM (SELECT id, opponent, result, rounds FROM duels WHERE player = ? "
+                               "ORDER BY id DESC LIMIT ?) UNION ALL "
+                               "SELECT * FROM (SELECT id, player, -result, rounds FROM duels WHERE opponent = ? "
+                               "ORDER BY id DESC LIMIT ?) ORDER BY id DESC LIMIT ?",
+                               (knight_id, limit, knight_id, limit, limit))
+        return rows.fetchall()
+
+
+# Play duels between matched knights: a knight drawn at random against its nearest rated rival
+def play(ladder: Ladder, env, duels: int, rng: random.Random, max_rounds: int = 500, progress=None) -> int:
+    total_rounds = 0
+    for n in range(duels):
+        player = ladder.get(rng.randint(1, ladder.size))
+        opponent = ladder.get(ladder.match(player, rng))
+        if rng.random() < 0.5:  # Either may hold the player slot, which wins initiative ties
+            player, opponent = opponent, player
+        state = DuelState(ladder.knight(player), ladder.knight(opponent), env)
+        rounds = simulate_duel(state, rng, max_rounds)
+        ladder.record(player, opponent, state, rounds)
+        total_rounds += rounds
+        if progress and n % 1000 == 999:
+            progress(n + 1)
+    ladder.flush()
+    return total_rounds
+
+
+def print_profiles(ladder: Ladder, profiles: list, first_rank: int = 1):
+    print(f"{'Rank':>7} {'Id':>8} {'Knight':<32} {'Rating':>7} {'RD':>5} {'Record':>12} {'Wounds':<14}")
+    for rank, p in enumerate(profiles, first_rank):
+        wounds = ",".join(WOUND_RULES[w.value].name for w in wound_list(p.wounds)) or "-"
+        print(f"{rank:>7} {p.id:>8} {p.name:<32} {p.rating:>7.1f} {p.rd:>5.1f} {p.record():>12} {wounds:<14}")
+
+
+# Time matchmaking, leaderboards and profile reads on the ladder as it is
+def bench(ladder: Ladder, queries: int, rng: random.Random):
+    ids = [rng.randint(1, ladder.size) for _ in range(queries)]
+    start = time.perf_counter()
+    profiles = [ladder.get(i) for i in ids]
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in ids:
+        ladder.get(i)
+    hot = time.perf_counter() - start
+    start = time.perf_counter()
+    for profile in profiles:
+        ladder.match(profile, rng)
+    matched = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(100):
+        ladder.leaderboard(100)
+    top = time.perf_counter() - start
+    print(f"{ladder.size:,} knights, {queries:,} queries each")
+    print(f"  profile, from the database {1e6 * cold / queries:8.1f} µs")
+    print(f"  profile, from the cache    {1e6 * hot / queries:8.1f} µs")
+    print(f"  matchmaking                {1e6 * matched / queries:8.1f} µs")
+    print(f"  top 100                    {1e6 * top / 100:8.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent knights on a rated ladder")
+    commands = parser.add_subparsers(dest="command", required=True)
+    c = commands.add_parser("create", help="enrol knights on a ladder, creating it if need be")
+    c.add_argument("db")
+    c.add_argument("--knights", type=int, default=1000)
+    c.add_argument("--loadouts", metavar="ID,ID,...", help="loadouts, taken in turn (default: every declared one)")
+    c.add_argument("--seed", type=int, default=0)
+    p = commands.add_parser("play", help="play duels between matched knights")
+    p.add_argument("db")
+    p.add_argument("--duels", type=int, default=10_000)
+    p.add_argument("--arena", metavar="ID", help="terrain (see content.py)")
+    p.add_argument("--batch", type=int, default=1, help="duels per transaction")
+    p.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="profiles kept in memory")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--max-rounds", type=int, default=500)
+    t = commands.add_parser("top", help="print the leaderboard")
+    t.add_argument("db")
+    t.add_argument("--limit", type=int, default=20)
+    k = commands.add_parser("knight", help="print a knight's profile and latest duels")
+    k.add_argument("db")
+    k.add_argument("id", type=int)
+    b = commands.add_parser("bench", help="time matchmaking, leaderboards and profile reads")
+    b.add_argument("db")
+    b.add_argument("--queries", type=int, default=10_000)
+    b.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command != "create" and not os.path.exists(args.db):
+        sys.exit(f"no ladder at {args.db}; make one with 'ladder.py create'")
+    try:
+        registry = content.load()
+        ladder = Ladder(args.db, registry, getattr(args, "cache_size", CACHE_SIZE), getattr(args, "batch", 1))
+        if args.command == "create":
+            start = time.perf_counter()
+            first = ladder.enrol(args.loadouts.split(",") if args.loadouts else list(registry.loadouts),
+                                 args.knights, random.Random(args.seed))
+            print(f"Enrolled knights {first:,}-{ladder.size:,} in {time.perf_counter() - start:.1f}s")
+        elif args.command == "play":
+            env = registry.environment(args.arena or content.DEFAULT_ARENA)
+            start = time.perf_counter()
+            rounds = play(ladder, env, args.duels, random.Random(args.seed), args.max_rounds,
+                          lambda n: print(f"\r{n:,} duels", end="", flush=True))
+            elapsed = time.perf_counter() - start
+            print(f"\r{args.duels:,} duels, {rounds:,} rounds in {elapsed:.1f}s ({args.duels / elapsed:,.0f} duels/s); "
+                  f"profile cache hit rate {ladder.hits / max(1, ladder.hits + ladder.misses):.1%}")
+        elif args.command == "top":
+            print_profiles(ladder, ladder.leaderboard(args.limit))
+        elif args.command == "knight":
+            profile = ladder.get(args.id)
+            print_profiles(ladder, [profile], ladder.rank(profile))
+            for duel_id, other, result, rounds in ladder.history(profile.id):
+                print(f"  duel {duel_id}: {RESULTS[result]} against {ladder.get(other).name} in {rounds} rounds")
+        else:
+            bench(ladder, args.queries, random.Random(args.seed))
+    except (ContentError, ValueError) as e:
+        sys.exit(str(e))
+    except KeyError as e:
+        sys.exit(f"no knight {e}")
+    ladder.close()
+
+
+if __name__ == "__main__":
+    main()
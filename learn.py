@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Learned opponents. DuelEnv is a gym-style vectorised environment over the
+batch simulator: reset() and step() work on thousands of duels at once,
+finished duels start again by themselves, and each side is driven by an
+action index per duel. A Q-table per side is trained on it by self-play,
+with a share of the duels played against the stock AI so that the two
+learners don't only learn each other's habits.
+
+An action is an ActionType, the guard to take up and the guard to aim at,
+9 x type + 3 x guard + target. Guards count from the knight's own current
+guard and targets from the other knight's, since all three guards are
+alike (see solver.py) and what matters is whether a knight keeps its guard
+and whether it aims where the other stands. The state is health, stamina
+and fatigue of both knights in a few bins each; the observation also
+carries maximum stamina, initiative and guard. The reward is +1 for a win
+and -1 for a loss, as display_victory_screen() has them; a draw or a duel
+cut off at max_rounds is 0.
+
+Trained policies are saved per match-up as a small .npz file. The
+"learned" AI plays the greedy action from it, one table lookup per move
+(requires numpy).
+
+    python learn.py --steps 4000 --check 500
+    python learn.py --player zweihander_plate --opponent rapier_doublet --arena forest
+    python fechtmeister.py --ai learned
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from batch import AI_ROLLS, NO_GUARD, BatchDuel, KnightArrays, pick, split_roll
+from outcomes import matchup
+from rules import (ACTION_RULES, Action, ActionType, DuelState, Environment, Guard, Knight, duel_over,
+                   make_action, make_default_duel, simulate_duel)
+from solver import TABLE_DIR, slug
+
+GUARDS = (Guard.HIGH, Guard.MIDDLE, Guard.LOW)
+N_ACTIONS = len(ActionType) * len(GUARDS) * len(GUARDS)
+OFFENSIVE = np.array([r.offensive for r in ACTION_RULES])
+
+# What a side sees of each knight, itself first: DuelEnv.observe()[side, duel, knight, feature]
+OBSERVATION = ("health", "stamina", "max_stamina", "fatigue", "initiative", "guard")
+
+# Bins per quantity of the state; values run from 0 to 100
+HEALTH_BINS, STAMINA_BINS, FATIGUE_BINS = 4, 5, 3
+N_STATES = (HEALTH_BINS * STAMINA_BINS * FATIGUE_BINS) ** 2
+GAMMA = 0.99
+VERSION = 1
+
+
+# The state of a knight facing another; works on ints and on arrays alike
+def state_index(health, stamina, fatigue, other_health, other_stamina, other_fatigue):
+    index = health * HEALTH_BINS // 101
+    index = index * HEALTH_BINS + other_health * HEALTH_BINS // 101
+    index = index * STAMINA_BINS + stamina * STAMINA_BINS // 101
+    index = index * STAMINA_BINS + other_stamina * STAMINA_BINS // 101
+    index = index * FATIGUE_BINS + fatigue * FATIGUE_BINS // 101
+    return index * FATIGUE_BINS + other_fatigue * FATIGUE_BINS // 101
+
+
+# Action indices -> (action type, starting guard, target guard) arrays, from both knights' current guards
+def decode(actions, guard, other_guard):
+    aim, rest = split_roll(actions, len(GUARDS))
+    shift, a_type = split_roll(rest, len(GUARDS))
+    new_guard = guard % 3 + shift
+    target = other_guard % 3 + aim
+    new_guard -= 3 * (new_guard >= 3)
+    target -= 3 * (target >= 3)
+    return a_type, new_guard, pick(OFFENSIVE[a_type], target, NO_GUARD)
+
+
+class DuelEnv(BatchDuel):
+    def __init__(self, player: Knight, opponent: Knight, env: Environment, n: int, seed=None,
+                 max_rounds: int = 500):
+        super().__init__(player, opponent, env, n, seed, max_rounds)
+        # One row of each side as it starts, copied over duels that finish
+        self.start = (KnightArrays(player, 1), KnightArrays(opponent, 1))
+        self.start[0].face(self.start[1])
+        self.start[1].face(self.start[0])
+
+    def reset(self) -> np.ndarray:
+        self._restart(np.arange(self.n))
+        return self.observe()
+
+    # (2, n, 2, len(OBSERVATION)): each side's view of every duel, its own knight first
+    def observe(self) -> np.ndarray:
+        p, o = ([getattr(k, name) for name in OBSERVATION] for k in (self.player, self.opponent))
+        mine = np.stack(p, axis=1)
+        theirs = np.stack(o, axis=1)
+        return np.stack([np.stack([mine, theirs], axis=1), np.stack([theirs, mine], axis=1)])
+
+    # The stock AI's choices for one side, as action indices
+    def stock_actions(self, side: int) -> np.ndarray:
+        me, other = (self.player, self.opponent) if side == 0 else (self.opponent, self.player)
+        a_type, target = self._choose_actions(me, other, (self.rng.random(self.n) * AI_ROLLS).astype(np.int16))
+        aim = target - other.guard % 3
+        aim += 3 * (aim < 0)
+        return a_type * len(GUARDS) ** 2 + pick(target == NO_GUARD, 0, aim)
+
+    # Play a round of every duel. Returns the observation, the player's reward (the opponent's is
+    # its negation) and which duels ended; those have already started again.
+    def step(self, player_actions: np.ndarray, opponent_actions: np.ndarray) -> tuple:
+        p, o = self.player, self.opponent
+        p_type, p_guard, p_target = decode(player_actions, p.guard, o.guard)
+        o_type, o_guard, o_target = decode(opponent_actions, o.guard, p.guard)
+        p.guard = p_guard.astype(np.int8)
+        o.guard = o_guard.astype(np.int8)
+        _, _, *attack_rolls = self._roll()
+        self._play(p_type, p_target, o_type, o_target, *attack_rolls, self.active)
+
+        self.rounds += 1
+        p_down, o_down = ~p.alive(), ~o.alive()
+        reward = o_down.astype(np.int8) - p_down
+        done = p_down | o_down | (self.rounds >= self.max_rounds)
+        self._restart(np.flatnonzero(done))
+        return self.observe(), reward, done
+
+    def _restart(self, rows):
+        for k, start in zip((self.player, self.opponent), self.start):
+            for name in KnightArrays.FIELDS:
+                getattr(k, name)[rows] = getattr(start, name)[0]
+        self.rounds[rows] = 0
+
+
+# States of one side from an observation
+def states(observation: np.ndarray, side: int) -> np.ndarray:
+    me, other = observation[side, :, 0], observation[side, :, 1]
+    h, s, f = (OBSERVATION.index(name) for name in ("health", "stamina", "fatigue"))
+    return state_index(me[:, h], me[:, s], me[:, f], other[:, h], other[:, s], other[:, f]).astype(np.intp)
+
+
+class Policy:
+    def __init__(self, q: np.ndarray, visits: np.ndarray, header: dict):
+        self.q = q  # (side, state, action) values
+        self.visits = visits  # Updates of each value; an action never tried is never greedy
+        self.header = header
+        self.greedy = self.best()
+
+    @classmethod
+    def empty(cls, header: dict):
+        return cls(np.zeros((2, N_STATES, N_ACTIONS), dtype=np.float32),
+                   np.zeros((2, N_STATES, N_ACTIONS), dtype=np.uint32), header)
+
+    # The greedy action of each side in each state, as uint8
+    def best(self) -> np.ndarray:
+        return np.where(self.visits > 0, self.q, -np.inf).argmax(axis=2).astype(np.uint8)
+
+    # The greedy action in each state, or with probability epsilon a random one
+    def act(self, side: int, states: np.ndarray, epsilon: float, rng: np.random.Generator) -> np.ndarray:
+        actions = self.q[side, states].argmax(axis=1)
+        explore = rng.random(len(states)) < epsilon
+        return pick(explore, rng.integers(0, N_ACTIONS, len(states)), actions)
+
+    # One Q-learning step for a side on the duels in rows. Duels that hit the same state and action
+    # move it by their mean error, so the step size doesn't grow with the number of duels.
+    def update(self, side: int, rows, states, actions, rewards, next_states, done, alpha: float):
+        q = self.q[side]
+        s, a = states[rows], actions[rows]
+        target = rewards[rows] + GAMMA * q[next_states[rows]].max(axis=1) * ~done[rows]
+        cell = s * N_ACTIONS + a
+        error = target - q.reshape(-1)[cell]
+        total = np.bincount(cell, error, q.size)
+        count = np.bincount(cell, minlength=q.size)
+        seen = np.flatnonzero(count)
+        q.reshape(-1)[seen] += alpha * total[seen] / count[seen]
+        self.visits[side].reshape(-1)[seen] += count[seen].astype(np.uint32)
+
+    def save(self, path: str):
+        self.greedy = self.best()
+        text = json.dumps(self.header).encode()
+        with open(path + ".part", "wb") as f:
+            # Only whether an action was ever tried matters once training is over
+            np.savez_compressed(f, q=self.q.astype(np.float16), tried=np.packbits(self.visits > 0),
+                                header=np.frombuffer(text, dtype=np.uint8))
+        os.replace(path + ".part", path)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            header = json.loads(data["header"].tobytes())
+            if header.get("version") != VERSION or data["q"].shape != (2, N_STATES, N_ACTIONS):
+                raise ValueError(f"{path} is not a policy for this version of learn.py")
+            tried = np.unpackbits(data["tried"], count=data["q"].size).reshape(data["q"].shape)
+            return cls(data["q"].astype(np.float32), tried, header)
+
+
+# Everything the policy depends on, hashed; the readable part of the file name is only a label
+def matchup_key(player: Knight, opponent: Knight, env: Environment) -> str:
+    text = repr((matchup(player, opponent, env), player.initiative, opponent.initiative, N_STATES, VERSION))
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def policy_path(player: Knight, opponent: Knight, env: Environment, directory: str = TABLE_DIR) -> str:
+    name = "_".join(slug(k.weapon.name + " " + k.armor.name) for k in (player, opponent))
+    return os.path.join(directory, f"{name}_{env.type.name.lower()}_{matchup_key(player, opponent, env)}.policy.npz")
+
+
+# Self-play Q-learning. A stock_share of the duels pit one learner against the stock AI, half of them
+# each way round. Exploration falls linearly to epsilon over the first 80% of the steps.
+def train(player: Knight, opponent: Knight, env: Environment, steps: int = 4000, duels: int = 4096,
+          seed: int = 1, alpha: float = 0.1, epsilon: float = 0.05, stock_share: float = 0.5,
+          max_rounds: int = 500, progress=None) -> Policy:
+    rng = np.random.default_rng(seed)
+    duel_env = DuelEnv(player, opponent, env, duels, seed=rng.integers(2 ** 63), max_rounds=max_rounds)
+    policy = Policy.empty({"version": VERSION, "player": player.name, "opponent": opponent.name,
+                           "terrain": env.type.name, "steps": steps, "duels": duels, "seed": seed})
+    lane = np.arange(duels)
+    stock = (lane < duels * stock_share // 2, (lane >= duels * stock_share // 2) & (lane < duels * stock_share))
+    learning = [np.flatnonzero(~stock[side]) for side in (0, 1)]  # Rows where each side is a learner
+
+    observation = duel_env.reset()
+    for step in range(steps):
+        eps = max(epsilon, 1 - step / (0.8 * steps))
+        before = [states(observation, side) for side in (0, 1)]
+        actions = [pick(stock[side], duel_env.stock_actions(side), policy.act(side, before[side], eps, rng))
+                    for side in (0, 1)]
+        observation, reward, done = duel_env.step(*actions)
+        after = [states(observation, side) for side in (0, 1)]
+        for side, sign in ((0, 1), (1, -1)):
+            policy.update(side, learning[side], before[side], actions[side], sign * reward, after[side], done, alpha)
+        if progress and (step + 1) % 100 == 0:
+            progress(step + 1, steps)
+    return policy
+
+
+# Plays a trained policy: the greedy action for the state, one table lookup per move
+class LearnedAI:
+    def __init__(self, slot: str = "opponent", directory: str = TABLE_DIR):
+        self.slot = slot
+        self.directory = directory
+        self.policies = {}
+        self.current = None  # (ai, other, greedy actions) of the duel in progress
+
+    def policy(self, player: Knight, opponent: Knight, env: Environment) -> Policy:
+        path = policy_path(player, opponent, env, self.directory)
+        if path not in self.policies:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No learned policy for this match-up ({path}); run learn.py first")
+            self.policies[path] = Policy.load(path)
+        return self.policies[path]
+
+    # Same signature as ai_choose_action()
+    def __call__(self, ai: Knight, other: Knight, env: Environment, rng: random.Random) -> Action:
+        # Policies are keyed by starting initiative, which leg wounds lower, so a duel keeps
+        # the policy it started with
+        if self.current is None or self.current[0] is not ai or self.current[1] is not other:
+            player, opponent = (ai, other) if self.slot == "player" else (other, ai)
+            greedy = self.policy(player, opponent, env).greedy[0 if self.slot == "player" else 1].tolist()
+            self.current = (ai, other, greedy)
+        action = self.current[2][state_index(ai.health, ai.stamina, ai.fatigue,
+                                             other.health, other.stamina, other.fatigue)]
+        rest, aim = divmod(action, len(GUARDS))
+        a_type, shift = divmod(rest, len(GUARDS))
+        guard = GUARDS[(ai.current_guard.value % 3 + shift) % 3]
+        target = GUARDS[(other.current_guard.value % 3 + aim) % 3] if ACTION_RULES[a_type].offensive else Guard.NO
+        return make_action(ActionType(a_type), target, guard)
+
+
+# (wins, losses, draws) of the learned AI in the slot against the stock AI, with the rules in rules.py
+def check(player: Knight, opponent: Knight, env: Environment, slot: str, duels: int, directory: str,
+          seed: int = 0) -> tuple:
+    rng = random.Random(seed)
+    ai = LearnedAI(slot, directory)
+    wins = losses = 0
+    for _ in range(duels):
+        state = DuelState(replace(player, wounds=0), replace(opponent, wounds=0), env)
+        if slot == "player":
+            simulate_duel(state, rng, player_ai=ai)
+        else:
+            simulate_duel(state, rng, opponent_ai=ai)
+        mine, theirs = (state.player, state.opponent) if slot == "player" else (state.opponent, state.player)
+        if duel_over(state) and theirs.health <= 0 < mine.health:
+            wins += 1
+        elif duel_over(state) and mine.health <= 0 < theirs.health:
+            losses += 1
+    return wins, losses, duels - wins - losses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a learned AI for a match-up by self-play")
+    parser.add_argument("--player", metavar="ID", help="player loadout from the content packs (see content.py)")
+    parser.add_argument("--opponent", metavar="ID", help="opponent loadout")
+    parser.add_argument("--arena", metavar="ID", help="terrain")
+    parser.add_argument("--steps", type=int, default=4000, help="rounds played by every duel in the batch")
+    parser.add_argument("--duels", type=int, default=4096, help="duels stepped at once")
+    parser.add_argument("--stock-share", type=float, default=0.5, help="share of duels against the stock AI")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=TABLE_DIR)
+    parser.add_argument("--check", type=int, default=0,
+                        help="then play this many duels each way round against the stock AI")
+    args = parser.parse_args()
+
+    if args.player or args.opponent or args.arena:
+        import content
+        try:
+            state = content.load().duel(args.player or content.DEFAULT_PLAYER,
+                                        args.opponent or content.DEFAULT_OPPONENT,
+                                        args.arena or content.DEFAULT_ARENA)
+        except content.ContentError as e:
+            sys.exit(str(e))
+    else:
+        state = make_default_duel()
+    player, opponent, env = state.player, state.opponent, state.env
+
+    start = time.perf_counter()
+    progress = lambda done, total: print(f"\rstep {done}/{total}", end="", flush=True)
+    policy = train(player, opponent, env, args.steps, args.duels, args.seed, stock_share=args.stock_share,
+                   progress=progress)
+    elapsed = time.perf_counter() - start
+    os.makedirs(args.out, exist_ok=True)
+    path = policy_path(player, opponent, env, args.out)
+    policy.save(path)
+    print(f"\nTrained {player.name} vs {opponent.name} in {elapsed:.1f}s "
+          f"({args.steps * args.duels / elapsed:,.0f} rounds/s): {path} ({os.path.getsize(path) / 1e3:.0f} kB)")
+
+    if args.check:
+        for slot in ("player", "opponent"):
+            wins, losses, draws = check(player, opponent, env, slot, args.check, args.out)
+            print(f"Learned AI as {slot} vs stock AI over {args.check} duels: "
+                  f"{wins} wins, {losses} losses, {draws} draws")
+        ai = LearnedAI("opponent", args.out)
+        rng = random.Random(0)
+        ai(opponent, player, env, rng)
+        moves = 10_000
+        start = time.perf_counter()
+        for _ in range(moves):
+            ai(opponent, player, env, rng)
+        print(f"Inference: {1e6 * (time.perf_counter() - start) / moves:.1f} µs per move")
+
+
+if __name__ == "__main__":
+    main()
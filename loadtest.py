@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load test for server.py: opens thousands of scripted client sessions that
+play random moves, and reports the round latency seen by the clients, from
+sending the last choice of a round to receiving that round's result.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+from server import BEGIN_PROMPT, CHOICE_PROMPT, PAUSE_PROMPT, raise_fd_limit
+
+PROMPTS = tuple(p.encode() for p in (BEGIN_PROMPT, CHOICE_PROMPT, PAUSE_PROMPT))
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+class Bot:
+    def __init__(self, rng: random.Random, rounds: int, think: float):
+        self.rng = rng
+        self.rounds = rounds
+        self.think = think
+        self.latencies = []
+
+    # Read until the server waits for input; b"" once it has hung up
+    async def read_frame(self, reader: asyncio.StreamReader) -> bytes:
+        frame = b""
+        while not frame.endswith(PROMPTS):
+            chunk = await reader.read(65536)
+            if not chunk:
+                return b""
+            frame += chunk
+        return frame
+
+    async def play(self, host: str, port: int, connect: asyncio.Semaphore):
+        async with connect:
+            reader, writer = await asyncio.open_connection(host, port)
+        sent_at = None
+        try:
+            while len(self.latencies) < self.rounds:
+                frame = await self.read_frame(reader)
+                if not frame:
+                    break  # Duel over
+                if frame.endswith(PAUSE_PROMPT.encode()):
+                    self.latencies.append(time.perf_counter() - sent_at)
+                    answer = ""
+                elif frame.endswith(CHOICE_PROMPT.encode()):
+                    answer = str(self.rng.randint(1, 5 if b"Choose your action" in frame else 3))
+                else:
+                    answer = ""
+                if self.think:
+                    await asyncio.sleep(self.rng.uniform(0, 2 * self.think))
+                writer.write(answer.encode() + b"\n")
+                sent_at = time.perf_counter()
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def run_level(host: str, port: int, sessions: int, args) -> dict:
+    rng = random.Random(args.seed + sessions)
+    bots = [Bot(random.Random(rng.getrandbits(64)), args.rounds, args.think) for _ in range(sessions)]
+    connect = asyncio.Semaphore(args.connect_concurrency)
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(bot.play(host, port, connect) for bot in bots), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    latencies = sorted(l for bot in bots for l in bot.latencies)
+    return {
+        "sessions": sessions,
+        "errors": sum(isinstance(o, Exception) for o in outcomes),
+        "rounds": len(latencies),
+        "elapsed": elapsed,
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p99_ms": 1000 * percentile(latencies, 99),
+    }
+
+
+async def wait_for_port(host: str, port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Fechtmeister duel server")
+    parser.add_argument("--levels", default="1000,5000,10000", help="comma-separated session counts")
+    parser.add_argument("--rounds", type=int, default=10, help="rounds each session plays before leaving")
+    parser.add_argument("--think", type=float, default=0.0, help="mean seconds a bot waits before answering")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4100)
+    parser.add_argument("--external", action="store_true", help="test a server that is already running")
+    parser.add_argument("--connect-concurrency", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    levels = [int(n) for n in args.levels.split(",")]
+
+    raise_fd_limit()
+    server = None
+    if not args.external:
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+        server = subprocess.Popen([sys.executable, script, "--host", args.host, "--port", str(args.port),
+                                   "--max-sessions", str(max(levels)), "--seed", str(args.seed)],
+                                  stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_for_port(args.host, args.port))
+        print(f"{'Sessions':>8} {'Rounds':>8} {'Errors':>6} {'Time':>7} {'Rounds/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for n in levels:
+            r = asyncio.run(run_level(args.host, args.port, n, args))
+            print(f"{r['sessions']:>8} {r['rounds']:>8} {r['errors']:>6} {r['elapsed']:>6.1f}s "
+                  f"{r['rounds'] / r['elapsed']:>9,.0f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exact round outcomes. step_round() rolls dice; this module instead lists
+every way a round can go, with its probability, over compact immutable
+knight states, so searches and solvers can reason about the rules without
+copying Knight objects. It mirrors rules.step_round() rule for rule.
+
+A knight's changing state is a tuple
+    (health, stamina, max_stamina, fatigue, initiative, guard)
+with guard as a Guard value. Wounds are left out: apply_wound() folds
+their effect into the other fields at once, and nothing reads the wound
+history afterwards, so two knights differing only in wound history play
+identically. What never changes during a duel (weapon, armor) is a Profile.
+"""
+
+from collections import namedtuple
+
+from rules import (ACTION_RULES, INFLICTED_WOUNDS, WOUND_PERCENT, WOUND_RULES, ActionType, DamageType,
+                   Environment, Guard, Knight, Terrain)
+
+HEALTH, STAMINA, MAX_STAMINA, FATIGUE, INITIATIVE, GUARD = range(6)
+
+Profile = namedtuple("Profile", "damage speed weight slashing piercing coverage")
+
+# The fixed parts of a round: both profiles, plus the chance that rough ground tires both knights
+Matchup = namedtuple("Matchup", "player opponent terrain_chance")
+
+STRIKE, THRUST, DEFEND, FEINT, REST = (t.value for t in ActionType)
+NO_GUARD = Guard.NO.value
+BASE_COST = {t.value: ACTION_RULES[t.value].base_cost for t in ActionType}
+WOUND_CHANCE = WOUND_PERCENT / 100
+WOUND_KINDS = len(INFLICTED_WOUNDS)
+INFLICTED_RULES = [WOUND_RULES[w.value] for w in INFLICTED_WOUNDS]
+
+
+def profile(knight: Knight) -> Profile:
+    defense = knight.armor.defense
+    return Profile(knight.weapon.damage, knight.weapon.speed, knight.weapon.weight + knight.armor.weight,
+                   defense[DamageType.SLASHING.value], defense[DamageType.PIERCING.value], knight.armor.coverage)
+
+
+def knight_state(knight: Knight) -> tuple:
+    return (knight.health, knight.stamina, knight.max_stamina, knight.fatigue, knight.initiative,
+            knight.current_guard.value)
+
+
+def matchup(player: Knight, opponent: Knight, env: Environment) -> Matchup:
+    chance = min(100, env.obstacle_density * 10) / 100 if env.type == Terrain.ROUGH else 0.0
+    return Matchup(profile(player), profile(opponent), chance)
+
+
+# Damage of a landed blow; feints skip the armor, as in resolve_attack()
+def blow_damage(attacker: Profile, defender: Profile, action_type: int) -> int:
+    damage = attacker.damage
+    if action_type == FEINT:
+        return damage
+    defense = defender.piercing if action_type == THRUST else defender.slashing
+    damage -= defense * (defender.coverage / 100)
+    return max(1, int(damage))
+
+
+# Chance that an attack lands; actions are (type, target_guard, starting_guard) tuples of values
+def hit_chance(atk: tuple, dfn: tuple) -> float:
+    if atk[0] == FEINT:
+        return 0.5 if dfn[0] == DEFEND else 0.0
+    if atk[0] in (STRIKE, THRUST):
+        if dfn[0] == DEFEND and dfn[2] == atk[1]:
+            return 0.0
+        return 1.0 if atk[1] != dfn[2] or dfn[0] == REST else 0.0
+    return 0.0
+
+
+# The states a defender can be left in by one attack, with probabilities
+def attack_outcomes(state: tuple, damage: int, p_hit: float) -> list:
+    if p_hit == 0.0:
+        return [(1.0, state)]
+    health, stamina, max_stamina, fatigue, initiative, guard = state
+    health = max(0, health - damage)
+    clean = p_hit * (1 - WOUND_CHANCE)
+    each = p_hit * WOUND_CHANCE / WOUND_KINDS
+    results = [(clean, (health, stamina, max_stamina, fatigue, initiative, guard))]
+    results += [(each, (max(0, health - w.health), max(0, stamina - w.stamina), max(50, max_stamina - w.max_stamina),
+                        min(100, fatigue + w.fatigue), max(0, initiative - w.initiative), guard))
+                for w in INFLICTED_RULES]
+    if p_hit < 1.0:
+        results.append((1.0 - p_hit, state))
+    return results
+
+
+def cost(p: Profile, action_type: int) -> int:
+    return BASE_COST[action_type] + p.weight // 5
+
+
+# update_stamina() followed by regenerate()
+def recover(state: tuple, p: Profile, action_type: int, stamina_cost: int) -> tuple:
+    health, stamina, max_stamina, fatigue, initiative, guard = state
+    if action_type != REST:
+        stamina = max(0, stamina - stamina_cost)
+        fatigue = min(100, fatigue + 5)
+    else:
+        stamina = min(max_stamina, stamina + 20)
+        fatigue = max(0, fatigue - 10)
+    regen = max(1, 10 - p.weight // 2 - fatigue // 20)
+    stamina = min(max_stamina, stamina + regen)
+    max_stamina = max(50, 100 - fatigue // 2)
+    return health, stamina, max_stamina, fatigue, initiative, guard
+
+
+def tire(state: tuple) -> tuple:
+    return state[:FATIGUE] + (min(100, state[FATIGUE] + 5),) + state[FATIGUE + 1:]
+
+
+# Every (player_state, opponent_state) a round can end in, mapped to its probability
+def round_outcomes(m: Matchup, player: tuple, opponent: tuple, player_action: tuple, opponent_action: tuple) -> dict:
+    p_cost = cost(m.player, player_action[0])
+    o_cost = cost(m.opponent, opponent_action[0])
+    if player[STAMINA] < p_cost:
+        player_action = (REST, NO_GUARD, player_action[2])
+    if opponent[STAMINA] < o_cost:
+        opponent_action = (REST, NO_GUARD, opponent_action[2])
+    player = player[:GUARD] + (player_action[2],)
+    opponent = opponent[:GUARD] + (opponent_action[2],)
+
+    p_init = player[INITIATIVE] + m.player.speed - player[FATIGUE] // 10
+    o_init = opponent[INITIATIVE] + m.opponent.speed - opponent[FATIGUE] // 10
+    p_damage = blow_damage(m.player, m.opponent, player_action[0])
+    o_damage = blow_damage(m.opponent, m.player, opponent_action[0])
+    p_hit = hit_chance(player_action, opponent_action)
+    o_hit = hit_chance(opponent_action, player_action)
+
+    combat = []
+    if p_init >= o_init:
+        for p1, o in attack_outcomes(opponent, p_damage, p_hit):
+            if o[HEALTH] > 0:
+                combat.extend((p1 * p2, p, o) for p2, p in attack_outcomes(player, o_damage, o_hit))
+            else:
+                combat.append((p1, player, o))
+    else:
+        for p1, p in attack_outcomes(player, o_damage, o_hit):
+            if p[HEALTH] > 0:
+                combat.extend((p1 * p2, p, o) for p2, o in attack_outcomes(opponent, p_damage, p_hit))
+            else:
+                combat.append((p1, p, opponent))
+
+    results = {}
+    chance = m.terrain_chance
+    for prob, p, o in combat:
+        for q, tired in ((1.0 - chance, False), (chance, True)):
+            if q == 0.0:
+                continue
+            pp, oo = (tire(p), tire(o)) if tired else (p, o)
+            key = (recover(pp, m.player, player_action[0], p_cost),
+                   recover(oo, m.opponent, opponent_action[0], o_cost))
+            results[key] = results.get(key, 0.0) + prob * q
+    return results
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Opt-in instrumentation. Profiler.enable() swaps the functions listed in
+INSTRUMENTED for timing wrappers, wherever a module holds them (so names
+imported with `from rules import ...` are covered too), and
+disable() puts the originals back: a game or simulation that never enables
+a profiler runs exactly the code it always did.
+
+Each call is timed and counted. Self time is split into phases (rules, AI,
+rendering, input waits) and totalled per round, between consecutive ends
+of step_round(), into log2 histograms; the call tree is kept as well and
+can be written as collapsed stacks for flamegraph.pl or speedscope.
+
+    python profiling.py --duels 2000 --render --json prof.json --collapsed prof.folded
+    python fechtmeister.py --profile prof.json
+"""
+
+import argparse
+import builtins
+import functools
+import importlib
+import json
+import os
+import random
+import sys
+import time
+
+# (module, name, phase). Class.method names are wrapped on the class.
+INSTRUMENTED = (
+    ("rules", "simulate_duel", "rules"),
+    ("rules", "step_round", "rules"),
+    ("rules", "resolve_combat", "rules"),
+    ("rules", "resolve_attack", "rules"),
+    ("rules", "calculate_stamina_cost", "rules"),
+    ("rules", "ai_choose_action", "ai"),
+    ("fechtmeister", "format_knight_status", "render"),
+    ("fechtmeister", "format_vitals", "render"),
+    ("fechtmeister", "format_round", "render"),
+    ("fechtmeister", "guard_ascii", "render"),
+    ("fechtmeister", "action_ascii", "render"),
+    ("fechtmeister", "display_bar", "render"),
+    ("fechtmeister", "PlainUI.ask", "render"),
+    ("fechtmeister", "PlainUI.show_result", "render"),
+    ("screen", "ScreenUI._draw", "render"),
+    ("inputs", "LineReader.wait", "input"),
+)
+PHASES = ("rules", "ai", "render", "input")
+ROUND_END = "step_round"
+
+
+# Durations in log2 buckets: bucket b counts durations of b significant bits, i.e. below 2**b ns.
+# The wrappers increment buckets directly, as a method call would cost more than the rest of the bookkeeping.
+class Histogram:
+    __slots__ = ("buckets",)
+
+    def __init__(self):
+        self.buckets = [0] * 64
+
+    def add(self, ns: int):
+        self.buckets[ns.bit_length()] += 1
+
+    @property
+    def count(self) -> int:
+        return sum(self.buckets)
+
+    # Upper bound of the bucket holding the q-th quantile
+    def percentile(self, q: float) -> int:
+        rank = q * self.count
+        seen = 0
+        for b, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return (1 << b) - 1
+        return 0
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "p50_ns": self.percentile(0.5), "p99_ns": self.percentile(0.99),
+                "buckets": {str(1 << b): n for b, n in enumerate(self.buckets) if n}}
+
+
+class CallNode:
+    __slots__ = ("name", "ns", "total", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.ns = 0  # Self time
+        self.total = 0  # Including callees
+        self.children = {}
+
+    def child(self, name: str) -> "CallNode":
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = CallNode(name)
+        return node
+
+    def walk(self, path=()):
+        for node in self.children.values():
+            yield path + (node.name,), node
+            yield from node.walk(path + (node.name,))
+
+
+def format_ns(ns: float) -> str:
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.1f} µs"
+    return f"{ns:.0f} ns"
+
+
+# The modules to look for INSTRUMENTED names in: those listed, and __main__ when it is one of them run as a script
+def game_modules() -> dict:
+    modules = {}
+    main = sys.modules.get("__main__")
+    for name in {m for m, _, _ in INSTRUMENTED}:
+        modules.setdefault(name, []).append(importlib.import_module(name))
+        if main is not None and os.path.basename(getattr(main, "__file__", "") or "") == name + ".py":
+            modules[name].append(main)
+    return modules
+
+
+class Profiler:
+    def __init__(self):
+        self.root = CallNode("")
+        self.frames = [[self.root, 0]]  # [CallNode, time spent in instrumented callees] per active call
+        self.functions = {}  # name -> Histogram of call times, including callees
+        self.phase_of = {}
+        self.phase_ns = dict.fromkeys(PHASES, 0)
+        self.round_start = dict.fromkeys(PHASES, 0)
+        self.per_round = {p: Histogram() for p in PHASES}
+        self.rounds = 0
+        self.wrappers = {}  # id(original) -> (original, wrapper)
+        self.restore = []  # (namespace or object, name, original)
+        self.started = self.stopped = None
+
+    def wrapper_of(self, value):
+        entry = self.wrappers.get(id(value))
+        return entry[1] if entry is not None and entry[0] is value else None
+
+    def wrap(self, fn, name: str, phase: str):
+        wrapper = self.wrapper_of(fn)
+        if wrapper is not None:
+            return wrapper
+        clock = time.perf_counter_ns
+        frames, phase_ns = self.frames, self.phase_ns
+        buckets = self.functions.setdefault(name, Histogram()).buckets
+        self.phase_of[name] = phase
+        end_round = self.end_round if name == ROUND_END else None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            parent = frames[-1]
+            node = parent[0].children.get(name) or parent[0].child(name)
+            frame = [node, 0]
+            frames.append(frame)
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                frames.pop()
+                parent[1] += elapsed
+                own = elapsed - frame[1]
+                node.ns += own
+                node.total += elapsed
+                phase_ns[phase] += own
+                buckets[elapsed.bit_length()] += 1
+                if end_round:
+                    end_round()
+
+        self.wrappers[id(fn)] = (fn, wrapper)
+        return wrapper
+
+    # The instrumented stand-in for fn, e.g. for a reference taken before enable(). Callables that
+    # are not instrumented (an AI object, say) get a wrapper of their own.
+    def instrumented(self, fn, phase: str = "ai"):
+        if not self.started:
+            return fn
+        return self.wrap(fn, getattr(fn, "__name__", type(fn).__name__), phase)
+
+    def end_round(self):
+        for p in PHASES:
+            self.per_round[p].add(self.phase_ns[p] - self.round_start[p])
+        self.round_start.update(self.phase_ns)
+        self.rounds += 1
+
+    def enable(self):
+        modules = game_modules()
+        for module_name, qualname, phase in INSTRUMENTED:
+            for module in modules[module_name]:
+                owner_name, _, attr = qualname.rpartition(".")
+                if owner_name:
+                    owner = vars(module).get(owner_name)
+                    if owner is None or attr not in vars(owner):
+                        continue
+                    fn = vars(owner)[attr]
+                    if self.wrapper_of(fn) is None:
+                        self.restore.append((owner, attr, fn))
+                        setattr(owner, attr, self.wrap(fn, qualname, phase))
+                else:
+                    fn = vars(module).get(attr)
+                    if fn is not None:
+                        self.wrap(fn, qualname, phase)
+        # Rebind every module-level reference to an original, wherever it was imported, and
+        # defaults such as simulate_duel(step=step_round)
+        for module in list(sys.modules.values()):
+            namespace = getattr(module, "__dict__", None)
+            if namespace is None:
+                continue
+            for name, value in list(namespace.items()):
+                wrapper = self.wrapper_of(value)
+                if wrapper is not None:
+                    self.restore.append((namespace, name, value))
+                    namespace[name] = wrapper
+        for fn, _ in list(self.wrappers.values()):
+            defaults = getattr(fn, "__defaults__", None)
+            if defaults and any(self.wrapper_of(d) for d in defaults):
+                self.restore.append((fn, "__defaults__", defaults))
+                fn.__defaults__ = tuple(self.wrapper_of(d) or d for d in defaults)
+        self.restore.append((builtins, "input", builtins.input))
+        builtins.input = self.wrap(builtins.input, "input", "input")
+        self.started = time.perf_counter()
+
+    def disable(self):
+        self.stopped = time.perf_counter()
+        for owner, name, original in reversed(self.restore):
+            if isinstance(owner, dict):
+                owner[name] = original
+            else:
+                setattr(owner, name, original)
+        self.restore.clear()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    @property
+    def wall(self) -> float:
+        return (self.stopped or time.perf_counter()) - self.started
+
+    # name -> [self time, time including callees], summed over the call tree
+    def times(self) -> dict:
+        totals = {name: [0, 0] for name in self.functions}
+        for _, node in self.root.walk():
+            totals[node.name][0] += node.ns
+            totals[node.name][1] += node.total
+        return totals
+
+    def to_dict(self) -> dict:
+        times = self.times()
+        return {
+            "wall_s": self.wall,
+            "rounds": self.rounds,
+            "rounds_per_s": self.rounds / self.wall if self.wall else 0.0,
+            "overhead_ns_per_call": call_overhead(),
+            "phases": {p: {"total_ns": self.phase_ns[p], "per_round": self.per_round[p].to_dict()} for p in PHASES},
+            "functions": {name: {"phase": self.phase_of[name], "self_ns": times[name][0],
+                                 "inclusive_ns": times[name][1], "calls": h.to_dict()}
+                          for name, h in self.functions.items() if h.count},
+        }
+
+    def write_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    # One line per call path with its self time in ns, the format flamegraph.pl reads
+    def write_collapsed(self, path: str):
+        with open(path, "w") as f:
+            for stack, node in self.root.walk():
+                if node.ns:
+                    f.write(f"{';'.join(stack)} {node.ns}\n")
+
+    def report(self) -> str:
+        wall = self.wall
+        rounds = self.rounds or 1
+        out = [f"{self.rounds:,} rounds in {wall:.2f}s ({self.rounds / wall:,.0f} rounds/s instrumented, "
+               f"~{call_overhead():.0f} ns overhead per instrumented call)\n",
+               f"{'Phase':<8} {'Total':>10} {'Mean/round':>11} {'p50/round':>10} {'p99/round':>10}"]
+        for p in PHASES:
+            h = self.per_round[p]
+            out.append(f"{p:<8} {format_ns(self.phase_ns[p]):>10} {format_ns(self.phase_ns[p] / rounds):>11} "
+                       f"{format_ns(h.percentile(0.5)):>10} {format_ns(h.percentile(0.99)):>10}")
+        times = self.times()
+        timed = sum(own for own, _ in times.values()) or 1
+        out.append(f"\n{'Function':<24} {'Calls':>10} {'Total':>10} {'Mean':>10} {'p99':>10} {'Self %':>7}")
+        for name, h in sorted(self.functions.items(), key=lambda kv: -times[kv[0]][0]):
+            calls = h.count
+            if calls:
+                own, total = times[name]
+                out.append(f"{name:<24} {calls:>10,} {format_ns(total):>10} {format_ns(total / calls):>10} "
+                           f"{format_ns(h.percentile(0.99)):>10} {100 * own / timed:>6.1f}%")
+        return "\n".join(out) + "\n"
+
+
+# What one instrumented call adds, measured once on an empty function
+@functools.lru_cache(maxsize=None)
+def call_overhead(calls: int = 20_000) -> float:
+    def noop():
+        pass
+
+    wrapped = Profiler().wrap(noop, "noop", "rules")
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        noop()
+    bare = time.perf_counter_ns() - start
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        wrapped()
+    return max(0.0, (time.perf_counter_ns() - start - bare) / calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile headless AI-vs-AI duels")
+    parser.add_argument("--duels", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--render", action="store_true", help="also format every round as the game would")
+    parser.add_argument("--json", help="write the profile to this file")
+    parser.add_argument("--collapsed", help="write collapsed stacks (for flamegraph.pl) to this file")
+    args = parser.parse_args()
+
+    import fechtmeister as fm
+
+    rng = random.Random(args.seed)
+    with Profiler() as profiler:
+        if args.render:
+            def step(state, player_action, opponent_action, rng):
+                result = fm.step_round(state, player_action, opponent_action, rng)
+                fm.format_knight_status(state.player) + fm.format_knight_status(state.opponent)
+                fm.format_round(result, state.player, state.opponent)
+                return result
+        else:
+            step = fm.step_round  # The instrumented one, now
+
+        for _ in range(args.duels):
+            fm.simulate_duel(fm.make_default_duel(), rng, step=step)
+
+    print(profiler.report(), end="")
+    if args.json:
+        profiler.write_json(args.json)
+    if args.collapsed:
+        profiler.write_collapsed(args.collapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Replay logs. Every round of a duel is one fixed-width binary record: both
+actions as chosen, the two initiative values, the dice step_round() rolled
+(feint, wound and terrain rolls) and both knights' state after the round.
+A log is a stream of duels, each a small header (magic, round count, the
+starting state as JSON) followed by its records, and a `.idx` sidecar
+holds one fixed-width entry per duel, so any round of any duel is a single
+seek away. Readers memory-map the log.
+
+    python fechtmeister.py --replay duels.fmr        # record a game
+    python replay.py duels.fmr                       # list the duels
+    python replay.py duels.fmr --duel 0 --round 12   # re-render a round
+    python replay.py duels.fmr --duel 0 --state 40   # knights after 40 rounds
+    python replay.py duels.fmr --verify              # re-simulate every round against the log
+    python replay.py duels.fmr --bench               # bulk-load speed
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+
+from fechtmeister import (Action, ActionType, DamageType, DuelState, Environment, EventType, Guard, Knight,
+                          RoundResult, Terrain, Wound, add_wound, format_knight_status, format_round, make_action,
+                          make_default_duel, simulate_duel, step_round)
+from tournament import knight_from_dict
+
+MAGIC = b"FMREPLY1"
+# Magic, rounds, length of the JSON start state that follows
+HEADER = struct.Struct("<8sII")
+# Header offset, first record offset, rounds
+INDEX = struct.Struct("<QQI")
+
+# Round number; both chosen actions (type, target, starting guard); both initiatives; flags;
+# the number of dice rolled and the rolls; then health, stamina, max stamina, fatigue,
+# initiative, guard and the wound taken this round for the player and then the opponent
+MAX_DRAWS = 7  # Per attack a feint roll, a wound roll and a wound location, then terrain
+ROUND = struct.Struct(f"<I6B2hBB{MAX_DRAWS}B7B7B")
+ROUND_NUM = 0
+PLAYER_ACTION, OPPONENT_ACTION = slice(1, 4), slice(4, 7)
+PLAYER_INIT, OPPONENT_INIT, FLAGS, DRAW_COUNT = 7, 8, 9, 10
+DRAWS = 11
+PLAYER_STATE = slice(DRAWS + MAX_DRAWS, DRAWS + MAX_DRAWS + 7)
+OPPONENT_STATE = slice(DRAWS + MAX_DRAWS + 7, DRAWS + MAX_DRAWS + 14)
+HEALTH, STAMINA, MAX_STAMINA, FATIGUE, INITIATIVE, GUARD, WOUND = range(7)
+
+# FLAGS bits
+PLAYER_FORCED_REST, OPPONENT_FORCED_REST, TERRAIN, PLAYER_FIRST = 1, 2, 4, 8
+
+
+class ReplayError(Exception):
+    pass
+
+
+# Stands in for the duel's random.Random inside step_round(), passing every roll through and
+# keeping it, as an offset from the bottom of the range or an index into the sequence
+class TapeRecorder:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.draws = []
+
+    def randint(self, a: int, b: int) -> int:
+        v = self.rng.randint(a, b)
+        self.draws.append(v - a)
+        return v
+
+    # randrange(n) draws exactly as choice() does, so recording does not change the game
+    def choice(self, seq):
+        i = self.rng.randrange(len(seq))
+        self.draws.append(i)
+        return seq[i]
+
+
+# Plays recorded rolls back to step_round()
+class TapePlayer:
+    def __init__(self, draws):
+        self.draws = iter(draws)
+
+    def randint(self, a: int, b: int) -> int:
+        return a + next(self.draws)
+
+    def choice(self, seq):
+        return seq[next(self.draws)]
+
+
+def knight_to_dict(k: Knight) -> dict:
+    w, a = k.weapon, k.armor
+    return {
+        "name": k.name, "health": k.health, "stamina": k.stamina, "max_stamina": k.max_stamina,
+        "fatigue": k.fatigue, "initiative": k.initiative, "guard": k.current_guard.name, "wounds": k.wounds,
+        "weapon": {"name": w.name, "damage": w.damage, "speed": w.speed, "weight": w.weight,
+                   "two_handed": w.two_handed, "type": w.type.name.lower(), "ascii_art": w.ascii_art},
+        "armor": {"name": a.name, "defense": {t.name.lower(): a.defense[t.value] for t in DamageType},
+                  "weight": a.weight, "coverage": a.coverage},
+    }
+
+
+def knight_from_record(d: dict) -> Knight:
+    k = knight_from_dict(d)
+    k.health, k.stamina, k.max_stamina, k.fatigue = d["health"], d["stamina"], d["max_stamina"], d["fatigue"]
+    k.wounds = d["wounds"]
+    return k
+
+
+def encode_start(state: DuelState) -> bytes:
+    return json.dumps({
+        "player": knight_to_dict(state.player),
+        "opponent": knight_to_dict(state.opponent),
+        "env": {"terrain": state.env.type.name, "obstacle_density": state.env.obstacle_density},
+        "round_num": state.round_num,
+    }, separators=(",", ":")).encode()
+
+
+def decode_start(data: bytes) -> DuelState:
+    d = json.loads(data)
+    terrain = Terrain[d["env"]["terrain"]]
+    env = Environment(type=terrain, obstacle_density=d["env"]["obstacle_density"])
+    return DuelState(knight_from_record(d["player"]), knight_from_record(d["opponent"]), env, d["round_num"])
+
+
+def knight_fields(k: Knight, wound: Wound) -> tuple:
+    return (k.health, k.stamina, k.max_stamina, k.fatigue, k.initiative, k.current_guard.value, wound.value)
+
+
+def action_fields(a: Action) -> tuple:
+    return (a.type.value, a.target_guard.value, a.starting_guard.value)
+
+
+def record_action(fields: tuple) -> Action:
+    return make_action(ActionType(fields[0]), Guard(fields[1]), Guard(fields[2]))
+
+
+# Has step_round()'s signature, so it can stand in for it (see simulate_duel()); plays each round
+# and keeps its record, then writes the whole duel to the log on close(), unless no round was played
+class DuelRecorder:
+    def __init__(self, writer: "ReplayWriter", state: DuelState):
+        self.writer = writer
+        self.start = encode_start(state)
+        self.records = bytearray()
+        self.rounds = 0
+        self.closed = False
+
+    def __call__(self, state: DuelState, player_action: Action, opponent_action: Action,
+                 rng: random.Random) -> RoundResult:
+        tape = TapeRecorder(rng)
+        result = step_round(state, player_action, opponent_action, tape)
+
+        flags = PLAYER_FIRST if result.player_first else 0
+        player_wound = opponent_wound = Wound.NONE
+        for e in result.events:
+            if e.type == EventType.FORCED_REST:
+                flags |= PLAYER_FORCED_REST if e.actor is state.player else OPPONENT_FORCED_REST
+            elif e.type == EventType.TERRAIN:
+                flags |= TERRAIN
+            elif e.type == EventType.WOUND:
+                if e.target is state.player:
+                    player_wound = e.wound
+                else:
+                    opponent_wound = e.wound
+        draws = tape.draws + [0] * (MAX_DRAWS - len(tape.draws))
+
+        self.records += ROUND.pack(result.round_num, *action_fields(player_action), *action_fields(opponent_action),
+                                   result.player_init, result.opp_init, flags, len(tape.draws), *draws,
+                                   *knight_fields(state.player, player_wound),
+                                   *knight_fields(state.opponent, opponent_wound))
+        self.rounds += 1
+        return result
+
+    def close(self):
+        if not self.closed and self.rounds:
+            self.writer.write_duel(self.start, self.records, self.rounds)
+        self.closed = True
+
+
+# Appends duels to a log and its index. Each duel is written in one piece when its recorder
+# closes, so many duels can record at once (as on the server) without interleaving.
+class ReplayWriter:
+    def __init__(self, path: str, buffer_size: int = 1 << 16):
+        self.log = open(path, "ab", buffering=buffer_size)
+        self.index = open(path + ".idx", "ab", buffering=buffer_size)
+        self.offset = self.log.seek(0, os.SEEK_END)
+        self.duels = 0
+
+    def duel(self, state: DuelState) -> DuelRecorder:
+        return DuelRecorder(self, state)
+
+    def write_duel(self, start: bytes, records: bytes, rounds: int):
+        self.log.write(HEADER.pack(MAGIC, rounds, len(start)))
+        self.log.write(start)
+        self.log.write(records)
+        self.index.write(INDEX.pack(self.offset, self.offset + HEADER.size + len(start), rounds))
+        self.offset += HEADER.size + len(start) + len(records)
+        self.duels += 1
+
+    def flush(self):
+        self.log.flush()
+        self.index.flush()
+
+    def close(self):
+        self.log.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Read the duel entries by walking the headers, for logs whose index is missing or stale
+def scan_index(data) -> list:
+    entries = []
+    offset = 0
+    while offset < len(data):
+        if len(data) - offset < HEADER.size:
+            raise ReplayError(f"truncated header at byte {offset}")
+        magic, rounds, start_len = HEADER.unpack_from(data, offset)
+        if magic != MAGIC:
+            raise ReplayError(f"not a replay log (bad magic at byte {offset})")
+        records = offset + HEADER.size + start_len
+        entries.append((offset, records, rounds))
+        offset = records + rounds * ROUND.size
+    if offset != len(data):
+        raise ReplayError("truncated duel at the end of the log")
+    return entries
+
+
+class Replay:
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.duels = self.load_index(path + ".idx", size)
+
+    def load_index(self, path: str, size: int) -> list:
+        try:
+            with open(path, "rb") as f:
+                entries = list(INDEX.iter_unpack(f.read()))
+        except (FileNotFoundError, struct.error):
+            return scan_index(self.data)
+        end = entries[-1][1] + entries[-1][2] * ROUND.size if entries else 0
+        if end != size:
+            return scan_index(self.data)
+        return entries
+
+    def __len__(self) -> int:
+        return len(self.duels)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def rounds(self, duel: int) -> int:
+        return self.duels[duel][2]
+
+    def start(self, duel: int) -> DuelState:
+        header, records, _ = self.duels[duel]
+        return decode_start(self.data[header + HEADER.size:records])
+
+    def record(self, duel: int, i: int) -> tuple:
+        _, records, rounds = self.duels[duel]
+        if not 0 <= i < rounds:
+            raise IndexError(f"duel {duel} has {rounds} rounds")
+        return ROUND.unpack_from(self.data, records + i * ROUND.size)
+
+    def records(self, duel: int):
+        _, records, rounds = self.duels[duel]
+        return ROUND.iter_unpack(memoryview(self.data)[records:records + rounds * ROUND.size])
+
+    # Every record of every duel, as (duel, record); the bulk path for analytics
+    def all_records(self):
+        view = memoryview(self.data)
+        for duel, (_, records, rounds) in enumerate(self.duels):
+            for r in ROUND.iter_unpack(view[records:records + rounds * ROUND.size]):
+                yield duel, r
+
+    # The duel after its first k rounds, read straight from record k-1; only the wound
+    # history needs the earlier records
+    def state(self, duel: int, k: int) -> DuelState:
+        state = self.start(duel)
+        if k == 0:
+            return state
+        last = self.record(duel, k - 1)
+        for knight, fields in ((state.player, PLAYER_STATE), (state.opponent, OPPONENT_STATE)):
+            s = last[fields]
+            knight.health, knight.stamina, knight.max_stamina, knight.fatigue, knight.initiative = s[:GUARD]
+            knight.current_guard = Guard(s[GUARD])
+        for i, r in enumerate(self.records(duel)):
+            if i == k:
+                break
+            for knight, fields in ((state.player, PLAYER_STATE), (state.opponent, OPPONENT_STATE)):
+                if r[fields][WOUND]:
+                    knight.wounds = add_wound(knight.wounds, Wound(r[fields][WOUND]))
+        state.round_num = last[ROUND_NUM] + 1
+        return state
+
+    # Play round i again from the state before it; returns that state, advanced, and the result
+    def replay_round(self, duel: int, i: int, state: DuelState = None):
+        if state is None:
+            state = self.state(duel, i)
+        r = self.record(duel, i)
+        tape = TapePlayer(r[DRAWS:DRAWS + r[DRAW_COUNT]])
+        result = step_round(state, record_action(r[PLAYER_ACTION]), record_action(r[OPPONENT_ACTION]), tape)
+        return state, result
+
+    # Round i as the game showed it: both knights going in, then what happened
+    def render(self, duel: int, i: int) -> str:
+        state = self.state(duel, i)
+        before = format_knight_status(state.player) + format_knight_status(state.opponent)
+        state, result = self.replay_round(duel, i, state)
+        return before + format_round(result, state.player, state.opponent)
+
+    # Re-simulate the duel from its start and the recorded dice; returns the rounds that disagree
+    def verify(self, duel: int) -> list:
+        state = self.start(duel)
+        bad = []
+        for i, r in enumerate(self.records(duel)):
+            state, result = self.replay_round(duel, i, state)
+            got = (result.round_num, result.player_init, result.opp_init,
+                   knight_fields(state.player, Wound.NONE)[:WOUND], knight_fields(state.opponent, Wound.NONE)[:WOUND])
+            want = (r[ROUND_NUM], r[PLAYER_INIT], r[OPPONENT_INIT], r[PLAYER_STATE][:WOUND], r[OPPONENT_STATE][:WOUND])
+            if got != want:
+                bad.append(i)
+        return bad
+
+
+def describe(replay: Replay, duel: int) -> str:
+    state = replay.start(duel)
+    rounds = replay.rounds(duel)
+    if rounds:
+        last = replay.record(duel, rounds - 1)
+        health = f"{last[PLAYER_STATE][HEALTH]} vs {last[OPPONENT_STATE][HEALTH]} health"
+    else:
+        health = "not started"
+    return (f"{duel:>5}  {state.player.name} ({state.player.weapon.name}) vs {state.opponent.name} "
+            f"({state.opponent.weapon.name}) on {state.env.type.name.lower()} ground: {rounds} rounds, {health}")
+
+
+def bench(path: str, duels: int, seed: int):
+    if not os.path.exists(path):
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        with ReplayWriter(path) as writer:
+            for _ in range(duels):
+                state = make_default_duel()
+                recorder = writer.duel(state)
+                simulate_duel(state, rng, step=recorder)
+                recorder.close()
+        print(f"Recorded {duels} duels in {time.perf_counter() - start:.1f}s")
+
+    with Replay(path) as replay:
+        start = time.perf_counter()
+        rounds = damage = 0
+        for _, r in replay.all_records():
+            rounds += 1
+            damage += 100 - r[OPPONENT_STATE][HEALTH]
+        elapsed = time.perf_counter() - start
+        print(f"Loaded {rounds:,} rounds from {len(replay)} duels in {elapsed:.3f}s "
+              f"({rounds / elapsed:,.0f} rounds/s, {ROUND.size} bytes/round)")
+
+        start = time.perf_counter()
+        n = min(len(replay), 200)
+        for duel in range(n):
+            replay.state(duel, replay.rounds(duel) // 2)
+        print(f"Seeked to mid-duel state {n} times in {1000 * (time.perf_counter() - start):.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, re-render and verify Fechtmeister replay logs")
+    parser.add_argument("log")
+    parser.add_argument("--duel", type=int, default=0)
+    parser.add_argument("--round", type=int, help="re-render this round (0-based) of the duel")
+    parser.add_argument("--state", type=int, help="show both knights after this many rounds of the duel")
+    parser.add_argument("--verify", action="store_true", help="re-simulate every duel and compare with the log")
+    parser.add_argument("--bench", action="store_true",
+                        help="time bulk loading (recording --duels stock duels first if the log does not exist)")
+    parser.add_argument("--duels", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args.log, args.duels, args.seed)
+        return
+
+    try:
+        replay = Replay(args.log)
+    except (FileNotFoundError, ReplayError) as e:
+        sys.exit(str(e))
+    with replay:
+        if args.verify:
+            bad = {duel: replay.verify(duel) for duel in range(len(replay))}
+            bad = {duel: rounds for duel, rounds in bad.items() if rounds}
+            for duel, rounds in bad.items():
+                print(f"Duel {duel}: {len(rounds)} rounds differ, first at round {rounds[0]}")
+            print(f"{len(replay) - len(bad)} of {len(replay)} duels replay exactly")
+            sys.exit(1 if bad else 0)
+        elif args.round is not None or args.state is not None:
+            if not 0 <= args.duel < len(replay):
+                sys.exit(f"the log holds {len(replay)} duels")
+            try:
+                if args.round is not None:
+                    sys.stdout.write(replay.render(args.duel, args.round))
+                else:
+                    state = replay.state(args.duel, args.state)
+                    sys.stdout.write(format_knight_status(state.player) + format_knight_status(state.opponent))
+            except IndexError as e:
+                sys.exit(str(e))
+        else:
+            for duel in range(len(replay)):
+                print(describe(replay, duel))
+
+
+if __name__ == "__main__":
+    main()
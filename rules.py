@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The rules of Fechtmeister: knights, weapons, armor and terrain, the rules
+tables, round resolution, the stock AI and the standard match-up. Nothing
+here draws or reads from a terminal, so simulations, tournaments and
+servers can import it without the presentation code in fechtmeister.py.
+"""
+
+import random
+from enum import Enum
+from dataclasses import dataclass, field
+
+# Enums for guards, actions, wounds, and terrains
+class Guard(Enum):
+    HIGH = 0
+    MIDDLE = 1
+    LOW = 2
+    NO = 3  # For resting or unready states
+
+class ActionType(Enum):
+    STRIKE = 0
+    THRUST = 1
+    DEFEND = 2
+    FEINT = 3
+    REST = 4
+
+class Wound(Enum):
+    NONE = 0
+    ARM = 1
+    LEG = 2
+    HEAD = 3
+    BODY = 4
+
+class Terrain(Enum):
+    OPEN = 0
+    NARROW = 1
+    ROUGH = 2
+
+class DamageType(Enum):
+    SLASHING = 0
+    PIERCING = 1
+
+# Data classes for game elements. All are slotted; equipment, terrain and actions never
+# change once made, so they are frozen as well.
+@dataclass(frozen=True, slots=True)
+class Weapon:
+    name: str
+    damage: int          # Base damage
+    speed: int           # Initiative bonus
+    weight: int          # Affects stamina cost
+    two_handed: bool
+    type: DamageType
+    ascii_art: str
+
+@dataclass(frozen=True, slots=True)
+class Armor:
+    name: str
+    defense: tuple       # Indexed by DamageType value, e.g. (8, 6) for slashing 8, piercing 6
+    weight: int          # Affects stamina/fatigue
+    coverage: int        # Percentage chance to protect (0-100)
+    # Damage taken off a landed blow, per DamageType value: defense scaled by coverage, worked out once
+    reduction: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "reduction", tuple(d * (self.coverage / 100) for d in self.defense))
+
+@dataclass(frozen=True, slots=True)
+class Environment:
+    type: Terrain
+    obstacle_density: int  # 0-10, affects movement and dodging
+    ascii_art: str = ""  # Drawn in place of the terrain's own banner
+
+@dataclass(slots=True)
+class Knight:
+    name: str
+    health: int = 100
+    stamina: int = 100
+    max_stamina: int = 100
+    fatigue: int = 0
+    weapon: Weapon = None
+    armor: Armor = None
+    current_guard: Guard = Guard.MIDDLE
+    wounds: int = 0      # Wounds taken, packed WOUND_BITS per wound with the latest lowest; see wound_list()
+    initiative: int = 10
+    # Loadout terms of the stamina rules, worked out once from the gear; dataclasses.replace()
+    # recomputes them, so change a knight's gear by replacing the knight
+    weight_factor: int = field(default=0, init=False, repr=False, compare=False)
+    regen_base: int = field(default=0, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        load = (self.weapon.weight if self.weapon else 0) + (self.armor.weight if self.armor else 0)
+        self.weight_factor = load // 5
+        self.regen_base = 10 - load // 2
+
+@dataclass(frozen=True, slots=True)
+class Action:
+    type: ActionType
+    target_guard: Guard
+    starting_guard: Guard
+
+# Every action there can be, made once; make_action() hands out these shared instances
+ALL_ACTIONS = {(t, target, start): Action(t, target, start) for t in ActionType for target in Guard for start in Guard}
+
+def make_action(action_type: ActionType, target_guard: Guard, starting_guard: Guard) -> Action:
+    return ALL_ACTIONS[action_type, target_guard, starting_guard]
+
+WOUND_BITS = 3
+
+def add_wound(wounds: int, wound: Wound) -> int:
+    return wounds << WOUND_BITS | wound.value
+
+# The wounds in a packed history, in the order they were taken
+def wound_list(wounds: int) -> list:
+    result = []
+    while wounds:
+        result.append(Wound(wounds & (1 << WOUND_BITS) - 1))
+        wounds >>= WOUND_BITS
+    return result[::-1]
+
+# Rules tables, indexed by enum value: the one place to tune balance
+@dataclass(frozen=True, slots=True)
+class ActionRule:
+    base_cost: int           # Stamina, before the weight of the gear
+    offensive: bool
+    damage_type: DamageType  # None for actions that deal no armored blow
+
+@dataclass(frozen=True, slots=True)
+class WoundRule:
+    name: str
+    health: int              # Lost at once, on top of the blow
+    stamina: int
+    max_stamina: int
+    fatigue: int             # Gained
+    initiative: int
+
+ACTION_RULES = (
+    ActionRule(15, True, DamageType.SLASHING),   # STRIKE
+    ActionRule(15, True, DamageType.PIERCING),   # THRUST
+    ActionRule(8, False, None),                  # DEFEND
+    ActionRule(10, True, None),                  # FEINT: skips the armor, lands only on a defender
+    ActionRule(0, False, None),                  # REST
+)
+
+WOUND_RULES = (
+    WoundRule("none", 0, 0, 0, 0, 0),
+    WoundRule("arm", 0, 10, 5, 0, 0),
+    WoundRule("leg", 0, 0, 0, 0, 5),
+    WoundRule("head", 10, 0, 0, 10, 0),
+    WoundRule("body", 5, 0, 0, 0, 0),
+)
+
+WOUND_PERCENT = 20  # Chance that a landed blow also wounds
+INFLICTED_WOUNDS = (Wound.ARM, Wound.LEG, Wound.HEAD, Wound.BODY)
+TARGET_GUARDS = (Guard.HIGH, Guard.MIDDLE, Guard.LOW)
+BLOW_TYPES = (ActionType.STRIKE, ActionType.THRUST)
+
+class EventType(Enum):
+    FORCED_REST = 0
+    IMPACT = 1
+    WOUND = 2
+    DEFENDED = 3
+    TERRAIN = 4
+
+# Something that happened during a round, for the renderer (or anyone else) to consume
+@dataclass(slots=True)
+class Event:
+    type: EventType
+    actor: Knight = None
+    target: Knight = None
+    action: Action = None
+    damage: int = 0
+    wound: Wound = Wound.NONE
+    guard: Guard = Guard.NO
+
+@dataclass(slots=True)
+class DuelState:
+    player: Knight
+    opponent: Knight
+    env: Environment
+    round_num: int = 1
+
+@dataclass(slots=True)
+class RoundResult:
+    round_num: int
+    player_action: Action    # As actually performed (after any forced rest)
+    opponent_action: Action
+    player_init: int
+    opp_init: int
+    events: list
+
+    @property
+    def player_first(self) -> bool:
+        return self.player_init >= self.opp_init
+
+# Indexed by Guard value
+GUARD_LABELS = ("High Guard (Vom Tach)", "Middle Guard (Pflug)", "Low Guard (Alber)", "No Guard")
+
+# Indexed by ActionType value; formatted with the starting and target guard labels
+ACTION_LABELS = ("Strike from {0} to {1}", "Thrust from {0} to {1}", "Defend in {0}", "Feint from {0}", "Rest")
+
+def guard_to_string(g: Guard) -> str:
+    return GUARD_LABELS[g.value]
+
+def action_to_string(a: Action) -> str:
+    return ACTION_LABELS[a.type.value].format(GUARD_LABELS[a.starting_guard.value], GUARD_LABELS[a.target_guard.value])
+
+def wound_to_string(w: Wound) -> str:
+    return WOUND_RULES[w.value].name
+
+def is_offensive(a_type: ActionType) -> bool:
+    return ACTION_RULES[a_type.value].offensive
+
+# Calculate stamina cost based on action and equipment
+def calculate_stamina_cost(a: Action, knight: Knight) -> int:
+    return ACTION_RULES[a.type.value].base_cost + knight.weight_factor
+
+# Apply wound effects to a knight
+def apply_wound(knight: Knight, wound: Wound):
+    knight.wounds = add_wound(knight.wounds, wound)
+    rule = WOUND_RULES[wound.value]
+    if rule.health:
+        knight.health = max(0, knight.health - rule.health)
+    if rule.stamina:
+        knight.stamina = max(0, knight.stamina - rule.stamina)
+    if rule.max_stamina:
+        knight.max_stamina = max(50, knight.max_stamina - rule.max_stamina)
+    if rule.fatigue:
+        knight.fatigue = min(100, knight.fatigue + rule.fatigue)
+    if rule.initiative:
+        knight.initiative = max(0, knight.initiative - rule.initiative)
+
+# Resolve an attack from one knight to another, appending what happened to events
+def resolve_attack(attacker: Knight, defender: Knight, atk_action: Action, def_action: Action,
+                   events: list, rng: random.Random):
+    rule = ACTION_RULES[atk_action.type.value]
+    if not rule.offensive:
+        return
+
+    hit = False
+    damage = attacker.weapon.damage
+
+    if rule.damage_type is None:  # Feint
+        hit = (def_action.type == ActionType.DEFEND and rng.randint(0, 99) < 50)
+    else:
+        if def_action.type == ActionType.DEFEND and def_action.starting_guard == atk_action.target_guard:
+            hit = False  # Perfect block
+        elif atk_action.target_guard != def_action.starting_guard or def_action.type == ActionType.REST:
+            hit = True
+            damage -= defender.armor.reduction[rule.damage_type.value]
+            damage = max(1, int(damage))
+
+    if hit:
+        defender.health = max(0, defender.health - damage)
+        events.append(Event(EventType.IMPACT, attacker, defender, atk_action, damage=damage))
+        if rng.randint(0, 99) < WOUND_PERCENT:
+            wound_choice = rng.choice(INFLICTED_WOUNDS)
+            apply_wound(defender, wound_choice)
+            events.append(Event(EventType.WOUND, attacker, defender, atk_action, wound=wound_choice))
+    else:
+        events.append(Event(EventType.DEFENDED, attacker, defender, atk_action,
+                            guard=def_action.starting_guard))
+
+# Resolve the combat between player and opponent, returning the initiative values and events
+def resolve_combat(player_action: Action, opponent_action: Action, player: Knight, opponent: Knight,
+                   env: Environment, rng: random.Random):
+    player_init = player.initiative + player.weapon.speed - player.fatigue // 10
+    opp_init = opponent.initiative + opponent.weapon.speed - opponent.fatigue // 10
+    player_first = player_init >= opp_init
+    events = []
+
+    if player_first:
+        resolve_attack(player, opponent, player_action, opponent_action, events, rng)
+        if opponent.health > 0:
+            resolve_attack(opponent, player, opponent_action, player_action, events, rng)
+    else:
+        resolve_attack(opponent, player, opponent_action, player_action, events, rng)
+        if player.health > 0:
+            resolve_attack(player, opponent, player_action, opponent_action, events, rng)
+
+    if env.type == Terrain.ROUGH and rng.randint(0, 99) < env.obstacle_density * 10:
+        player.fatigue = min(100, player.fatigue + 5)
+        opponent.fatigue = min(100, opponent.fatigue + 5)
+        events.append(Event(EventType.TERRAIN))
+
+    return player_init, opp_init, events
+
+# Spend stamina for an action (or recover it when resting), then apply natural regeneration
+def update_stamina(knight: Knight, a: Action, stamina_cost: int):
+    if a.type != ActionType.REST:
+        knight.stamina = max(0, knight.stamina - stamina_cost)
+        knight.fatigue = min(100, knight.fatigue + 5)
+    else:
+        knight.stamina = min(knight.max_stamina, knight.stamina + 20)
+        knight.fatigue = max(0, knight.fatigue - 10)
+
+def regenerate(knight: Knight):
+    regen = max(1, knight.regen_base - knight.fatigue // 20)
+    knight.stamina = min(knight.max_stamina, knight.stamina + regen)
+    knight.max_stamina = max(50, 100 - knight.fatigue // 2)
+
+# Downgrade an action to Rest if the knight cannot pay for it. step_round() holds both knights to this;
+# the original game checked only the player and let the opponent act anyway, its stamina stopping at 0.
+# The stock AI rests below 20 stamina, so it is only ever downgraded with gear weighing 30 or more.
+def check_forced_rest(knight: Knight, a: Action, stamina_cost: int, events: list) -> Action:
+    if knight.stamina < stamina_cost:
+        events.append(Event(EventType.FORCED_REST, knight))
+        return make_action(ActionType.REST, Guard.NO, a.starting_guard)
+    return a
+
+# Play one full round of the rules without any I/O
+def step_round(state: DuelState, player_action: Action, opponent_action: Action, rng: random.Random) -> RoundResult:
+    player, opponent = state.player, state.opponent
+    events = []
+
+    player_cost = calculate_stamina_cost(player_action, player)
+    opp_cost = calculate_stamina_cost(opponent_action, opponent)
+    player_action = check_forced_rest(player, player_action, player_cost, events)
+    opponent_action = check_forced_rest(opponent, opponent_action, opp_cost, events)
+    player.current_guard = player_action.starting_guard
+    opponent.current_guard = opponent_action.starting_guard
+
+    player_init, opp_init, combat_events = resolve_combat(player_action, opponent_action,
+                                                          player, opponent, state.env, rng)
+    events.extend(combat_events)
+
+    # Update stamina and fatigue
+    update_stamina(player, player_action, player_cost)
+    update_stamina(opponent, opponent_action, opp_cost)
+
+    # Natural stamina regeneration and fatigue effects
+    regenerate(player)
+    regenerate(opponent)
+
+    result = RoundResult(state.round_num, player_action, opponent_action, player_init, opp_init, events)
+    state.round_num += 1
+    return result
+
+def duel_over(state: DuelState) -> bool:
+    return state.player.health <= 0 or state.opponent.health <= 0
+
+# Run a whole AI-vs-AI duel headlessly; returns the number of rounds played. Either side can be
+# given another policy with the signature of ai_choose_action(), and step can be anything with
+# the signature of step_round(), such as a replay.DuelRecorder.
+def simulate_duel(state: DuelState, rng: random.Random, max_rounds: int = 500,
+                  player_ai=None, opponent_ai=None, step=step_round) -> int:
+    player, opponent, env = state.player, state.opponent, state.env
+    player_ai = player_ai or ai_choose_action
+    opponent_ai = opponent_ai or ai_choose_action
+    rounds = 0
+    while not duel_over(state) and rounds < max_rounds:
+        player_action = player_ai(player, opponent, env, rng)
+        opponent_action = opponent_ai(opponent, player, env, rng)
+        step(state, player_action, opponent_action, rng)
+        rounds += 1
+    return rounds
+
+# Below this much stamina the stock AI rests, so a knight here is out of the fight
+STARVED_STAMINA = 20
+
+# AI decision-making for the opponent
+def ai_choose_action(ai: Knight, player: Knight, env: Environment, rng: random.Random) -> Action:
+    if ai.stamina < STARVED_STAMINA or ai.fatigue > 80:
+        return make_action(ActionType.REST, Guard.NO, ai.current_guard)
+    choice = rng.randint(0, 99)
+    if choice < 40:
+        action_type = ActionType.STRIKE
+        target_guard = rng.choice(TARGET_GUARDS)
+    elif choice < 60:
+        action_type = ActionType.THRUST
+        target_guard = rng.choice(TARGET_GUARDS)
+    elif choice < 80:
+        action_type = ActionType.DEFEND
+        target_guard = Guard.NO
+    else:
+        action_type = ActionType.FEINT
+        target_guard = rng.choice(TARGET_GUARDS)
+    if player.fatigue > 50:
+        action_type = rng.choice(BLOW_TYPES)
+    if player.current_guard != Guard.NO:
+        target_guard = player.current_guard
+    return make_action(action_type, target_guard, ai.current_guard)
+
+# The standard match-up: a longsword knight in plate against a dagger fighter in chainmail
+def make_default_duel() -> DuelState:
+    # Define weapons
+    longsword = Weapon(
+        name="Longsword",
+        damage=12,
+        speed=3,
+        weight=4,
+        two_handed=True,
+        type=DamageType.SLASHING,
+        ascii_art="/=|===============>"
+    )
+    dagger = Weapon(
+        name="Dagger",
+        damage=6,
+        speed=5,
+        weight=1,
+        two_handed=False,
+        type=DamageType.PIERCING,
+        ascii_art="/=|==>"
+    )
+
+    # Define armors
+    plate = Armor(
+        name="Plate Armor",
+        defense=(8, 6),
+        weight=8,
+        coverage=90
+    )
+    chainmail = Armor(
+        name="Chainmail",
+        defense=(5, 4),
+        weight=5,
+        coverage=70
+    )
+
+    # Define environment
+    env = Environment(
+        type=Terrain.ROUGH,
+        obstacle_density=5
+    )
+
+    # Initialize knights
+    player = Knight(
+        name="Player",
+        health=100,
+        stamina=100,
+        max_stamina=100,
+        fatigue=0,
+        weapon=longsword,
+        armor=plate,
+        current_guard=Guard.MIDDLE,
+        initiative=10
+    )
+    opponent = Knight(
+        name="Opponent",
+        health=100,
+        stamina=100,
+        max_stamina=100,
+        fatigue=0,
+        weapon=dagger,
+        armor=chainmail,
+        current_guard=Guard.HIGH,
+        initiative=12
+    )
+
+    return DuelState(player, opponent, env)
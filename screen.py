@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Differential terminal renderer. The screen is modelled as a grid of
+(style, character) cells; each frame is diffed against the last one and only
+the changed cells are sent, using cursor addressing. A health bar that drops
+from 80 to 65 repaints a handful of cells, and a guard portrait is only
+redrawn when the knight's guard changes.
+"""
+
+import os
+import re
+import shutil
+from collections import deque
+from functools import lru_cache
+
+from fechtmeister import (BOLD, CYAN, MAGENTA, RESET, DuelState, Guard, Knight, RoundResult, format_round,
+                          format_vitals, guard_ascii)
+
+SGR = re.compile(r"\x1b\[[0-9;]*m")
+BLANK = ("", " ")
+STALE = (None, None)  # Never equal to a real cell, so the next flush repaints it
+
+# Gaps of unchanged cells shorter than this are rewritten rather than jumped over,
+# as a cursor move costs more bytes than a few characters
+MAX_GAP = 6
+
+def move_to(row: int, col: int) -> str:
+    return f"\x1b[{row + 1};{col + 1}H"
+
+# Split styled text into rows of (style, char) cells, where style is the SGR sequence in
+# force; styles carry over line breaks, as the art sets its color once at the top
+@lru_cache(maxsize=4096)
+def parse_lines(text: str) -> tuple:
+    rows = [[]]
+    style = ""
+    pos = 0
+    for m in SGR.finditer(text + RESET):
+        for ch in text[pos:m.start()]:
+            if ch == "\n":
+                rows.append([])
+            else:
+                rows[-1].append((style, ch))
+        style = "" if m.group() == RESET else style + m.group()
+        pos = m.end()
+    return tuple(tuple(row) for row in rows)
+
+class Screen:
+    def __init__(self, out, width: int, height: int):
+        self.out = out
+        self.width = width
+        self.height = height
+        self.current = None  # Cells as last written to the terminal
+
+    def canvas(self) -> list:
+        return [[BLANK] * self.width for _ in range(self.height)]
+
+    # Draw styled (possibly multi-line) text onto a canvas, clipped to limit columns and the screen
+    def put(self, canvas: list, row: int, col: int, text: str, limit: int = None):
+        width = self.width - col if limit is None else min(limit, self.width - col)
+        for r, cells in enumerate(parse_lines(text), start=row):
+            if r >= self.height:
+                break
+            n = min(len(cells), width)
+            canvas[r][col:col + n] = cells[:n]
+
+    # Force the given rows to be repainted in full, e.g. after the terminal echoed input there
+    def invalidate(self, *rows: int):
+        if self.current is not None:
+            for r in rows:
+                if 0 <= r < self.height:
+                    self.current[r] = [STALE] * self.width
+
+    # Send the differences between canvas and what is on screen, then park the cursor
+    def flush(self, canvas: list, cursor=(0, 0)):
+        out = []
+        if self.current is None:
+            out.append("\x1b[2J")
+            self.current = self.canvas()
+        for r in range(self.height):
+            new, old = canvas[r], self.current[r]
+            if new == old:
+                continue
+            style = None
+            c = 0
+            while c < self.width:
+                if new[c] == old[c]:
+                    c += 1
+                    continue
+                out.append(move_to(r, c))
+                last_change = c
+                while c < self.width and c - last_change <= MAX_GAP:
+                    if new[c] != old[c]:
+                        last_change = c
+                    s, ch = new[c]
+                    if s != style:
+                        out.append(RESET + s)
+                        style = s
+                    out.append(ch)
+                    c += 1
+        out.append(RESET + move_to(*cursor))
+        self.out.write("".join(out))
+        self.out.flush()
+        self.current = canvas
+
+# Whether the stream can take cursor-addressed output; otherwise use fechtmeister.PlainUI
+def supported(stream) -> bool:
+    if not stream.isatty() or os.environ.get("TERM", "dumb") in ("dumb", "unknown", ""):
+        return False
+    width, height = shutil.get_terminal_size()
+    return width >= ScreenUI.MIN_WIDTH and height >= ScreenUI.MIN_HEIGHT
+
+# The game screen: both knight panels side by side, a combat log, and a prompt area.
+# Each panel keeps its name, bars, gear and wounds at fixed rows above the portrait, so a
+# change of guard never shifts the bars.
+class ScreenUI:
+    PANEL_WIDTH = 48
+    VITALS_LINES = 6
+    PORTRAIT_ROW = 1 + VITALS_LINES
+    PANEL_HEIGHT = PORTRAIT_ROW + max(guard_ascii(g).count("\n") + 1 for g in Guard)
+    LOG_LINES = 10
+    PROMPT_LINES = 8
+    MIN_WIDTH = 2 * PANEL_WIDTH
+    MIN_HEIGHT = 1 + PANEL_HEIGHT + 1 + LOG_LINES + PROMPT_LINES
+
+    def __init__(self, out, reader):
+        width, height = shutil.get_terminal_size()
+        self.reader = reader
+        self.screen = Screen(out, width, height)
+        self.log = deque(maxlen=self.LOG_LINES)
+        self.header = ""
+        self.state = None
+        self.log_row = 1 + self.PANEL_HEIGHT
+        self.prompt_row = self.log_row + 1 + self.LOG_LINES
+
+    def _draw(self, prompt: list, prompt_text: str):
+        screen = self.screen
+        canvas = screen.canvas()
+        screen.put(canvas, 0, 0, self.header)
+        for col, knight in ((0, self.state.player), (self.PANEL_WIDTH, self.state.opponent)):
+            width = self.PANEL_WIDTH - 1
+            screen.put(canvas, 1, col, BOLD + CYAN + f"=== {knight.name} ===" + RESET, width)
+            screen.put(canvas, 2, col, format_vitals(knight), width)
+            screen.put(canvas, 1 + self.PORTRAIT_ROW, col, guard_ascii(knight.current_guard), width)
+        screen.put(canvas, self.log_row, 0, BOLD + "--- Combat log ---" + RESET)
+        for i, line in enumerate(self.log):
+            screen.put(canvas, self.log_row + 1 + i, 0, line)
+        lines = prompt + [prompt_text]
+        for i, line in enumerate(lines):
+            screen.put(canvas, self.prompt_row + i, 0, line)
+        input_row = self.prompt_row + len(lines) - 1
+        screen.flush(canvas, (input_row, len(parse_lines(prompt_text)[0])))
+        return input_row
+
+    def _input(self, prompt: list, prompt_text: str, deadline: float = None):
+        row = self._draw(prompt, prompt_text)
+        answer = self.reader.answer(deadline)
+        self.screen.out.write(self.reader.echo(answer))
+        # The answer and a newline are on the terminal now, which our model knows nothing about
+        self.screen.invalidate(row, row + 1)
+        return answer
+
+    def show_round(self, state: DuelState):
+        self.state = state
+        self.header = BOLD + MAGENTA + f"========== ROUND {state.round_num} ==========" + RESET
+
+    def ask(self, menu: str, deadline: float = None):
+        return self._input(menu.rstrip("\n").split("\n"), "Your choice: ", deadline)
+
+    def show_result(self, result: RoundResult, player: Knight, opponent: Knight):
+        self.log.append(BOLD + MAGENTA + f"Round {result.round_num}:" + RESET)
+        text = format_round(result, player, opponent, banners=False)
+        self.log.extend(line for line in text.split("\n") if line)
+
+    def pause(self):
+        if not self.reader.skip_pause:
+            self._input([], BOLD + "Press Enter to continue to next round..." + RESET)
+
+    # Leave the cursor below the game screen for whatever prints next
+    def close(self):
+        self.screen.out.write(RESET + move_to(self.screen.height - 1, 0) + "\n")
+        self.screen.out.flush()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Search-based opponent. Each round is an expectimax tree: the AI picks the
+action with the best expected value, the other knight's move is a chance
+node weighted by the stock ai_choose_action() mix, and the dice of
+resolve_combat() are a chance node over the exact outcomes from outcomes.py.
+Iterative deepening stops at a per-move time budget. Evaluations are kept in
+a transposition table with LRU eviction, keyed by compact knight tuples, so
+they carry over between rounds and between duels of the same match-up.
+
+    python search_ai.py --duels 20 --budget 0.02
+plays the search AI against the stock AI and reports its win rate, nodes/sec
+and table hit rate.
+"""
+
+import argparse
+import random
+import time
+from collections import OrderedDict
+
+from outcomes import (DEFEND, FATIGUE, FEINT, GUARD, HEALTH, NO_GUARD, REST, STAMINA, STRIKE, THRUST,
+                      knight_state, matchup, round_outcomes)
+from rules import (Action, ActionType, Environment, Guard, Knight, duel_over, make_action,
+                   make_default_duel, simulate_duel)
+
+GUARDS = (Guard.HIGH.value, Guard.MIDDLE.value, Guard.LOW.value)
+
+# Outcomes less likely than this are scored by the evaluation instead of searched further
+MIN_PROBABILITY = 0.02
+
+
+class OutOfTime(Exception):
+    pass
+
+
+# Heuristic value of a position for the opponent slot, in [-1, 1]
+def evaluate(player: tuple, opponent: tuple) -> float:
+    if player[HEALTH] <= 0 or opponent[HEALTH] <= 0:
+        if player[HEALTH] <= 0 and opponent[HEALTH] <= 0:
+            return 0.0
+        return 1.0 if player[HEALTH] <= 0 else -1.0
+    return (0.8 * (opponent[HEALTH] - player[HEALTH]) / 100
+            + 0.1 * (opponent[STAMINA] - player[STAMINA]) / 100
+            + 0.1 * (player[FATIGUE] - opponent[FATIGUE]) / 100)
+
+
+# The AI's candidates. Damage does not depend on which guard a blow aims at, only on whether it is
+# the defender's guard, so one target on the guard and one off it cover every strike and thrust.
+def candidate_actions(player: tuple, opponent: tuple) -> list:
+    on = player[GUARD]
+    off = next(g for g in GUARDS if g != on)
+    guard = opponent[GUARD] if opponent[GUARD] != NO_GUARD else Guard.MIDDLE.value
+    return [(STRIKE, off, guard), (THRUST, off, guard), (STRIKE, on, guard), (THRUST, on, guard),
+            (FEINT, on, guard), (DEFEND, NO_GUARD, guard), (REST, NO_GUARD, guard)]
+
+
+# The other knight as a chance node: the stock policy's mix of action types, aimed at a random guard
+def player_model(player: tuple, opponent: tuple) -> list:
+    guard = player[GUARD]
+    if player[STAMINA] < 20 or player[FATIGUE] > 80:
+        return [(1.0, (REST, NO_GUARD, guard))]
+    if opponent[FATIGUE] > 50:
+        types = ((0.5, STRIKE), (0.5, THRUST))
+    else:
+        types = ((0.4, STRIKE), (0.2, THRUST), (0.2, DEFEND), (0.2, FEINT))
+    on = opponent[GUARD]
+    off = next(g for g in GUARDS if g != on)
+    model = []
+    for p, t in types:
+        if t == DEFEND:
+            model.append((p, (t, NO_GUARD, guard)))
+        else:
+            model.append((p / 3, (t, on, guard)))
+            model.append((2 * p / 3, (t, off, guard)))
+    return model
+
+
+class SearchAI:
+    def __init__(self, budget: float = 0.05, max_depth: int = 4, table_size: int = 500_000):
+        self.budget = budget
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.table = OrderedDict()  # (matchup id, player, opponent) -> (depth, value)
+        self.matchups = {}
+        self.nodes = 0
+        self.lookups = 0
+        self.hits = 0
+        self.search_time = 0.0
+        self.moves = 0
+        self.depth_total = 0
+
+    # Same signature as ai_choose_action(), so it can stand in for it anywhere
+    def __call__(self, ai: Knight, player: Knight, env: Environment, rng: random.Random) -> Action:
+        start = time.perf_counter()
+        self.deadline = start + self.budget
+        self.matchup = matchup(player, ai, env)
+        self.matchup_id = self.matchups.setdefault(self.matchup, len(self.matchups))
+        p, o = knight_state(player), knight_state(ai)
+        best = candidate_actions(p, o)[0]
+        depth = 0
+        try:
+            for depth in range(1, self.max_depth + 1):
+                best = self.best_action(p, o, depth)
+        except OutOfTime:
+            depth -= 1
+        self.search_time += time.perf_counter() - start
+        self.moves += 1
+        self.depth_total += depth
+        return make_action(ActionType(best[0]), Guard(best[1]), Guard(best[2]))
+
+    def best_action(self, player: tuple, opponent: tuple, depth: int) -> tuple:
+        return max(candidate_actions(player, opponent),
+                   key=lambda a: self.action_value(player, opponent, a, depth))
+
+    def action_value(self, player: tuple, opponent: tuple, action: tuple, depth: int) -> float:
+        total = 0.0
+        for q, player_action in player_model(player, opponent):
+            for (p2, o2), prob in round_outcomes(self.matchup, player, opponent, player_action, action).items():
+                total += q * prob * (self.value(p2, o2, depth - 1) if q * prob >= MIN_PROBABILITY
+                                     else evaluate(p2, o2))
+        return total
+
+    def value(self, player: tuple, opponent: tuple, depth: int) -> float:
+        self.nodes += 1
+        if depth == 0 or player[HEALTH] <= 0 or opponent[HEALTH] <= 0:
+            return evaluate(player, opponent)
+        if time.perf_counter() > self.deadline:
+            raise OutOfTime
+
+        key = (self.matchup_id, player, opponent)
+        self.lookups += 1
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= depth:
+            self.hits += 1
+            self.table.move_to_end(key)
+            return entry[1]
+
+        v = max(self.action_value(player, opponent, a, depth) for a in candidate_actions(player, opponent))
+        self.table[key] = (depth, v)
+        self.table.move_to_end(key)
+        if len(self.table) > self.table_size:
+            self.table.popitem(last=False)
+        return v
+
+    def stats(self) -> dict:
+        return {
+            "moves": self.moves,
+            "nodes": self.nodes,
+            "nodes_per_sec": self.nodes / self.search_time if self.search_time else 0.0,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "table_entries": len(self.table),
+            "mean_depth": self.depth_total / self.moves if self.moves else 0.0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play the search AI against the stock AI")
+    parser.add_argument("--duels", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=0.02, help="seconds of search per move")
+    parser.add_argument("--max-depth", type=int, default=4)
+    parser.add_argument("--table-size", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ai = SearchAI(args.budget, args.max_depth, args.table_size)
+    wins = losses = draws = rounds = 0
+    for _ in range(args.duels):
+        state = make_default_duel()
+        rounds += simulate_duel(state, rng, opponent_ai=ai)
+        if not duel_over(state) or (state.player.health <= 0 and state.opponent.health <= 0):
+            draws += 1
+        elif state.player.health <= 0:
+            wins += 1
+        else:
+            losses += 1
+
+    s = ai.stats()
+    print(f"Search AI vs stock AI over {args.duels} duels: {wins} wins, {losses} losses, {draws} draws "
+          f"({100 * wins / args.duels:.1f}% wins, {rounds / args.duels:.1f} rounds per duel)")
+    print(f"{s['nodes']:,} nodes in {s['moves']} moves, {s['nodes_per_sec']:,.0f} nodes/s, "
+          f"mean depth {s['mean_depth']:.2f}, table hit rate {100 * s['hit_rate']:.1f}% "
+          f"({s['table_entries']:,} entries)")
+
+
+if __name__ == "__main__":
+    main()
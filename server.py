@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Duel server: hosts many independent games of Fechtmeister in one asyncio
+event loop over a plain line-based TCP protocol, so `telnet host 4000` or
+`nc host 4000` is a client. Each connection gets its own duel state, random
+generator and AI opponent; the rules are the same headless step_round() the
+terminal game uses, and every frame is the text the terminal game prints.
+With --watch-port, spectators can follow any of the duels (see broadcast.py).
+"""
+
+import argparse
+import asyncio
+import random
+import resource
+import signal
+
+from fechtmeister import (ACTION_CHOICES, ACTION_MENU, BOLD, GUARD_CHOICES, GUARD_MENU, MAGENTA, RED, RESET,
+                          TARGET_MENU, ActionType, Guard, ai_choose_action, duel_over, format_intro,
+                          format_knight_status, format_round, format_title_screen, format_victory_screen,
+                          is_offensive, make_action, make_default_duel, parse_choice, step_round)
+from replay import ReplayWriter
+
+CHOICE_PROMPT = "Your choice: "
+BEGIN_PROMPT = "Press Enter to begin..."
+PAUSE_PROMPT = BOLD + "Press Enter to continue to next round..." + RESET
+
+# Longest input line accepted; anything longer ends the session
+LINE_LIMIT = 1024
+# Bytes queued for a client before writes wait for it to catch up
+WRITE_HIGH_WATER = 64 * 1024
+
+
+class SessionClosed(Exception):
+    pass
+
+
+# One connected player and their duel
+class Session:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, rng: random.Random,
+                 idle_timeout: float, replay: ReplayWriter = None, hub=None, title: str = ""):
+        self.reader = reader
+        self.writer = writer
+        self.rng = rng
+        self.idle_timeout = idle_timeout
+        self.state = make_default_duel()
+        self.pending = []
+        self.step = replay.duel(self.state) if replay is not None else step_round
+        self.channel = hub.open(title, self.state) if hub is not None else None  # For spectators (broadcast.py)
+
+    # Queue text and, once the client has fallen WRITE_HIGH_WATER bytes behind, wait for it to
+    # catch up; a client that stops reading for longer than the idle timeout is dropped rather
+    # than buffered without bound. Most writes never wait, so they skip drain() and its timer.
+    async def send(self, text: str):
+        self.pending.append(text)
+        self.writer.write("".join(self.pending).encode())
+        self.pending.clear()
+        if self.writer.transport.get_write_buffer_size() < WRITE_HIGH_WATER:
+            return
+        try:
+            async with asyncio.timeout(self.idle_timeout):
+                await self.writer.drain()
+        except (TimeoutError, ConnectionError) as e:
+            raise SessionClosed from e
+
+    async def ask(self, prompt: str) -> str:
+        await self.send(prompt)
+        try:
+            async with asyncio.timeout(self.idle_timeout):
+                line = await self.reader.readline()
+        except TimeoutError:
+            await self.send(RED + "\nIdle for too long, closing the connection." + RESET + "\n")
+            raise SessionClosed
+        except (ValueError, ConnectionError) as e:  # Line over LINE_LIMIT, or reset by the peer
+            raise SessionClosed from e
+        if not line:
+            raise SessionClosed
+        return line.decode(errors="replace").strip()
+
+    async def choose(self, menu: str, default: int) -> int:
+        return parse_choice(await self.ask(menu + CHOICE_PROMPT), default)
+
+    async def play(self):
+        state = self.state
+        player, opponent, env = state.player, state.opponent, state.env
+        await self.ask(format_title_screen() + BEGIN_PROMPT)
+        self.pending.append(format_intro(env))
+
+        while not duel_over(state):
+            self.pending.append(BOLD + MAGENTA + f"\n========== ROUND {state.round_num} ==========" + RESET + "\n"
+                                + format_knight_status(player) + format_knight_status(opponent))
+
+            player.current_guard = GUARD_CHOICES.get(await self.choose(GUARD_MENU, 2), Guard.MIDDLE)
+            action_type = ACTION_CHOICES.get(await self.choose(ACTION_MENU, 5), ActionType.REST)
+            target_guard = Guard.NO
+            if is_offensive(action_type):
+                target_guard = GUARD_CHOICES.get(await self.choose(TARGET_MENU, 2), Guard.MIDDLE)
+            player_action = make_action(action_type, target_guard, player.current_guard)
+
+            opponent_action = ai_choose_action(opponent, player, env, self.rng)
+            result = self.step(state, player_action, opponent_action, self.rng)
+            if self.channel is not None:
+                self.channel.publish(result)
+            self.pending.append(format_round(result, player, opponent))
+            await self.ask(PAUSE_PROMPT)
+
+        await self.send(format_victory_screen(player, opponent))
+
+
+class DuelServer:
+    def __init__(self, max_sessions: int = 10_000, idle_timeout: float = 300.0, seed: int = None,
+                 replay: ReplayWriter = None, hub=None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.seed = seed
+        self.replay = replay
+        self.hub = hub
+        self.sessions = set()
+        self.started = 0
+        self.finished = 0
+
+    def make_rng(self) -> random.Random:
+        if self.seed is None:
+            return random.Random()
+        return random.Random(self.seed * 1_000_003 + self.started)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+        if len(self.sessions) >= self.max_sessions:
+            writer.write(b"The hall is full, try again later.\n")
+            writer.close()
+            return
+        session = Session(reader, writer, self.make_rng(), self.idle_timeout, self.replay, self.hub,
+                          f"Session {self.started + 1} vs AI")
+        self.started += 1
+        self.sessions.add(session)
+        try:
+            await session.play()
+            self.finished += 1
+        except SessionClosed:
+            pass
+        finally:
+            self.sessions.discard(session)
+            if self.replay is not None:
+                session.step.close()  # Abandoned duels are logged too, up to where they stopped
+            if session.channel is not None:
+                session.channel.end()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host: str, port: int, ready=None, watch_port: int = None):
+        server = await asyncio.start_server(self.handle, host, port, limit=LINE_LIMIT, backlog=4096)
+        # Both ports are bound before serving, so that a spectators' port in use fails startup
+        spectators = await self.hub.listen(host, watch_port) if watch_port is not None else None
+        if ready is not None:
+            ready(server)
+        async with server:
+            if spectators is None:
+                await server.serve_forever()
+            else:
+                async with spectators:
+                    await asyncio.gather(server.serve_forever(), spectators.serve_forever())
+
+
+# Every session holds a socket, so lift the soft file limit as far as the hard limit allows
+def raise_fd_limit() -> int:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host Fechtmeister duels over TCP (play with telnet or nc)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--max-sessions", type=int, default=10_000)
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="seconds before a silent client is dropped")
+    parser.add_argument("--seed", type=int, help="seed the AI and dice of every session, for reproducible load tests")
+    parser.add_argument("--replay", metavar="LOG", help="append every duel to a replay log (see replay.py)")
+    parser.add_argument("--watch-port", type=int, metavar="PORT",
+                        help="let spectators watch the duels on this port (see broadcast.py)")
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    replay = ReplayWriter(args.replay) if args.replay else None
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # Stop as on Ctrl-C, closing the replay log
+    hub = None
+    if args.watch_port is not None:
+        from broadcast import Hub
+        hub = Hub()
+    server = DuelServer(args.max_sessions, args.idle_timeout, args.seed, replay, hub)
+    ready = lambda s: print(f"Listening on {args.host}:{args.port}", flush=True)
+    try:
+        asyncio.run(server.serve(args.host, args.port, ready, args.watch_port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if replay is not None:
+            replay.close()
+
+
+if __name__ == "__main__":
+    main()
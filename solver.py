@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline equilibrium solver. A round is a simultaneous-move zero-sum game,
+so each match-up is solved as a discounted stochastic game by value
+iteration, with a matrix game at every state, and the mixed strategies are
+written to a compact table on disk. The "optimal" AI then answers a move
+with one table lookup instead of a search.
+
+Three facts keep the game small enough to solve (requires numpy):
+
+- Guards are symmetric. A blow lands unless it aims at the guard the
+  defender starts the round in, whatever that guard is. So in equilibrium
+  both knights pick their guard and their target uniformly at random. Only
+  the choice between the 5 action types is left, and each state becomes a
+  5x5 matrix game.
+- Health never goes up. The (player health, opponent health) slices are
+  solved in order of their total: a slice only leads into itself or into
+  slices with a lower total, and those are already solved. Each
+  anti-diagonal wave of slices runs in parallel, and only the band of
+  solved slices that later waves can still reach is kept in memory.
+- The rest is quantized. Health, stamina and fatigue live on a grid; a
+  value that falls between grid points is split between its neighbours
+  (linear interpolation). Initiative takes the few values that leg wounds
+  can leave. Maximum stamina always follows from fatigue at the start of a
+  round, so it needs no dimension of its own.
+
+    python solver.py                      # the default duel
+    python solver.py --roster rosters/example.json --pair 0 2 --workers 4
+    python solver.py --check 200          # then play the table against the stock AI
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+
+import numpy as np
+
+from outcomes import BASE_COST, DEFEND, FEINT, REST, STRIKE, THRUST, WOUND_CHANCE, blow_damage, matchup
+from rules import (WOUND_RULES, Action, ActionType, DuelState, Environment, Guard, Knight, Wound,
+                   duel_over, make_action, make_default_duel, simulate_duel)
+
+Grid = namedtuple("Grid", "health_step stamina_step fatigue_step")
+DEFAULT_GRID = Grid(10, 20, 20)
+GAMMA = 0.99  # Per-round discount: a win now is worth more than a win later, and a stalemate tends to 0
+TABLE_DIR = "tables"
+MAGIC = b"FMNASH01"
+
+ACTIONS = (STRIKE, THRUST, DEFEND, FEINT, REST)
+WOUNDS = [w.value for w in Wound]  # NONE means no wound, whether or not the blow landed
+EXTRA_DAMAGE = {w: WOUND_RULES[w].health for w in WOUNDS}
+GUARDS = (Guard.HIGH, Guard.MIDDLE, Guard.LOW)
+
+# Accuracy of the matrix games: regret-matching iterations per solve during value iteration,
+# and for the strategies that are stored; and the value change at which a slice has converged
+GAME_ITERATIONS = 50
+FINAL_GAME_ITERATIONS = 200
+EVALUATION_SWEEPS = 8
+TOLERANCE = 1e-3
+MAX_SOLVES = 200
+
+
+def levels(step: int) -> list:
+    values = list(range(0, 101, step))
+    return values if values[-1] == 100 else values + [100]
+
+
+# Split a value between the two grid points around it: [(index, weight), ...]
+def interpolate(grid: list, value: float) -> list:
+    if value <= grid[0]:
+        return [(0, 1.0)]
+    if value >= grid[-1]:
+        return [(len(grid) - 1, 1.0)]
+    hi = bisect.bisect_right(grid, value)
+    lo = hi - 1
+    w = (value - grid[lo]) / (grid[hi] - grid[lo])
+    return [(lo, 1.0 - w)] if w == 0 else [(lo, 1.0 - w), (hi, w)]
+
+
+def nearest(grid: list, value: float) -> int:
+    return min(range(len(grid)), key=lambda i: abs(grid[i] - value))
+
+
+# The starting initiative and every value wounds can lower it to, highest first
+def initiatives(base: int) -> list:
+    steps = {w.initiative for w in WOUND_RULES if w.initiative}
+    values, frontier = {base}, [base]
+    while frontier:
+        v = frontier.pop()
+        for u in (max(0, v - s) for s in steps):
+            if u not in values:
+                values.add(u)
+                frontier.append(u)
+    return sorted(values, reverse=True)
+
+
+# One knight's stamina, fatigue and initiative on the grid, flattened to an index v,
+# with the transition matrix of every (action, wound received, rough-ground roll)
+class Side:
+    def __init__(self, profile, initiative: int, grid: Grid):
+        self.profile = profile
+        self.stamina = levels(grid.stamina_step)
+        self.fatigue = levels(grid.fatigue_step)
+        self.inits = initiatives(initiative)
+        ns, nf, ni = len(self.stamina), len(self.fatigue), len(self.inits)
+        self.size = ns * nf * ni
+        s, f, i = np.meshgrid(np.array(self.stamina), np.array(self.fatigue), np.array(self.inits), indexing="ij")
+        self.stamina_of, self.fatigue_of, self.init_of = s.ravel(), f.ravel(), i.ravel()
+        self.init_score = self.init_of + profile.speed - self.fatigue_of // 10
+        self.forced = {a: self.stamina_of < self.cost(a) for a in ACTIONS}
+
+        self.T = np.zeros((len(ACTIONS), len(WOUNDS), 2, self.size, self.size))
+        for v in range(self.size):
+            for a in ACTIONS:
+                for w in WOUNDS:
+                    for tired in (0, 1):
+                        for u, weight in self.step(v, a, w, tired):
+                            self.T[a, w, tired, v, u] += weight
+
+    def cost(self, action_type: int) -> int:
+        return BASE_COST[action_type] + self.profile.weight // 5
+
+    def index(self, si: int, fi: int, ii: int) -> int:
+        return (si * len(self.fatigue) + fi) * len(self.inits) + ii
+
+    # apply_wound(), rough ground, update_stamina() and regenerate() from grid point v
+    def step(self, v: int, action_type: int, wound: int, tired: int) -> list:
+        stamina, fatigue, init = int(self.stamina_of[v]), int(self.fatigue_of[v]), int(self.init_of[v])
+        max_stamina = max(50, 100 - fatigue // 2)
+        w = WOUND_RULES[wound]
+        stamina = max(0, stamina - w.stamina)
+        max_stamina = max(50, max_stamina - w.max_stamina)
+        fatigue = min(100, fatigue + w.fatigue)
+        init = max(0, init - w.initiative)
+        if tired:
+            fatigue = min(100, fatigue + 5)
+        if action_type != REST:
+            stamina = max(0, stamina - self.cost(action_type))
+            fatigue = min(100, fatigue + 5)
+        else:
+            stamina = min(max_stamina, stamina + 20)
+            fatigue = max(0, fatigue - 10)
+        regen = max(1, 10 - self.profile.weight // 2 - fatigue // 20)
+        stamina = min(max_stamina, stamina + regen)
+
+        ii = self.inits.index(init)
+        return [(self.index(si, fi, ii), ws * wf)
+                for si, ws in interpolate(self.stamina, stamina)
+                for fi, wf in interpolate(self.fatigue, fatigue)]
+
+
+# Chance that an attack lands when the defender picks its guard at random
+def hit_chance(atk_type: int, def_type: int) -> float:
+    if atk_type == FEINT:
+        return 0.5 if def_type == DEFEND else 0.0
+    if atk_type in (STRIKE, THRUST):
+        return 1.0 if def_type == REST else 2 / 3
+    return 0.0
+
+
+# One attack: [(probability, wound, damage), ...]
+def blows(attacker, defender, atk_type: int, def_type: int) -> list:
+    p_hit = hit_chance(atk_type, def_type)
+    if p_hit == 0.0:
+        return [(1.0, Wound.NONE.value, 0)]
+    damage = blow_damage(attacker, defender, atk_type)
+    results = [(p_hit * (1 - WOUND_CHANCE), Wound.NONE.value, damage)]
+    results += [(p_hit * WOUND_CHANCE / 4, w, damage + EXTRA_DAMAGE[w]) for w in WOUNDS[1:]]
+    if p_hit < 1.0:
+        results.append((1.0 - p_hit, Wound.NONE.value, 0))
+    return results
+
+
+# Solve many zero-sum matrix games at once. A is (N, m, n) with the row player maximizing;
+# returns the row strategies, column strategies and values. Games with a saddle point are
+# exact; the rest use regret matching+ with linearly weighted averaging.
+def solve_games(A: np.ndarray, iterations: int = GAME_ITERATIONS):
+    N, m, n = A.shape
+    row_min, col_max = A.min(axis=2), A.max(axis=1)
+    lower, upper = row_min.max(axis=1), col_max.min(axis=1)
+    x, y = np.zeros((N, m)), np.zeros((N, n))
+    x[np.arange(N), row_min.argmax(axis=1)] = 1.0
+    y[np.arange(N), col_max.argmin(axis=1)] = 1.0
+    values = lower.copy()
+
+    mixed = np.nonzero(upper - lower > 1e-9)[0]
+    if len(mixed):
+        B = A[mixed]
+        k = len(mixed)
+        rx, ry = np.zeros((k, m)), np.zeros((k, n))
+        xs, ys = np.full((k, m), 1.0 / m), np.full((k, n), 1.0 / n)
+        sx, sy = np.zeros((k, m)), np.zeros((k, n))
+        for t in range(1, iterations + 1):
+            u = np.einsum("kij,kj->ki", B, ys)
+            rx = np.maximum(rx + u - (xs * u).sum(axis=1, keepdims=True), 0.0)
+            total = rx.sum(axis=1, keepdims=True)
+            xs = np.where(total > 0, rx / np.where(total > 0, total, 1.0), 1.0 / m)
+            w = np.einsum("ki,kij->kj", xs, B)
+            ry = np.maximum(ry + (ys * w).sum(axis=1, keepdims=True) - w, 0.0)
+            total = ry.sum(axis=1, keepdims=True)
+            ys = np.where(total > 0, ry / np.where(total > 0, total, 1.0), 1.0 / n)
+            sx += t * xs
+            sy += t * ys
+        sx /= sx.sum(axis=1, keepdims=True)
+        sy /= sy.sum(axis=1, keepdims=True)
+        x[mixed], y[mixed] = sx, sy
+        values[mixed] = np.einsum("ki,kij,kj->k", sx, B, sy)
+    return x, y, values
+
+
+class Model:
+    def __init__(self, player: Knight, opponent: Knight, env: Environment, grid: Grid = DEFAULT_GRID):
+        m = matchup(player, opponent, env)
+        self.grid = grid
+        self.terrain_chance = m.terrain_chance
+        self.player = Side(m.player, player.initiative, grid)
+        self.opponent = Side(m.opponent, opponent.initiative, grid)
+        self.health = levels(grid.health_step)
+        self.player_first = self.player.init_score[:, None] >= self.opponent.init_score[None, :]
+        self.band = 1 + max(self.max_drop(m.player, m.opponent), self.max_drop(m.opponent, m.player))
+
+    def max_drop(self, attacker, defender) -> int:
+        worst = max(blow_damage(attacker, defender, a) for a in (STRIKE, THRUST, FEINT)) + 10
+        return -(-worst // self.grid.health_step) + 1
+
+    # Where a knight on health grid point h ends up after losing damage. Health that falls
+    # between grid points is split between them, so a knight left with a sliver of health
+    # below the lowest point is partly dead; that keeps the expected health right.
+    def health_after(self, h: int, damage: int) -> list:
+        return interpolate(self.health, self.health[h] - damage)
+
+    # Every way a round between effective actions ap and ao can go from slice (hp, ho):
+    # [(probability, player wound, opponent wound, player health, opponent health), ...]
+    def combat(self, hp: int, ho: int, ap: int, ao: int, player_first: bool) -> list:
+        p, o = self.player.profile, self.opponent.profile
+        first, second = (blows(p, o, ap, ao), blows(o, p, ao, ap)) if player_first else \
+                        (blows(o, p, ao, ap), blows(p, o, ap, ao))
+        first_target = self.health[ho] if player_first else self.health[hp]
+        results = []
+        for q1, w1, d1 in first:
+            if first_target - d1 <= 0:
+                combos = [(q1, w1, d1, Wound.NONE.value, 0)]
+            else:
+                combos = [(q1 * q2, w1, d1, w2, d2) for q2, w2, d2 in second]
+            for q, w1, d1, w2, d2 in combos:
+                if player_first:
+                    results.append((q, w2, w1, d2, d1))
+                else:
+                    results.append((q, w1, w2, d1, d2))
+        return results
+
+    # For each pair of effective actions: the part of Q fed by already-solved slices (one per
+    # initiative order, picked per state), and the part that stays in this slice as a list of
+    # (player transition, right matrix), contributing sum(P.T[transition] @ V @ right)
+    def expand(self, hp: int, ho: int, values: dict):
+        P, O = self.player, self.opponent
+        right = {}  # values[hp2, ho2] @ O.T[ao, wo, tired].T, shared by every player action
+        const = {}
+        internal = {}
+        for ap in ACTIONS:
+            for ao in ACTIONS:
+                parts = []
+                for player_first in (True, False):
+                    scalar = 0.0
+                    groups = {}  # (hp2, ho2, wp, tired) -> {wo: probability}
+                    stay = {}    # (wp, tired) -> {wo: probability}
+                    for q, wp, wo, dp, do in self.combat(hp, ho, ap, ao, player_first):
+                        for tired, qt in ((0, 1.0 - self.terrain_chance), (1, self.terrain_chance)):
+                            if qt == 0.0:
+                                continue
+                            for hp2, a in self.health_after(hp, dp):
+                                for ho2, b in self.health_after(ho, do):
+                                    prob = q * qt * a * b
+                                    if hp2 == 0 or ho2 == 0:
+                                        scalar += prob * (0.0 if hp2 == ho2 else (1.0 if ho2 == 0 else -1.0))
+                                        continue
+                                    if (hp2, ho2) == (hp, ho):
+                                        g = stay.setdefault((wp, tired), {})
+                                    else:
+                                        g = groups.setdefault((hp2, ho2, wp, tired), {})
+                                    g[wo] = g.get(wo, 0.0) + prob
+                    # Initiative only matters when the first blow kills; otherwise reuse the other order
+                    if parts and (scalar, groups) == parts[0][1]:
+                        parts.append(parts[0])
+                        continue
+                    c = np.full((P.size, O.size), scalar)
+                    for (hp2, ho2, wp, tired), weights in groups.items():
+                        mixed = 0.0
+                        for wo, prob in weights.items():
+                            key = (hp2, ho2, ao, wo, tired)
+                            if key not in right:
+                                right[key] = values[hp2, ho2] @ O.T[ao, wo, tired].T
+                            mixed = mixed + prob * right[key]
+                        c += P.T[ap, wp, tired] @ mixed
+                    parts.append((c, (scalar, groups)))
+                const[ap, ao] = np.where(self.player_first, parts[0][0], parts[1][0])
+                # No kill stays in the slice, so both orders agree on this part
+                internal[ap, ao] = [((ap, wp, tired),
+                                     sum(prob * O.T[ao, wo, tired].T for wo, prob in weights.items()))
+                                    for (wp, tired), weights in stay.items()]
+        return const, internal
+
+    # Q for every pair of chosen actions, shape (5, 5, player size, opponent size); an action
+    # the knight cannot pay for becomes Rest, as in check_forced_rest()
+    def q_values(self, const: dict, internal: dict, V: np.ndarray) -> np.ndarray:
+        P, O = self.player, self.opponent
+        effective = {}
+        left = {}  # P.T[transition] @ V, shared by every opponent action
+        for (ap, ao), c in const.items():
+            q = c.copy()
+            for transition, right in internal[ap, ao]:
+                if transition not in left:
+                    left[transition] = P.T[transition] @ V
+                q += left[transition] @ right
+            effective[ap, ao] = GAMMA * q
+        Q = np.empty((len(ACTIONS), len(ACTIONS), P.size, O.size))
+        for ap in ACTIONS:
+            fp = P.forced[ap][:, None]
+            for ao in ACTIONS:
+                fo = O.forced[ao][None, :]
+                Q[ap, ao] = np.where(fp, np.where(fo, effective[REST, REST], effective[REST, ao]),
+                                     np.where(fo, effective[ap, REST], effective[ap, ao]))
+        return Q
+
+    # Solve one health slice given the slices it can fall into. Matrix games are solved every
+    # few sweeps, and the strategies are held fixed in between (modified policy iteration).
+    def solve_slice(self, hp: int, ho: int, values: dict, start: np.ndarray = None):
+        P, O = self.player, self.opponent
+        const, internal = self.expand(hp, ho, values)
+        V = np.zeros((P.size, O.size)) if start is None else start.copy()
+        for _ in range(MAX_SOLVES):
+            Q = self.q_values(const, internal, V)
+            games = Q.transpose(2, 3, 0, 1).reshape(-1, len(ACTIONS), len(ACTIONS))
+            x, y, v = solve_games(games)
+            V_new = v.reshape(P.size, O.size)
+            done = np.abs(V_new - V).max() < TOLERANCE
+            V = V_new
+            if done:
+                x, y, _ = solve_games(games, FINAL_GAME_ITERATIONS)
+                break
+            xs = x.reshape(P.size, O.size, -1)
+            ys = y.reshape(P.size, O.size, -1)
+            for _ in range(EVALUATION_SWEEPS):
+                Q = self.q_values(const, internal, V)
+                V = np.einsum("vui,ijvu,vuj->vu", xs, Q, ys)
+        return V, x.reshape(P.size, O.size, -1), y.reshape(P.size, O.size, -1)
+
+
+# Worker state: each process builds the model (and its transition matrices) once
+_model = None
+
+
+def _init_worker(player: Knight, opponent: Knight, env: Environment, grid: Grid):
+    global _model
+    _model = Model(player, opponent, env, grid)
+
+
+def _solve_task(task):
+    hp, ho, values, start = task
+    return (hp, ho) + _model.solve_slice(hp, ho, values, start)
+
+
+class Table:
+    def __init__(self, path: str, mode: str = "r"):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an equilibrium table")
+            size = int.from_bytes(f.read(4), "little")
+            self.header = json.loads(f.read(size))
+        offset = len(MAGIC) + 4 + size
+        shape = tuple(self.header["shape"])
+        n = int(np.prod(shape))
+        self.player = np.memmap(path, np.uint8, mode, offset, shape + (len(ACTIONS),))
+        self.opponent = np.memmap(path, np.uint8, mode, offset + n * len(ACTIONS), shape + (len(ACTIONS),))
+        self.values = np.memmap(path, np.float16, mode, offset + 2 * n * len(ACTIONS), shape)
+
+    @staticmethod
+    def create(path: str, header: dict):
+        text = json.dumps(header).encode()
+        n = int(np.prod(header["shape"]))
+        with open(path, "wb") as f:
+            f.write(MAGIC + len(text).to_bytes(4, "little") + text)
+            f.truncate(len(MAGIC) + 4 + len(text) + n * (2 * len(ACTIONS) + 2))
+        return Table(path, "r+")
+
+    # The grid cell of a duel position. Only living knights are stored, so health grid point h
+    # is at index h - 1.
+    def cell(self, player: Knight, opponent: Knight) -> tuple:
+        h = self.header
+        hp = max(1, nearest(h["health"], player.health))
+        ho = max(1, nearest(h["health"], opponent.health))
+        return hp - 1, ho - 1, locate(h["player"], player), locate(h["opponent"], opponent)
+
+    # Action-type weights for one side, out of 255
+    def strategy(self, slot: str, player: Knight, opponent: Knight) -> np.ndarray:
+        return (self.player if slot == "player" else self.opponent)[self.cell(player, opponent)]
+
+
+def locate(side: dict, knight: Knight) -> int:
+    si = nearest(side["stamina"], knight.stamina)
+    fi = nearest(side["fatigue"], knight.fatigue)
+    ii = nearest(side["inits"], knight.initiative)
+    return (si * len(side["fatigue"]) + fi) * len(side["inits"]) + ii
+
+
+def slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+# Everything the solution depends on, hashed; the readable part of the file name is only a label
+def matchup_key(player: Knight, opponent: Knight, env: Environment, grid: Grid) -> str:
+    text = repr((matchup(player, opponent, env), player.initiative, opponent.initiative, tuple(grid), GAMMA))
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def table_path(player: Knight, opponent: Knight, env: Environment, grid: Grid = DEFAULT_GRID,
+               directory: str = TABLE_DIR) -> str:
+    name = "_".join(slug(k.weapon.name + " " + k.armor.name) for k in (player, opponent))
+    key = matchup_key(player, opponent, env, grid)
+    return os.path.join(directory, f"{name}_{env.type.name.lower()}_{key}.nash")
+
+
+def solve(player: Knight, opponent: Knight, env: Environment, grid: Grid = DEFAULT_GRID,
+          directory: str = TABLE_DIR, workers: int = 1, progress=None) -> str:
+    model = Model(player, opponent, env, grid)
+    P, O = model.player, model.opponent
+    nh = len(model.health)
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(player, opponent, env, grid, directory)
+    side = lambda s: {"stamina": s.stamina, "fatigue": s.fatigue, "inits": s.inits}
+    table = Table.create(path + ".part", {
+        "version": 1, "grid": list(grid), "gamma": GAMMA, "health": model.health,
+        "player": side(P), "opponent": side(O), "shape": [nh - 1, nh - 1, P.size, O.size],
+    })
+
+    values = {}  # Solved slices that later waves can still fall into
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(player, opponent, env, grid)) \
+        if workers > 1 else None
+    try:
+        for total in range(2, 2 * (nh - 1) + 1):
+            tasks = []
+            for hp in range(max(1, total - (nh - 1)), min(nh - 1, total - 1) + 1):
+                ho = total - hp
+                needed = {(a, b): values[a, b]
+                          for a in range(max(1, hp - model.band), hp + 1)
+                          for b in range(max(1, ho - model.band), ho + 1) if (a, b) in values}
+                # Start from a neighbouring slice; positions one blow apart are worth about the same
+                start = values.get((hp - 1, ho), values.get((hp, ho - 1)))
+                tasks.append((hp, ho, needed, start))
+            if executor:
+                results = executor.map(_solve_task, tasks)
+            else:
+                results = ((hp, ho) + model.solve_slice(hp, ho, needed, start) for hp, ho, needed, start in tasks)
+            for hp, ho, V, x, y in results:
+                values[hp, ho] = V
+                table.values[hp - 1, ho - 1] = V
+                table.player[hp - 1, ho - 1] = np.round(x * 255)
+                table.opponent[hp - 1, ho - 1] = np.round(y * 255)
+            for key in [k for k in values if sum(k) < total + 1 - 2 * model.band]:
+                del values[key]
+            if progress:
+                progress(total - 1, 2 * (nh - 1) - 1)
+    finally:
+        if executor:
+            executor.shutdown()
+    for out in (table.player, table.opponent, table.values):
+        out.flush()
+    del table
+    os.replace(path + ".part", path)
+    return path
+
+
+# Plays the equilibrium: the action type from the table, guard and target uniformly at random
+class OptimalAI:
+    def __init__(self, slot: str = "opponent", grid: Grid = DEFAULT_GRID, directory: str = TABLE_DIR):
+        self.slot = slot
+        self.grid = grid
+        self.directory = directory
+        self.tables = {}
+        self.current = None  # (ai, other, table) of the duel in progress
+
+    def table(self, player: Knight, opponent: Knight, env: Environment) -> Table:
+        path = table_path(player, opponent, env, self.grid, self.directory)
+        if path not in self.tables:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No equilibrium table for this match-up ({path}); run solver.py first")
+            self.tables[path] = Table(path)
+        return self.tables[path]
+
+    # Same signature as ai_choose_action()
+    def __call__(self, ai: Knight, other: Knight, env: Environment, rng: random.Random) -> Action:
+        player, opponent = (ai, other) if self.slot == "player" else (other, ai)
+        # Tables are keyed by starting initiative, which leg wounds lower, so a duel keeps
+        # the table it started with
+        if self.current is None or self.current[0] is not ai or self.current[1] is not other:
+            self.current = (ai, other, self.table(player, opponent, env))
+        weights = self.current[2].strategy(self.slot, player, opponent).tolist()
+        action_type = rng.choices(ACTIONS, weights=weights)[0] if any(weights) else REST
+        target = rng.choice(GUARDS) if action_type in (STRIKE, THRUST, FEINT) else Guard.NO
+        return make_action(ActionType(action_type), target, rng.choice(GUARDS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve a match-up for equilibrium strategies")
+    parser.add_argument("--roster", help="JSON roster (see rosters/example.json); default: the standard duel")
+    parser.add_argument("--pair", type=int, nargs=2, default=(0, 1), metavar=("PLAYER", "OPPONENT"))
+    parser.add_argument("--health-step", type=int, default=DEFAULT_GRID.health_step)
+    parser.add_argument("--stamina-step", type=int, default=DEFAULT_GRID.stamina_step)
+    parser.add_argument("--fatigue-step", type=int, default=DEFAULT_GRID.fatigue_step)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default=TABLE_DIR)
+    parser.add_argument("--check", type=int, default=0, help="then play this many duels against the stock AI")
+    args = parser.parse_args()
+
+    if args.roster:
+        from content import ContentError
+        from tournament import load_roster
+        try:
+            knights, env = load_roster(args.roster)
+        except ContentError as e:
+            sys.exit(str(e))
+        player, opponent = knights[args.pair[0]], knights[args.pair[1]]
+    else:
+        state = make_default_duel()
+        player, opponent, env = state.player, state.opponent, state.env
+    grid = Grid(args.health_step, args.stamina_step, args.fatigue_step)
+
+    start = time.perf_counter()
+    progress = lambda done, total: print(f"\rwave {done}/{total}", end="", flush=True)
+    path = solve(player, opponent, env, grid, args.out, args.workers, progress)
+    print(f"\nSolved {player.name} vs {opponent.name} in {time.perf_counter() - start:.1f}s: "
+          f"{path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    table = Table(path)
+    print(f"Value at the start (player's view, -1..1): {float(table.values[table.cell(player, opponent)]):+.3f}")
+
+    if args.check:
+        rng = random.Random(0)
+        ai = OptimalAI("opponent", grid, args.out)
+        wins = losses = 0
+        for _ in range(args.check):
+            state = DuelState(replace(player, wounds=0), replace(opponent, wounds=0), env)
+            simulate_duel(state, rng, opponent_ai=ai)
+            if duel_over(state) and state.player.health <= 0 < state.opponent.health:
+                wins += 1
+            elif duel_over(state) and state.opponent.health <= 0 < state.player.health:
+                losses += 1
+        print(f"Optimal AI vs stock AI over {args.check} duels: {wins} wins, {losses} losses, "
+              f"{args.check - wins - losses} draws")
+
+
+if __name__ == "__main__":
+    main()
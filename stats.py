@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming statistics for long sweeps. Everything here takes constant memory
+however many duels go through it, and merges cheaply, so each worker keeps
+its own SweepStats and the parent folds them together as chunks finish:
+Welford mean and variance of duel length, Wilson intervals on win rates,
+attack and hit counts per action, wound and stamina counts, and a
+reservoir of whole duels, kept as the random state they started from so
+any of them can be played again exactly. tournament.py uses these for its
+live summary and for stopping a match once its win rate is pinned down.
+"""
+
+import math
+import random
+import sys
+import time
+
+from rules import STARVED_STAMINA, ActionType, EventType, Wound, step_round
+
+IMPACT, DEFENDED, WOUND, FORCED_REST = EventType.IMPACT, EventType.DEFENDED, EventType.WOUND, EventType.FORCED_REST
+
+# Two-sided 95%
+Z_95 = 1.959964
+
+
+# Running mean and variance (Welford), mergeable with Chan's parallel update
+class Welford:
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other: "Welford"):
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def stderr(self) -> float:
+        return math.sqrt(self.variance / self.n) if self.n else float("inf")
+
+
+def wilson_interval(successes: float, n: int, z: float = Z_95) -> tuple:
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+# Uniform sample of up to k items from a stream (Algorithm R). offer() decides before the item
+# exists, so a caller only builds the items it keeps.
+class Reservoir:
+    def __init__(self, k: int, rng: random.Random):
+        self.k = k
+        self.rng = rng
+        self.seen = 0
+        self.items = []
+
+    # The slot the next item of the stream would take, or None if it is not kept
+    def offer(self):
+        self.seen += 1
+        if not self.k:
+            return None
+        if len(self.items) < self.k:
+            self.items.append(None)
+            return len(self.items) - 1
+        j = self.rng.randrange(self.seen)
+        return j if j < self.k else None
+
+    # Combine two samples into a uniform sample of both streams: each pick comes from a side with
+    # probability proportional to how many of its items are still unpicked
+    def merge(self, other: "Reservoir"):
+        mine, theirs = self.items[:], other.items[:]
+        self.rng.shuffle(mine)
+        self.rng.shuffle(theirs)
+        n1, n2 = self.seen, other.seen
+        merged = []
+        while len(merged) < self.k and n1 + n2 > 0:
+            if self.rng.randrange(n1 + n2) < n1:
+                merged.append(mine.pop())
+                n1 -= 1
+            else:
+                merged.append(theirs.pop())
+                n2 -= 1
+        self.items = merged
+        self.seen += other.seen
+
+
+class MatchupStats:
+    __slots__ = ("a_wins", "b_wins", "draws", "length")
+
+    def __init__(self):
+        self.a_wins = self.b_wins = self.draws = 0
+        self.length = Welford()
+
+    @property
+    def duels(self) -> int:
+        return self.a_wins + self.b_wins + self.draws
+
+    def win_interval(self, z: float = Z_95) -> tuple:
+        return wilson_interval(self.a_wins, self.duels, z)
+
+    def merge(self, other: "MatchupStats"):
+        self.a_wins += other.a_wins
+        self.b_wins += other.b_wins
+        self.draws += other.draws
+        self.length.merge(other.length)
+
+
+# Everything a sweep tracks, per match-up (a, b) of roster indices and over all rounds
+class SweepStats:
+    def __init__(self, samples: int = 0, seed: int = 0):
+        self.matchups = {}
+        self.attacks = [0] * len(ActionType)
+        self.hits = [0] * len(ActionType)
+        self.wounds = [0] * len(Wound)
+        self.rounds = 0
+        self.forced_rests = 0
+        self.starved = 0  # Knight-rounds ending below STARVED_STAMINA
+        self.reservoir = Reservoir(samples, random.Random(seed))
+
+    def matchup(self, a: int, b: int) -> MatchupStats:
+        m = self.matchups.get((a, b))
+        if m is None:
+            m = self.matchups[(a, b)] = MatchupStats()
+        return m
+
+    def add_duel(self, a: int, b: int, a_dead: bool, b_dead: bool, rounds: int):
+        m = self.matchup(a, b)
+        if a_dead == b_dead:
+            m.draws += 1
+        elif b_dead:
+            m.a_wins += 1
+        else:
+            m.b_wins += 1
+        m.length.add(rounds)
+
+    def merge(self, other: "SweepStats"):
+        for key, m in other.matchups.items():
+            self.matchup(*key).merge(m)
+        for mine, theirs in ((self.attacks, other.attacks), (self.hits, other.hits), (self.wounds, other.wounds)):
+            for i, v in enumerate(theirs):
+                mine[i] += v
+        self.rounds += other.rounds
+        self.forced_rests += other.forced_rests
+        self.starved += other.starved
+        self.reservoir.merge(other.reservoir)
+
+
+# Has step_round()'s signature, so simulate_duel() can play through it; counts each round into stats
+class StatsCollector:
+    def __init__(self, stats: SweepStats):
+        self.stats = stats
+
+    def __call__(self, state, player_action, opponent_action, rng: random.Random):
+        result = step_round(state, player_action, opponent_action, rng)
+        s = self.stats
+        for e in result.events:
+            t = e.type
+            if t is IMPACT:
+                i = e.action.type.value
+                s.attacks[i] += 1
+                s.hits[i] += 1
+            elif t is DEFENDED:
+                s.attacks[e.action.type.value] += 1
+            elif t is WOUND:
+                s.wounds[e.wound.value] += 1
+            elif t is FORCED_REST:
+                s.forced_rests += 1
+        s.rounds += 1
+        s.starved += (state.player.stamina < STARVED_STAMINA) + (state.opponent.stamina < STARVED_STAMINA)
+        return result
+
+
+def format_summary(stats: SweepStats, names: list, ci_width: float = None) -> str:
+    out = [f"{'Match-up':<48} {'Duels':>8} {'Win % (a)':>9} {'95% CI':>15} {'Length':>14}"]
+    for (a, b), m in stats.matchups.items():
+        lo, hi = m.win_interval()
+        done = " *" if ci_width is not None and (hi - lo) / 2 <= ci_width else ""
+        out.append(f"{names[a] + ' vs ' + names[b]:<48} {m.duels:>8,} {100 * m.a_wins / m.duels:>8.2f}% "
+                   f"{100 * lo:>6.2f}-{100 * hi:>6.2f}% {m.length.mean:>7.1f} ±{1.96 * m.length.stderr:>5.1f}{done}")
+    rates = ", ".join(f"{t.name.lower()} {100 * stats.hits[t.value] / stats.attacks[t.value]:.1f}%"
+                      for t in ActionType if stats.attacks[t.value])
+    out.append(f"\n{stats.rounds:,} rounds. Hit rates: {rates or 'none yet'}")
+    landed = sum(stats.hits)
+    if landed:
+        out.append(f"Wounds per landed blow {sum(stats.wounds) / landed:.4f}; "
+                   f"stamina-starved {100 * stats.starved / (2 * stats.rounds):.2f}% of knight-rounds, "
+                   f"{stats.forced_rests:,} forced rests")
+    if ci_width is not None:
+        out.append(f"* win rate known to ±{100 * ci_width:g}%")
+    return "\n".join(out) + "\n"
+
+
+# A summary redrawn in place at most every interval seconds (appended instead when not on a terminal)
+class Dashboard:
+    def __init__(self, interval: float = 1.0, stream=sys.stdout):
+        self.interval = interval
+        self.stream = stream
+        self.tty = stream.isatty()
+        self.last = 0.0
+
+    # render is only called when a refresh is due
+    def update(self, render, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self.last < self.interval:
+            return
+        self.last = now
+        self.stream.write(("\033[H\033[2J" if self.tty else "\n") + render())
+        self.stream.flush()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tournament runner: round-robin or Swiss brackets over a roster of knight
+loadouts, with the duels spread across a process pool. Every chunk of duels
+gets its own random.Random seeded from (seed, match, chunk), so a run
+reproduces bit-for-bit whatever the number of workers.
+
+With --live the workers also keep streaming statistics (see stats.py) and
+a summary is redrawn as chunks come in; --ci-width stops each match as soon
+as its win rate is known well enough, and --samples keeps a uniform sample
+of whole duels and writes them to a replay log.
+"""
+
+import argparse
+import dataclasses
+import hashlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import content
+from content import MAX_INITIATIVE, ContentError, armor_from_dict, enum_of, value_of, weapon_from_dict
+from rules import DuelState, Environment, Guard, Knight, Terrain, simulate_duel, step_round
+from stats import Dashboard, StatsCollector, SweepStats, format_summary, wilson_interval
+
+# Duels per work unit. Fixed, so the seed of every duel is independent of the worker count.
+CHUNK_DUELS = 2_000
+
+
+def derive_seed(seed: int, *keys) -> int:
+    digest = hashlib.blake2b(repr((seed,) + keys).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+# An inline roster knight, checked as a content pack loadout is
+def knight_from_dict(d: dict) -> Knight:
+    name = value_of(d, "name", str, "roster knight")
+    return Knight(name=name, weapon=weapon_from_dict(value_of(d, "weapon", dict, name), f"{name}: weapon"),
+                  armor=armor_from_dict(value_of(d, "armor", dict, name), f"{name}: armor"),
+                  current_guard=enum_of(d, "guard", Guard, name, "middle"),
+                  initiative=value_of(d, "initiative", int, name, 10, lo=0, hi=MAX_INITIATIVE))
+
+
+# A roster lists knights inline or by loadout id from the content packs ("all" for every declared
+# loadout, "pairs" for every weapon+armor pair), and an environment inline or by terrain id
+def load_roster(path: str):
+    with open(path) as f:
+        data = json.load(f)
+    registry = None
+    if isinstance(data.get("environment"), str) or not all(isinstance(k, dict) for k in data["knights"]):
+        registry = content.load()
+
+    env_data = data.get("environment", {})
+    if isinstance(env_data, str):
+        env = registry.environment(env_data)
+    else:
+        terrain = enum_of(env_data, "terrain", Terrain, "environment", "open")
+        env = Environment(type=terrain,
+                          obstacle_density=value_of(env_data, "obstacle_density", int, "environment", 0, lo=0, hi=10))
+    knights = data["knights"]
+    if knights == "all":
+        knights = list(registry.loadouts)
+    elif knights == "pairs":
+        knights = registry.pairs()
+    return [registry.knight(k) if isinstance(k, str) else knight_from_dict(k) for k in knights], env
+
+
+@dataclass
+class MatchResult:
+    a: int
+    b: int
+    a_wins: int = 0
+    b_wins: int = 0
+    draws: int = 0
+    rounds: int = 0
+
+    @property
+    def duels(self) -> int:
+        return self.a_wins + self.b_wins + self.draws
+
+    # Match points for (a, b): the side that won more duels takes the match
+    def points(self):
+        if self.a_wins == self.b_wins:
+            return 0.5, 0.5
+        return (1.0, 0.0) if self.a_wins > self.b_wins else (0.0, 1.0)
+
+    def win_interval(self) -> tuple:
+        return wilson_interval(self.a_wins, self.duels)
+
+
+# Worker entry point: play one chunk of duels between two loadouts. collect is None, or
+# (a's roster index, b's roster index, sample size) to also return the chunk's SweepStats.
+def play_chunk(task):
+    a, b, env, duels, seed, max_rounds, collect = task
+    rng = random.Random(seed)
+    stats, step = None, step_round
+    if collect:
+        ia, ib, samples = collect
+        stats = SweepStats(samples, derive_seed(seed, "samples"))
+        step = StatsCollector(stats)
+    a_wins = b_wins = draws = rounds = 0
+    for i in range(duels):
+        # Alternate sides so neither entrant always holds the player slot, which wins initiative ties
+        first, second = (a, b) if i % 2 == 0 else (b, a)
+        state = DuelState(dataclasses.replace(first, wounds=0), dataclasses.replace(second, wounds=0), env)
+        if stats is not None:
+            slot = stats.reservoir.offer()
+            if slot is not None:
+                stats.reservoir.items[slot] = (ia, ib, i % 2 == 0, rng.getstate())
+        n = simulate_duel(state, rng, max_rounds, step=step)
+        rounds += n
+        a_dead = (state.player if i % 2 == 0 else state.opponent).health <= 0
+        b_dead = (state.opponent if i % 2 == 0 else state.player).health <= 0
+        if a_dead == b_dead:
+            draws += 1
+        elif b_dead:
+            a_wins += 1
+        else:
+            b_wins += 1
+        if stats is not None:
+            stats.add_duel(ia, ib, a_dead, b_dead, n)
+    return a_wins, b_wins, draws, rounds, stats
+
+
+class Tournament:
+    def __init__(self, roster: list, env: Environment, duels: int, seed: int, max_rounds: int = 500,
+                 ci_width: float = None, stats: SweepStats = None):
+        self.roster = roster
+        self.env = env
+        self.duels = duels  # Per match; the most a match plays when ci_width is set
+        self.seed = seed
+        self.max_rounds = max_rounds
+        self.ci_width = ci_width  # Half-width of a's 95% win interval at which a match stops
+        self.stats = stats  # Collect streaming statistics into this, if given
+        self.dashboard = None
+        self.window = 16  # Chunks in flight at once
+        self.matches = []
+        self.points = [0.0] * len(roster)
+
+    # Chunk results in submission order, keeping at most self.window chunks in flight.
+    # Chunks of pairs in stopped are not submitted.
+    def play_chunks(self, jobs: list, executor, stopped: set):
+        if executor is None:
+            for pair, task in jobs:
+                if pair not in stopped:
+                    yield pair, play_chunk(task)
+            return
+        pending = deque()
+        for pair, task in jobs:
+            if pair in stopped:
+                continue
+            pending.append((pair, executor.submit(play_chunk, task)))
+            if len(pending) >= self.window:
+                pair, future = pending.popleft()
+                yield pair, future.result()
+        for pair, future in pending:
+            yield pair, future.result()
+
+    # Play a batch of pairings. Results are taken in submission order, so the totals (and
+    # where each match stops) do not depend on which worker finished first.
+    def play(self, pairings: list, executor) -> list:
+        # Chunk by chunk across the matches, so they all advance together
+        jobs = []
+        for chunk, start in enumerate(range(0, self.duels, CHUNK_DUELS)):
+            n = min(CHUNK_DUELS, self.duels - start)
+            for match_id, (a, b) in enumerate(pairings, start=len(self.matches)):
+                seed = derive_seed(self.seed, a, b, match_id, chunk)
+                collect = (a, b, self.stats.reservoir.k) if self.stats is not None else None
+                jobs.append(((a, b), (self.roster[a], self.roster[b], self.env, n, seed, self.max_rounds,
+                                      collect)))
+
+        results = {pair: MatchResult(*pair) for pair in pairings}
+        stopped = set()
+        for pair, (a_wins, b_wins, draws, rounds, stats) in self.play_chunks(jobs, executor, stopped):
+            if pair in stopped:
+                continue  # Was already in flight when its match stopped
+            r = results[pair]
+            r.a_wins += a_wins
+            r.b_wins += b_wins
+            r.draws += draws
+            r.rounds += rounds
+            if stats is not None:
+                self.stats.merge(stats)
+            if self.ci_width is not None:
+                lo, hi = r.win_interval()
+                if (hi - lo) / 2 <= self.ci_width:
+                    stopped.add(pair)
+            if self.dashboard is not None:
+                self.dashboard.update(self.summary)
+
+        played = [results[pair] for pair in pairings]
+        for r in played:
+            pa, pb = r.points()
+            self.points[r.a] += pa
+            self.points[r.b] += pb
+        self.matches.extend(played)
+        return played
+
+    def round_robin(self, executor):
+        self.play(list(itertools.combinations(range(len(self.roster)), 2)), executor)
+
+    def swiss(self, rounds: int, executor):
+        met = set()
+        for _ in range(rounds):
+            order = sorted(range(len(self.roster)), key=lambda i: (-self.points[i], i))
+            pairings = []
+            while len(order) > 1:
+                a = order.pop(0)
+                b = next((b for b in order if (min(a, b), max(a, b)) not in met), order[0])
+                order.remove(b)
+                pairings.append((min(a, b), max(a, b)))
+                met.add(pairings[-1])
+            if order:
+                self.points[order[0]] += 1.0  # Bye
+            self.play(pairings, executor)
+
+    def standings(self) -> list:
+        rows = []
+        for i, knight in enumerate(self.roster):
+            wins = losses = draws = 0
+            for m in self.matches:
+                if m.a == i:
+                    wins, losses = wins + m.a_wins, losses + m.b_wins
+                elif m.b == i:
+                    wins, losses = wins + m.b_wins, losses + m.a_wins
+                else:
+                    continue
+                draws += m.draws
+            total = wins + losses + draws
+            rows.append({"name": knight.name, "points": self.points[i], "wins": wins, "losses": losses,
+                         "draws": draws, "win_rate": wins / total if total else 0.0})
+        return sorted(rows, key=lambda r: (-r["points"], -r["win_rate"]))
+
+    def summary(self) -> str:
+        return format_summary(self.stats, [k.name for k in self.roster], self.ci_width)
+
+    # Play the duels the reservoir kept again, from the random state each started with, into a replay log
+    def save_samples(self, path: str) -> int:
+        from replay import ReplayWriter  # replay.py imports this module
+
+        with ReplayWriter(path) as writer:
+            for a, b, a_first, rng_state in self.stats.reservoir.items:
+                first, second = (self.roster[a], self.roster[b]) if a_first else (self.roster[b], self.roster[a])
+                state = DuelState(dataclasses.replace(first, wounds=0), dataclasses.replace(second, wounds=0),
+                                  self.env)
+                rng = random.Random()
+                rng.setstate(rng_state)
+                recorder = writer.duel(state)
+                simulate_duel(state, rng, self.max_rounds, step=recorder)
+                recorder.close()
+        return writer.duels
+
+
+def run(tournament: Tournament, args, executor):
+    if args.format == "swiss":
+        tournament.swiss(args.swiss_rounds, executor)
+    else:
+        tournament.round_robin(executor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a Fechtmeister tournament between knight loadouts")
+    parser.add_argument("roster", help="JSON roster of knights and the environment (see rosters/example.json)")
+    parser.add_argument("--format", choices=("round-robin", "swiss"), default="round-robin")
+    parser.add_argument("--swiss-rounds", type=int, default=3)
+    parser.add_argument("--duels", type=int, default=10_000, help="duels per match (the most, with --ci-width)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="1 runs in-process")
+    parser.add_argument("--max-rounds", type=int, default=500)
+    parser.add_argument("--json", help="write standings and match results to this file")
+    parser.add_argument("--live", type=float, metavar="SECONDS",
+                        help="collect round statistics and redraw a summary at most this often")
+    parser.add_argument("--ci-width", type=float, metavar="W",
+                        help="stop a match once the 95%% interval on its win rate is within ±W (e.g. 0.01)")
+    parser.add_argument("--samples", metavar="LOG", help="write a uniform sample of duels to this replay log")
+    parser.add_argument("--sample-size", type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        roster, env = load_roster(args.roster)
+    except ContentError as e:
+        sys.exit(str(e))
+    stats = None
+    if args.live is not None or args.samples:
+        stats = SweepStats(args.sample_size if args.samples else 0, derive_seed(args.seed, "samples"))
+    tournament = Tournament(roster, env, args.duels, args.seed, args.max_rounds, args.ci_width, stats)
+    tournament.window = 2 * max(args.workers, 1)
+    if args.live is not None:
+        tournament.dashboard = Dashboard(args.live)
+    start = time.perf_counter()
+    if args.workers > 1:
+        with ProcessPoolExecutor(args.workers) as executor:
+            run(tournament, args, executor)
+    else:
+        run(tournament, args, None)
+    elapsed = time.perf_counter() - start
+    if tournament.dashboard is not None:
+        tournament.dashboard.update(tournament.summary, force=True)
+        print()
+
+    duels = sum(m.duels for m in tournament.matches)
+    print(f"{'Knight':<24} {'Pts':>5} {'Wins':>9} {'Losses':>9} {'Draws':>7} {'Win %':>7}")
+    for row in tournament.standings():
+        print(f"{row['name']:<24} {row['points']:>5.1f} {row['wins']:>9} {row['losses']:>9} "
+              f"{row['draws']:>7} {100 * row['win_rate']:>6.2f}%")
+    print(f"\n{duels} duels in {elapsed:.1f}s ({duels / elapsed:,.0f} duels/s, {args.workers} workers)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"seed": args.seed, "standings": tournament.standings(),
+                       "matches": [dataclasses.asdict(m) for m in tournament.matches]}, f, indent=2)
+    if args.samples:
+        print(f"{tournament.save_samples(args.samples)} sampled duels written to {args.samples}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Balance tuner: searches weapon and armor stats for a set of loadouts so
+that every pairing's win rate falls in a target band (45-55% by default),
+and writes the best configurations out as content packs.
+
+A configuration is a vector of stats (weapon damage, speed and weight,
+armor defense, weight and coverage) for the gear of the loadouts. All the
+pairings of one configuration are played as a single batch.py run, each
+pairing from both sides so neither entrant always wins initiative ties.
+A pairing starts with --min-duels and is doubled up to --max-duels only
+while the 95% interval on its win rate still straddles an edge of the
+band, so clearly lopsided and clearly balanced pairings stay cheap. Draws
+count half to each side. Every stage of every configuration is seeded
+from (seed, stage), so all configurations meet the same dice and a run
+reproduces whatever the number of workers.
+
+The search is a simple evolutionary one: each generation mutates one or
+two stats of configurations on the current Pareto front, evaluates the
+new ones across a process pool, and keeps every result in a cache (also
+on disk with --cache) so no stat vector is played twice. Configurations
+are ranked on two objectives: imbalance, the summed distance of the win
+rates outside the band, and change, the number of stat steps away from
+the packs as they stand. The front is printed at the end, and each
+configuration on it is written to --out as a JSON pack whose ids carry a
+suffix, so it loads next to content/base.toml:
+
+    python tuner.py --loadouts longsword_plate,zweihander_plate,poleaxe_harness --generations 10
+    python tuner.py --arena rough --band 0.4 0.6 --tune weapon.damage,armor.coverage --cache tune.json
+    cp tuned/tuned1.json content/ && python batch.py --player longsword_plate_tuned1 --opponent poleaxe_harness_tuned1
+"""
+
+import argparse
+import dataclasses
+import hashlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import content
+from batch import BatchDuel
+from content import ContentError
+from rules import DamageType, Knight
+from stats import wilson_interval
+from tournament import derive_seed
+
+# Tunable fields: (section, field) -> (lowest, highest, step)
+BOUNDS = {
+    ("weapon", "damage"): (1, 30, 1),
+    ("weapon", "speed"): (0, 8, 1),
+    ("weapon", "weight"): (0, 15, 1),
+    ("armor", "defense"): (0, 15, 1),
+    ("armor", "weight"): (0, 20, 1),
+    ("armor", "coverage"): (0, 100, 5),
+}
+FIELDS = tuple(f"{section}.{name}" for section, name in BOUNDS)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Stat:
+    section: str  # "weapon" or "armor"
+    item: str     # Weapon or armor id
+    field: str
+    index: int    # DamageType value for armor defense, else 0
+    lo: int
+    hi: int
+    step: int
+
+    def label(self) -> str:
+        name = f"defense.{DamageType(self.index).name.lower()}" if self.field == "defense" else self.field
+        return f"{self.item}.{name}"
+
+
+# Stats of the gear that the loadouts use, and their values in the packs
+def stats_for(weapon_ids: dict, armor_ids: dict, fields: list) -> tuple:
+    stats, base = [], []
+    for section, ids in (("weapon", weapon_ids), ("armor", armor_ids)):
+        for item_id, gear in ids.items():
+            for name in (f.partition(".")[2] for f in fields if f.startswith(section + ".")):
+                lo, hi, step = BOUNDS[section, name]
+                for index in (range(len(DamageType)) if name == "defense" else (0,)):
+                    value = gear.defense[index] if name == "defense" else getattr(gear, name)
+                    stats.append(Stat(section, item_id, name, index, min(lo, value), max(hi, value), step))
+                    base.append(value)
+    return stats, tuple(base)
+
+
+# Weapons and armor by id with a stat vector applied
+def apply(vector: tuple, stats: list, weapon_ids: dict, armor_ids: dict) -> tuple:
+    changes = {}
+    for stat, value in zip(stats, vector):
+        changes.setdefault((stat.section, stat.item), []).append((stat, value))
+    weapons, armor = dict(weapon_ids), dict(armor_ids)
+    for (section, item_id), values in changes.items():
+        if section == "weapon":
+            weapons[item_id] = dataclasses.replace(weapons[item_id], **{s.field: v for s, v in values})
+        else:
+            gear = armor[item_id]
+            defense = list(gear.defense)
+            fields = {}
+            for s, v in values:
+                if s.field == "defense":
+                    defense[s.index] = v
+                else:
+                    fields[s.field] = v
+            armor[item_id] = dataclasses.replace(gear, defense=tuple(defense), **fields)
+    return weapons, armor
+
+
+# Worker entry point: play every pairing of one configuration; returns (a wins, b wins, draws) per pairing
+def evaluate(task):
+    knights, pairs, env, band, min_duels, max_duels, seed, max_rounds = task
+    counts = np.zeros((len(pairs), 3), dtype=np.int64)
+    playing, stage = list(range(len(pairs))), 0
+    while playing:
+        played = int(counts[playing[0]].sum())
+        half = max(1, min(played or min_duels, max_duels - played) // 2)
+        players, opponents = [], []
+        for p in playing:
+            a, b = knights[pairs[p][0]], knights[pairs[p][1]]
+            players += [a] * half + [b] * half
+            opponents += [b] * half + [a] * half
+        batch = BatchDuel(players, opponents, env, len(players), seed=derive_seed(seed, "stage", stage),
+                          max_rounds=max_rounds).run()
+        p_dead = batch.final_player_health <= 0
+        o_dead = batch.final_opponent_health <= 0
+        # Rows alternate per pairing between a as player and b as player
+        a_is_player = np.tile(np.repeat([True, False], half), len(playing))
+        a_won = np.where(a_is_player, o_dead & ~p_dead, p_dead & ~o_dead)
+        b_won = np.where(a_is_player, p_dead & ~o_dead, o_dead & ~p_dead)
+        for column, outcome in enumerate((a_won, b_won, p_dead == o_dead)):
+            counts[playing, column] += outcome.reshape(len(playing), 2 * half).sum(axis=1)
+
+        still = []
+        for p in playing:
+            n = int(counts[p].sum())
+            lo, hi = wilson_interval(counts[p, 0] + counts[p, 2] / 2, n)
+            if n < max_duels and any(lo < edge < hi for edge in band):
+                still.append(p)
+        playing, stage = still, stage + 1
+    return counts.tolist()
+
+
+class Tuner:
+    def __init__(self, registry, loadout_ids: list, env, fields: list, band: tuple, min_duels: int,
+                 max_duels: int, seed: int, max_rounds: int = 500):
+        self.loadouts = [registry.loadout(i) for i in loadout_ids]
+        if len(self.loadouts) < 2:
+            raise ContentError("give at least two loadouts")
+        self.gear = [gear_ids(registry, loadout) for loadout in self.loadouts]  # (weapon id, armor id) each
+        self.weapon_ids = {w: registry.weapons[w] for w, _ in self.gear}
+        self.armor_ids = {a: registry.armor[a] for _, a in self.gear}
+        self.stats, self.base = stats_for(self.weapon_ids, self.armor_ids, fields)
+        if not self.stats:
+            raise ContentError("nothing to tune")
+        self.pairs = list(itertools.combinations(range(len(self.loadouts)), 2))
+        self.env = env
+        self.band = band
+        self.min_duels, self.max_duels = min_duels, max_duels
+        self.seed, self.max_rounds = seed, max_rounds
+        self.cache = {}  # Stat vector -> counts per pairing
+        self.duels = 0
+        self.rng = random.Random(derive_seed(seed, "search"))
+
+    # What the cached results depend on besides the vector
+    def settings(self) -> dict:
+        gear = repr((sorted(self.weapon_ids.items()), sorted(self.armor_ids.items()),
+                     [(l.id, l.guard, l.initiative) for l in self.loadouts], self.env))
+        return {"stats": [s.label() for s in self.stats], "band": list(self.band), "min_duels": self.min_duels,
+                "max_duels": self.max_duels, "seed": self.seed, "max_rounds": self.max_rounds,
+                "gear": hashlib.blake2b(gear.encode(), digest_size=8).hexdigest()}
+
+    def load_cache(self, path: str):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            raise ContentError(f"{path}: {e}") from None
+        if data.get("settings") == self.settings():
+            self.cache.update((tuple(map(int, k.split(","))), v) for k, v in data["results"].items())
+
+    def save_cache(self, path: str):
+        with open(path + ".tmp", "w") as f:
+            json.dump({"settings": self.settings(),
+                       "results": {",".join(map(str, k)): v for k, v in self.cache.items()}}, f)
+        os.replace(path + ".tmp", path)
+
+    def knights(self, vector: tuple) -> list:
+        weapons, armor = apply(vector, self.stats, self.weapon_ids, self.armor_ids)
+        return [Knight(name=l.name, weapon=weapons[w], armor=armor[a], current_guard=l.guard, initiative=l.initiative)
+                for l, (w, a) in zip(self.loadouts, self.gear)]
+
+    # Evaluate the vectors not in the cache yet; map is Executor.map or the builtin
+    def evaluate(self, vectors: list, map=map):
+        new = [v for v in dict.fromkeys(vectors) if v not in self.cache]
+        tasks = [(self.knights(v), self.pairs, self.env, self.band, self.min_duels, self.max_duels, self.seed,
+                  self.max_rounds) for v in new]
+        for vector, counts in zip(new, map(evaluate, tasks)):
+            self.cache[vector] = counts
+            self.duels += sum(a + b + d for a, b, d in counts)
+        return len(new)
+
+    def win_rates(self, vector: tuple) -> list:
+        return [(a + d / 2) / (a + b + d) for a, b, d in self.cache[vector]]
+
+    # (imbalance, change) for a vector: lower is better on both
+    def objectives(self, vector: tuple) -> tuple:
+        lo, hi = self.band
+        imbalance = sum(max(lo - r, r - hi, 0.0) for r in self.win_rates(vector))
+        change = sum(abs(v - b) // s.step for v, b, s in zip(vector, self.base, self.stats))
+        return round(imbalance, 6), change
+
+    # The evaluated vectors no other one beats on both objectives, least change first
+    def front(self) -> list:
+        ranked = sorted(self.cache, key=lambda v: (self.objectives(v)[1], self.objectives(v)[0], v))
+        front, best = [], None
+        for vector in ranked:
+            imbalance = self.objectives(vector)[0]
+            if best is None or imbalance < best:
+                front.append(vector)
+                best = imbalance
+        return front
+
+    def mutate(self, vector: tuple) -> tuple:
+        vector = list(vector)
+        for i in self.rng.sample(range(len(self.stats)), min(len(self.stats), self.rng.choice((1, 1, 2)))):
+            stat = self.stats[i]
+            move = self.rng.choice((-2, -1, -1, 1, 1, 2)) * stat.step
+            vector[i] = min(stat.hi, max(stat.lo, vector[i] + move))
+        return tuple(vector)
+
+    # One generation: up to size new vectors bred from the front
+    def generation(self, size: int, map=map) -> int:
+        front = self.front()
+        children = []
+        for _ in range(20 * size):
+            child = self.mutate(self.rng.choice(front))
+            if child not in self.cache and child not in children:
+                children.append(child)
+                if len(children) == size:
+                    break
+        return self.evaluate(children, map)
+
+    def describe(self, vector: tuple) -> str:
+        changes = [f"{s.label()} {b}->{v}" for s, b, v in zip(self.stats, self.base, vector) if v != b]
+        return ", ".join(changes) or "as in the packs"
+
+    # The configuration as a content pack whose ids end in _<tag>
+    def pack(self, vector: tuple, tag: str) -> dict:
+        weapons, armor = apply(vector, self.stats, self.weapon_ids, self.armor_ids)
+        data = {"weapons": {}, "armor": {}, "loadouts": {}}
+        for weapon_id, w in weapons.items():
+            d = {"name": w.name, "damage": w.damage, "speed": w.speed, "weight": w.weight,
+                 "two_handed": w.two_handed, "type": w.type.name.lower()}
+            if w.ascii_art:
+                d["ascii_art"] = w.ascii_art
+            data["weapons"][f"{weapon_id}_{tag}"] = d
+        for armor_id, a in armor.items():
+            data["armor"][f"{armor_id}_{tag}"] = {
+                "name": a.name, "defense": {t.name.lower(): a.defense[t.value] for t in DamageType},
+                "weight": a.weight, "coverage": a.coverage}
+        for loadout, (weapon_id, armor_id) in zip(self.loadouts, self.gear):
+            data["loadouts"][f"{loadout.id.replace('+', '_')}_{tag}"] = {
+                "name": loadout.name, "weapon": f"{weapon_id}_{tag}", "armor": f"{armor_id}_{tag}",
+                "guard": loadout.guard.name.lower(), "initiative": loadout.initiative}
+        return data
+
+
+# The ids of a loadout's weapon and armor in the registry
+def gear_ids(registry, loadout) -> tuple:
+    weapon_id = next((i for i, w in registry.weapons.items() if w is loadout.weapon), None)
+    armor_id = next((i for i, a in registry.armor.items() if a is loadout.armor), None)
+    if weapon_id is None or armor_id is None:
+        raise ContentError(f"loadout {loadout.id!r}: gear not found in the packs")
+    return weapon_id, armor_id
+
+
+def search(tuner: Tuner, args, map=map):
+    start = time.perf_counter()
+    tuner.evaluate([tuner.base], map)
+    for g in range(1, args.generations + 1):
+        played = tuner.generation(args.population, map)
+        front = tuner.front()
+        print(f"generation {g}: {played} new configurations, {len(tuner.cache)} evaluated, front of {len(front)}, "
+              f"least imbalance {min(tuner.objectives(v)[0] for v in front):.3f}, "
+              f"{tuner.duels:,} duels in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search weapon and armor stats for balanced pairings")
+    parser.add_argument("--loadouts", metavar="ID,ID,...", help="loadouts to balance (default: every declared one)")
+    parser.add_argument("--arena", metavar="ID", help="terrain (see content.py)")
+    parser.add_argument("--tune", metavar="FIELD,...", default=",".join(FIELDS),
+                        help=f"stats to tune, from {', '.join(FIELDS)} (default: all)")
+    parser.add_argument("--band", type=float, nargs=2, metavar=("LO", "HI"), default=(0.45, 0.55),
+                        help="target win rate band for every pairing")
+    parser.add_argument("--generations", type=int, default=20)
+    parser.add_argument("--population", type=int, default=16, help="new configurations per generation")
+    parser.add_argument("--min-duels", type=int, default=200, help="duels per pairing to start with")
+    parser.add_argument("--max-duels", type=int, default=6400, help="duels per pairing at the most")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="1 runs in-process")
+    parser.add_argument("--max-rounds", type=int, default=500)
+    parser.add_argument("--cache", metavar="FILE", help="keep evaluated configurations in this JSON file")
+    parser.add_argument("--out", default="tuned", help="directory for the packs of the front")
+    args = parser.parse_args()
+
+    fields = [f.strip() for f in args.tune.split(",") if f.strip()]
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        sys.exit(f"unknown field(s) {', '.join(sorted(unknown))}; expected {', '.join(FIELDS)}")
+    if not 0 <= args.band[0] < args.band[1] <= 1:
+        sys.exit("--band needs 0 <= LO < HI <= 1")
+    try:
+        registry = content.load()
+        loadout_ids = args.loadouts.split(",") if args.loadouts else list(registry.loadouts)
+        tuner = Tuner(registry, loadout_ids, registry.environment(args.arena or content.DEFAULT_ARENA), fields,
+                      tuple(args.band), args.min_duels, max(args.min_duels, args.max_duels), args.seed,
+                      args.max_rounds)
+        if args.cache:
+            tuner.load_cache(args.cache)
+    except ContentError as e:
+        sys.exit(str(e))
+    print(f"Tuning {len(tuner.stats)} stats of {len(tuner.loadouts)} loadouts ({len(tuner.pairs)} pairings) "
+          f"for win rates in {args.band[0]:.0%}-{args.band[1]:.0%}"
+          + (f"; {len(tuner.cache)} configurations cached" if tuner.cache else ""))
+
+    try:
+        if args.workers > 1:
+            with ProcessPoolExecutor(args.workers) as executor:
+                search(tuner, args, executor.map)
+        else:
+            search(tuner, args)
+    finally:
+        if args.cache:
+            tuner.save_cache(args.cache)
+
+    front = tuner.front()
+    names = [l.id for l in tuner.loadouts]
+    os.makedirs(args.out, exist_ok=True)
+    print(f"\nPareto front ({sum(tuner.objectives(v)[0] == 0 for v in front)} of {len(front)} with every pairing "
+          f"in the band):")
+    for rank, vector in enumerate(front, 1):
+        imbalance, change = tuner.objectives(vector)
+        rates = tuner.win_rates(vector)
+        in_band = sum(args.band[0] <= r <= args.band[1] for r in rates)
+        worst = max(range(len(rates)), key=lambda i: abs(rates[i] - 0.5))
+        a, b = tuner.pairs[worst]
+        path = os.path.join(args.out, f"tuned{rank}.json")
+        with open(path, "w") as f:
+            json.dump(tuner.pack(vector, f"tuned{rank}"), f, indent=2)
+        print(f"{rank:>3}. imbalance {imbalance:.3f}, {change} steps, {in_band}/{len(rates)} pairings in band, "
+              f"worst {names[a]} vs {names[b]} {rates[worst]:.1%} -> {path}\n     {tuner.describe(vector)}")
+
+
+if __name__ == "__main__":
+    main()